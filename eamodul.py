@@ -1,23 +1,31 @@
 #!/usr/bin/env python3
 """This script can be installed on you pi. Together with the EA-Modul
 it provides the possibilty to turn off the pi with the press of a
-button (for 5 seconds). Further the green LED is pulsing when the pi
-is started. You can stop this script by pressing the other button (for
+button (for 5 seconds). Further the green LED is lit while the script
+is running. You can stop this script by pressing the other button (for
 2 seconds).
 
+The script starts the daemon from the eapi package (eapi.daemon). It
+uses the pins of eapi.hw.EAModul (BOARD numbering) and needs no CPU
+while it waits for button presses. See 'pydoc3 eapi.daemon' for
+configurable gestures and actions.
+
 INSTALLATION:
 
-1. Copy the file to /home/pi/bin/eamodul.py
+1. Install the eapi package and copy the file to /home/pi/bin/eamodul.py
 
 2. Install the script in your crontab such that it will be executed on
    startup:
 
-   $ crontab -e
+   $ sudo crontab -e
 
    Insert the following line
-  
+
    @reboot /home/pi/bin/eamodul.py
 
+   Alternatively install it as a systemd service of Type=notify with
+   ExecStart=/usr/bin/python3 -m eapi.daemon
+
 3. Have fun :)
 
 
@@ -26,43 +34,7 @@ by pressing the other button.
 
 """
 
-import gpiozero
-import os
-import time
-
-# pins are considered in BCM
-green_pin = 26
-taster0_pin = 5
-taster1_pin = 6
-
-led = gpiozero.PWMLED(green_pin)
-
-def btn0_held():
-    print("Button0 held")
-    os.system("sudo shutdown -h now")
-
-def btn1_held():
-    print("Button1 held")
-    led.close()
-
-    # fetch process id and kill myself    
-    # simple exit does not work due to several threads
-    pid = os.getpid()
-    os.system("kill " + str(pid))
-
-def main():    
-    print("Starting")
-
-    btn0 = gpiozero.Button(taster0_pin, pull_up=False, hold_time=5)
-    btn0.when_held = btn0_held
-
-    btn1 = gpiozero.Button(taster1_pin, pull_up=False, hold_time=2)
-    btn1.when_held = btn1_held
-
-    led.pulse()
-
-    while True:
-        time.sleep(100)
+from eapi.daemon import main
 
 
 if __name__ == "__main__":
@@ -2,10 +2,31 @@
 
 """Ein Modul, das verwendet wird, wenn kein Pi vorhanden ist. Es stellt
 Dummy-Funktionalitäten bereit, die Ausgaben auf der Konsole machen.
+
+Pegelwechsel an Eingängen lassen sich mit flanke_ausloesen simulieren.
+Registrierte Callbacks werden dann wie bei RPi.GPIO in einem eigenen Thread
+aufgerufen; bis zum nächsten cleanup liefert input den gesetzten Pegel
+statt eines zufälligen Wertes.
+
+Wie bei RPi.GPIO liefern gpio_function die Richtung eines Pins und input an
+einem Ausgang dessen zuletzt ausgegebenen Pegel. Erst cleanup setzt die Pins
+wieder zurück.
+
+>>> import threading
+>>> gedrueckt = threading.Event()
+>>> add_event_detect(40, RISING, callback=lambda pin: gedrueckt.set())
+>>> flanke_ausloesen(40, True)
+True
+>>> gedrueckt.wait(1), input(40)
+(True, True)
+>>> cleanup()
 """
 
-import random
 import logging
+import queue
+import random
+import threading
+import time
 
 # Konstanten
 BOARD = 1
@@ -14,11 +35,26 @@ OUT = 3
 PUD_DOWN = 4
 BOTH = 5
 RISING = 6
+FALLING = 7
+LOW = 0
+HIGH = 1
 
 logging.basicConfig(level=logging.DEBUG)
 log = logging.getLogger(__name__)
 
 __PINS = {}
+# Richtung (IN oder OUT) der eingerichteten Pins
+__MODI = {}
+__MODUS = [None]
+# Mit flanke_ausloesen gesetzte Pegel der Eingänge
+__EINGAENGE = {}
+# Pin -> [Flanke, Callback, Entprellzeit in Sekunden, letzte Flanke]
+__CALLBACKS = {}
+# Warteschlange für den Thread, der die Callbacks aufruft
+__AUFRUFE = None
+__SPERRE = threading.Lock()
+# Pin und Pegel der Flanke, deren Callback gerade im Thread läuft
+__IM_CALLBACK = threading.local()
 
 class PWM:
     def __init__(self, pin, frequenz):
@@ -42,7 +78,19 @@ def __alle_pins_ausgeben():
 
 
 def input(pin):
-    """Dummy Methode, die zufällig True oder False zurückgibt."""
+    """Dummy Methode, die zufällig True oder False zurückgibt. Wurde für den
+    Pin eine Flanke ausgelöst, wird deren Pegel zurückgegeben, an einem
+    Ausgang der zuletzt ausgegebene Pegel."""
+    flanke = getattr(__IM_CALLBACK, "flanke", None)
+    if flanke is not None and flanke[0] == pin:
+        # Ein Callback sieht den Pegel seiner Flanke, auch wenn schon die
+        # nächste ausgelöst wurde.
+        return flanke[1]
+    if pin in __EINGAENGE:
+        return __EINGAENGE[pin]
+    if __MODI.get(pin) == OUT:
+        return bool(__PINS[pin])
+
     r = random.randint(0, 1)
     log.info("Zufälliger Input für Pin " + str(pin) + ": " + str(r==0))
     if r == 0:
@@ -52,20 +100,39 @@ def input(pin):
         
 
 def setmode(board):
-    """Macht nichts."""
+    """Merkt sich den Modus für getmode."""
     log.info("Setze boardmode auf " + str(board))
+    __MODUS[0] = board
+
 
+def getmode():
+    """Der mit setmode gesetzte Modus oder None."""
+    return __MODUS[0]
 
-def setup(pin, in_out):
-    """Macht nichts."""    
+
+def gpio_function(pin):
+    """Die Richtung (IN oder OUT) des Pins. Nicht eingerichtete Pins sind
+    wie auf dem Pi Eingänge."""
+    return __MODI.get(pin, IN)
+
+
+def setup(pin, in_out, initial=None, pull_up_down=None):
+    """Merkt sich die Richtung des Pins. Ein Ausgang behält ohne initial
+    seinen bisherigen Pegel."""
     global __PINS
     log.info("Setup pin {p} modus {m}".format(p=pin, m=in_out))
     if type(pin) is list:
         for p in pin:
-            setup(p, in_out)
+            setup(p, in_out, initial, pull_up_down)
         return
 
-    __PINS[pin] = False
+    if in_out == OUT and initial is not None:
+        __PINS[pin] = initial
+    elif in_out == OUT and __MODI.get(pin) == OUT:
+        pass
+    else:
+        __PINS[pin] = False
+    __MODI[pin] = in_out
 
 
 def output(pin, an_aus):
@@ -75,12 +142,92 @@ def output(pin, an_aus):
     __alle_pins_ausgeben()
 
 
-def cleanup():
+def cleanup(pin=None):
+    """Setzt alle oder die gegebenen Pins zurück. Wie bei RPi.GPIO muss nach
+    einem vollständigen cleanup der Modus erneut gesetzt werden."""
     log.info("cleanup")
+    with __SPERRE:
+        if pin is None:
+            __CALLBACKS.clear()
+            __EINGAENGE.clear()
+            __MODI.clear()
+            __PINS.clear()
+            __MODUS[0] = None
+            return
+
+        for p in pin if type(pin) is list else [pin]:
+            __CALLBACKS.pop(p, None)
+            __EINGAENGE.pop(p, None)
+            __MODI.pop(p, None)
+            __PINS.pop(p, None)
+
+
+def add_event_detect(pin, flanke, callback=None, bouncetime=None):
+    """Registriert den callback für Flanken am pin, die mit flanke_ausloesen
+    simuliert werden. Die bouncetime wird in Millisekunden angegeben; wie bei
+    RPi.GPIO muss sie größer als 0 sein oder fehlen.
+
+    >>> add_event_detect(40, RISING, callback=print, bouncetime=0)
+    Traceback (most recent call last):
+    ...
+    ValueError: Bouncetime must be greater than 0
+    """
+    if bouncetime is not None and bouncetime <= 0:
+        raise ValueError("Bouncetime must be greater than 0")
 
-
-def add_event_detect(pin, flanke, callback, bouncetime):
     log.info("Event registrieren für Pin " + str(pin))
+    with __SPERRE:
+        __CALLBACKS[pin] = [flanke, callback, (bouncetime or 0) / 1000, None]
+
+
+def remove_event_detect(pin):
+    log.info("Event entfernen für Pin " + str(pin))
+    with __SPERRE:
+        __CALLBACKS.pop(pin, None)
+
+
+def flanke_ausloesen(pin, pegel):
+    """Setzt den Pegel eines Eingangs. Ändert er sich und passt die Flanke zu
+    einem registrierten Callback, wird dieser wie bei RPi.GPIO in einem
+    eigenen Thread aufgerufen. Flanken innerhalb der Entprellzeit nach der
+    letzten gemeldeten Flanke werden ignoriert. Gibt zurück, ob ein Callback
+    aufgerufen wird."""
+    global __AUFRUFE
+    pegel = bool(pegel)
+    with __SPERRE:
+        alt = __EINGAENGE.get(pin, False)
+        __EINGAENGE[pin] = pegel
+        eintrag = __CALLBACKS.get(pin)
+        if alt == pegel or eintrag is None:
+            return False
+
+        flanke, callback, entprellzeit, letzte = eintrag
+        if (flanke == RISING and not pegel) or (flanke == FALLING and pegel):
+            return False
+        jetzt = time.monotonic()
+        if letzte is not None and jetzt - letzte < entprellzeit:
+            return False
+        eintrag[3] = jetzt
+
+        if __AUFRUFE is None:
+            __AUFRUFE = queue.Queue()
+            threading.Thread(target=__callbacks_aufrufen, args=(__AUFRUFE,),
+                             daemon=True).start()
+
+    __AUFRUFE.put((callback, pin, pegel))
+    return True
+
+
+def __callbacks_aufrufen(aufrufe):
+    while True:
+        callback, pin, pegel = aufrufe.get()
+        __IM_CALLBACK.flanke = (pin, pegel)
+        try:
+            callback(pin)
+        except Exception:
+            log.exception("Fehler im Callback für Pin %s", pin)
+        finally:
+            __IM_CALLBACK.flanke = None
 
 
 def add_event_callback(pin, methode):
@@ -6,5 +6,21 @@ Eingabe-Ausgabe-Moduls für den Raspberry Pi.
 Es besteht aus verschiedenen Untermodulen. Schau in die Dokumentation der
 jeweiligen Untermodule, um mehr über die Funktionsweise zu erfahren. """
 
-import pkg_resources
-VERSION = pkg_resources.get_distribution('eapi').version
+
+def __getattr__(name):
+    """Ermittelt VERSION erst beim ersten Zugriff, da das Lesen der
+    Paket-Metadaten den Import verlangsamen würde."""
+    if name == "VERSION":
+        global VERSION
+        try:
+            from importlib.metadata import version
+        except ImportError:
+            # Python 3.7
+            from pkg_resources import get_distribution
+            VERSION = get_distribution('eapi').version
+        else:
+            VERSION = version('eapi')
+        return VERSION
+
+    raise AttributeError(
+        "module {m!r} has no attribute {n!r}".format(m=__name__, n=name))
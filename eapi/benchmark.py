@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+
+"""Laufzeitmessungen für häufig aufgerufene Teile der Bibliothek.
+
+Die Messungen verwenden die GPIO-Simulation und laufen daher auf jedem
+Rechner. Gemessen wird die Zeit pro Aufruf in Sekunden; von mehreren
+Wiederholungen zählt die schnellste, da langsamere Durchläufe meist durch
+andere Prozesse gestört wurden.
+
+  $ python3 -m eapi.benchmark
+  $ python3 -m eapi.benchmark --speichern basis.json
+  $ python3 -m eapi.benchmark --basis basis.json --schwelle 0.25
+
+Mit --speichern werden die Ergebnisse als Basis in einer JSON-Datei
+abgelegt. Mit --basis werden sie mit einer gespeicherten Basis verglichen:
+Messungen, die um mehr als den Anteil schwelle langsamer geworden sind,
+werden als Verschlechterung gemeldet und das Programm endet mit dem
+Rückgabewert 1. Basen sollten nur mit Messungen desselben Rechners
+verglichen werden.
+
+>>> ergebnisse = ausfuehren(["schalte_led/0", "client/kodiere"], faktor=0.01,
+...                         wiederholungen=1)
+>>> sorted(ergebnisse)
+['client/kodiere', 'schalte_led/0']
+>>> basis = {"schalte_led/0": ergebnisse["schalte_led/0"] / 2}
+>>> [name for name, alt, neu in vergleichen(ergebnisse, basis, 0.25)]
+['schalte_led/0']
+"""
+
+import contextlib
+import io
+import json
+import logging
+import math
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+log = logging.getLogger(__name__)
+
+# Anzahl der Beobachter je LED, mit denen schalte_led gemessen wird
+BEOBACHTER = (0, 1, 10)
+
+# Module, deren Importzeit gemessen wird
+IMPORTE = ("eapi", "eapi.hw", "eapi.net")
+
+
+@contextlib.contextmanager
+def simulation():
+    """Verwendet die GPIO-Simulation und unterdrückt ihre Logausgaben, damit
+    nicht die Ausgabe der Logs gemessen wird."""
+    import eapi.hw
+    import eapi.GPIODummy
+    import eapi.net
+
+    logs = [logging.getLogger(eapi.GPIODummy.__name__),
+            logging.getLogger(eapi.net.__name__)]
+    log_level = [l.level for l in logs]
+    for l in logs:
+        l.setLevel(logging.WARNING)
+    gpio = eapi.hw.GPIO
+    eapi.hw.GPIO = eapi.GPIODummy
+
+    try:
+        yield
+    finally:
+        eapi.hw.GPIO = gpio
+        for l, level in zip(logs, log_level):
+            l.setLevel(level)
+
+
+def messen(funktion, anzahl, wiederholungen=5):
+    """Ruft funktion(anzahl) wiederholungen Mal auf und gibt die kürzeste
+    Zeit pro Durchlauf in Sekunden zurück. Die Funktion führt die zu
+    messende Operation anzahl Mal aus.
+
+    >>> messen(lambda n: sum(range(n)), 1000) < 1
+    True
+    """
+    anzahl = max(1, int(anzahl))
+    beste = math.inf
+    for _ in range(wiederholungen):
+        start = time.perf_counter()
+        funktion(anzahl)
+        beste = min(beste, (time.perf_counter() - start) / anzahl)
+
+    return beste
+
+
+def _mit_beobachtern(modul_klasse, beobachter):
+    """Erstellt ein Modul, bei dem an jeder LED beobachter Methoden
+    registriert sind, die nichts tun."""
+    from eapi.hw import EAModul
+
+    eamodul = modul_klasse()
+    for farbe in (EAModul.LED_ROT, EAModul.LED_GELB, EAModul.LED_GRUEN):
+        for _ in range(beobachter):
+            eamodul.led_event_registrieren(farbe, lambda wert: None)
+    return eamodul
+
+
+def _schalte_led(beobachter):
+    def messung(anzahl):
+        from eapi.hw import EAModul
+        eamodul = _mit_beobachtern(EAModul, beobachter)
+        schalte_led = eamodul.schalte_led
+        for i in range(anzahl):
+            schalte_led(i % 3, i & 1)
+    return messung
+
+
+def _schalte_led_gemessen(anzahl):
+    """Wie schalte_led mit einem Beobachter, aber mit eingeschalteter
+    Laufzeitmessung."""
+    from eapi.hw import EAModul
+    eamodul = _mit_beobachtern(EAModul, 1)
+    eamodul.messung_einschalten()
+    schalte_led = eamodul.schalte_led
+    for i in range(anzahl):
+        schalte_led(i % 3, i & 1)
+
+
+def _schalte_leds(beobachter):
+    def messung(anzahl):
+        from eapi.hw import EAModul
+        eamodul = _mit_beobachtern(EAModul, beobachter)
+        schalte_leds = eamodul.schalte_leds
+        for i in range(anzahl):
+            schalte_leds(i & 1, 1 - (i & 1), i & 1)
+    return messung
+
+
+def _dimmbar(anzahl):
+    from eapi.hw import DimmbaresEAModul
+    eamodul = DimmbaresEAModul()
+    schalte_led = eamodul.schalte_led
+    for i in range(anzahl):
+        schalte_led(i % 3, (i % 101) / 100)
+
+
+def _handler(anzahl):
+    """Ruft den EAModulUDPHandler direkt auf, ohne Pakete über das Netz zu
+    senden. Gemessen wird die Bearbeitung eines Pakets im Server."""
+    from eapi.hw import EAModul
+    from eapi.net import EAModulServer, EAModulUDPHandler, kodiere
+
+    easerver = EAModulServer("127.0.0.1", 0, eamodul=EAModul())
+    try:
+        pakete = [bytes([kodiere(1, 0, 1)]), bytes([kodiere(0, 1, 0)])]
+        absender = ("127.0.0.1", 9)
+        for i in range(anzahl):
+            EAModulUDPHandler((pakete[i & 1], easerver.socket), absender,
+                              easerver)
+    finally:
+        easerver.server_close()
+
+
+class _Verwerfen(io.TextIOBase):
+    """Eine Ausgabe, die alles verwirft."""
+
+    def write(self, s):
+        return len(s)
+
+
+def _konsole(anzahl):
+    """Misst das Zeichnen der Konsole nach Änderungen aller drei LEDs."""
+    from eapi.hw import EAModul
+    from eapi.gui import EAModulKonsole
+
+    eamodul = EAModul()
+    # Die sehr niedrige Bildrate hält den Thread der Konsole nach dem ersten
+    # Bild still, so dass nur die Aufrufe von zeichnen gemessen werden.
+    konsole = EAModulKonsole(eamodul, fps=0.001, ausgabe=_Verwerfen())
+    konsole.zeichnen()
+    for i in range(anzahl):
+        wert = i & 1
+        konsole._rote_led_update(wert)
+        konsole._gelbe_led_update(1 - wert)
+        konsole._gruene_led_update(0.5 if wert else 1)
+        konsole.zeichnen()
+    konsole.schliessen()
+
+
+def _kodiere(anzahl):
+    from eapi.net import kodiere
+    for i in range(anzahl):
+        bytes([kodiere(i & 1, (i >> 1) & 1, 2)])
+
+
+def _client_sende(anzahl):
+    """Sendet an einen lokalen Socket, der nichts liest. Gemessen werden
+    Kodieren und Senden eines Pakets durch den EAModulClient."""
+    from eapi.net import EAModulClient
+
+    empfaenger = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    empfaenger.bind(("127.0.0.1", 0))
+    client = EAModulClient(*empfaenger.getsockname())
+    try:
+        for i in range(anzahl):
+            client.sende(i & 1, 1 - (i & 1), 1)
+    finally:
+        client.client.close()
+        empfaenger.close()
+
+
+def _zustand_lesen(anzahl):
+    """Liest Schnappschüsse aus einem Zustandsblock (s. eapi.zustand)."""
+    import os
+    import tempfile
+    from eapi.zustand import ZustandSchreiber, ZustandLeser
+
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        schreiber = ZustandSchreiber(os.path.join(verzeichnis, "zustand"))
+        leser = ZustandLeser(schreiber.pfad)
+        lesen = leser.lesen
+        for _ in range(anzahl):
+            lesen()
+        leser.schliessen()
+        schreiber.schliessen()
+
+
+def _importzeit(modul):
+    """Misst die Importzeit des Moduls in einem neuen Interpreter."""
+    def messung(anzahl):
+        for _ in range(anzahl):
+            subprocess.run([sys.executable, "-c", "import " + modul],
+                           check=True)
+    return messung
+
+
+def _messungen():
+    """Alle Messungen als dict aus Name und Tupel (Funktion, Anzahl der
+    Aufrufe)."""
+    messungen = {}
+    for beobachter in BEOBACHTER:
+        messungen["schalte_led/{b}".format(b=beobachter)] = (
+            _schalte_led(beobachter), 20000)
+        messungen["schalte_leds/{b}".format(b=beobachter)] = (
+            _schalte_leds(beobachter), 10000)
+    messungen["schalte_led/messung"] = (_schalte_led_gemessen, 20000)
+    messungen["dimmbar/schalte_led"] = (_dimmbar, 20000)
+    messungen["handler/paket"] = (_handler, 10000)
+    messungen["konsole/zeichnen"] = (_konsole, 5000)
+    messungen["client/kodiere"] = (_kodiere, 100000)
+    messungen["client/sende"] = (_client_sende, 10000)
+    messungen["zustand/lesen"] = (_zustand_lesen, 50000)
+    for modul in IMPORTE:
+        # Enthält den Start des Interpreters, der sich aber kaum ändert.
+        messungen["import/" + modul] = (_importzeit(modul), 3)
+    return messungen
+
+
+def namen():
+    """Die Namen aller Messungen."""
+    return list(_messungen())
+
+
+def ausfuehren(auswahl=None, faktor=1.0, wiederholungen=5):
+    """Führt die Messungen aus und gibt ein dict aus Name und Sekunden pro
+    Aufruf zurück.
+
+    Mit auswahl kann eine Liste von Namen angegeben werden, die gemessen
+    werden sollen. Mit faktor wird die Anzahl der Aufrufe jeder Messung
+    verändert, z.B. 0.1 für schnelle, aber ungenauere Messungen.
+    """
+    messungen = _messungen()
+    if auswahl is None:
+        auswahl = list(messungen)
+    for name in auswahl:
+        if name not in messungen:
+            raise ValueError("Unbekannte Messung: " + str(name))
+
+    ergebnisse = {}
+    with simulation():
+        for name in auswahl:
+            funktion, anzahl = messungen[name]
+            ergebnisse[name] = messen(funktion, anzahl * faktor,
+                                      wiederholungen)
+
+    return ergebnisse
+
+
+def vergleichen(ergebnisse, basis, schwelle=0.25):
+    """Vergleicht die ergebnisse mit einer basis (jeweils Name und Sekunden
+    pro Aufruf). Zurückgegeben wird eine Liste von Tupeln (name, alt, neu)
+    für alle Messungen, die um mehr als den Anteil schwelle langsamer
+    geworden sind. Messungen, die nur in einer der beiden vorkommen, werden
+    ignoriert."""
+    if schwelle < 0:
+        raise ValueError("Die Schwelle darf nicht negativ sein.")
+
+    return [(name, basis[name], neu)
+            for name, neu in sorted(ergebnisse.items())
+            if name in basis and neu > basis[name] * (1 + schwelle)]
+
+
+def basis_speichern(pfad, ergebnisse):
+    """Speichert die ergebnisse zusammen mit einer Beschreibung des Rechners
+    als JSON-Datei."""
+    import eapi
+
+    daten = {
+        "umgebung": {
+            "eapi": eapi.VERSION,
+            "python": platform.python_version(),
+            "system": platform.platform(),
+            "rechner": platform.node(),
+        },
+        "ergebnisse": ergebnisse,
+    }
+    with open(pfad, "w") as datei:
+        json.dump(daten, datei, indent=2, sort_keys=True)
+
+
+def basis_laden(pfad):
+    """Lädt die Ergebnisse einer mit basis_speichern abgelegten Basis."""
+    with open(pfad) as datei:
+        return json.load(datei)["ergebnisse"]
+
+
+def main(argumente=None):
+    """Führt die Messungen aus, gibt sie aus und vergleicht sie ggf. mit
+    einer Basis. Gibt den Rückgabewert des Programms zurück."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m eapi.benchmark",
+        description="Laufzeitmessungen mit der GPIO-Simulation.")
+    parser.add_argument("messungen", nargs="*", metavar="messung",
+                        help="Namen der Messungen (Standard: alle): " +
+                        ", ".join(namen()))
+    parser.add_argument("--basis", help="Mit dieser Basis vergleichen")
+    parser.add_argument("--speichern", metavar="DATEI",
+                        help="Ergebnisse als Basis speichern")
+    parser.add_argument("--schwelle", type=float, default=0.25,
+                        help="Erlaubte Verschlechterung als Anteil "
+                             "(Standard: 0.25)")
+    parser.add_argument("--faktor", type=float, default=1.0,
+                        help="Faktor für die Anzahl der Aufrufe")
+    parser.add_argument("--wiederholungen", type=int, default=5)
+    args = parser.parse_args(argumente)
+
+    try:
+        ergebnisse = ausfuehren(args.messungen or None, args.faktor,
+                                args.wiederholungen)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    basis = basis_laden(args.basis) if args.basis else {}
+    for name, sekunden in ergebnisse.items():
+        zeile = "{n:<22} {s:10.3f} µs {r:12.0f}/s".format(
+            n=name, s=sekunden * 1e6, r=1 / sekunden if sekunden else 0)
+        if name in basis:
+            zeile += " {a:+7.1%}".format(a=sekunden / basis[name] - 1)
+        print(zeile)
+
+    if args.speichern:
+        basis_speichern(args.speichern, ergebnisse)
+
+    verschlechtert = vergleichen(ergebnisse, basis, args.schwelle)
+    for name, alt, neu in verschlechtert:
+        print("Verschlechtert: {n} von {a:.3f} µs auf {b:.3f} µs".format(
+            n=name, a=alt * 1e6, b=neu * 1e6), file=sys.stderr)
+
+    return 1 if verschlechtert else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
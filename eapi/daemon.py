@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+
+"""Ein Dienst, der dauerhaft auf dem Pi läuft und auf Gesten an den Tastern
+des EA-Moduls reagiert, z.B. um den Pi herunterzufahren.
+
+  $ python3 -m eapi.daemon
+  $ python3 -m eapi.daemon --konfiguration /etc/eapi-daemon.json
+
+Der Dienst arbeitet ausschließlich mit Ereignissen: Taster melden sich über
+Interrupts, Zeiten werden mit Timern gemessen und der Hauptthread wartet mit
+signal.sigwait auf SIGTERM, SIGINT oder SIGHUP. Ohne Tastendruck wird daher
+keine Rechenzeit benötigt. Während der Dienst läuft, leuchtet die grüne LED.
+
+Erkannt werden die Gesten 'kurz' (kurzer Druck), 'lang' (gehalten für die
+Haltezeit des Tasters) und 'doppelt' (zwei kurze Drücke innerhalb der
+Doppelzeit). Einer Geste wird eine Aktion zugeordnet: ein Befehl als Liste
+(er wird ohne Shell ausgeführt), eine Python-Funktion oder 'beenden'. Die
+Aktionen laufen nacheinander in einem eigenen Thread, so dass ein
+langsamer Befehl keine Tastendrücke blockiert.
+
+Die Konfiguration ist eine JSON-Datei. Die Pins werden wie beim EAModul
+angegeben (Nummerierung BOARD); fehlende Angaben verwenden dessen
+Standardwerte. Ohne Konfiguration fährt ein langer Druck (5 s) auf Taster 0
+den Pi herunter und ein langer Druck (2 s) auf Taster 1 beendet den Dienst.
+
+  {
+    "pins": {"pin_taster0": 29, "pin_taster1": 31, "pin_led_gruen": 37},
+    "haltezeiten": {"0": 5, "1": 2},
+    "doppelzeit": 0.4,
+    "aktionen": {
+      "0:lang": ["shutdown", "-h", "now"],
+      "1:lang": "beenden",
+      "1:doppelt": ["systemctl", "restart", "meinprogramm"]
+    }
+  }
+
+Mit systemd wird der Dienst als Typ 'notify' eingerichtet. Er meldet sich
+über NOTIFY_SOCKET als bereit (READY=1) und beim Beenden mit STOPPING=1.
+
+  [Service]
+  Type=notify
+  ExecStart=/usr/bin/python3 -m eapi.daemon
+  NotifyAccess=main
+
+  [Install]
+  WantedBy=multi-user.target
+
+>>> from eapi.hw import EAModul
+>>> import eapi.GPIODummy
+>>> ea = EAModul()
+>>> gesten = []
+>>> daemon = EAModulDaemon(ea, aktionen={
+...     "0:kurz": lambda: gesten.append("kurz"),
+...     "0:lang": lambda: gesten.append("lang")}, haltezeiten={0: 0.05})
+
+Die Taster melden Wechsel mit taster_geaendert. Vor der Geste 'lang' wird
+geprüft, ob der Taster noch gedrückt ist; hier wird er dazu in der
+Simulation gedrückt gehalten.
+
+>>> daemon.taster_geaendert(0, True)
+>>> daemon.taster_geaendert(0, False)
+>>> eapi.GPIODummy.flanke_ausloesen(ea._taster[0], True)
+False
+>>> daemon.taster_geaendert(0, True)
+>>> time.sleep(0.1)
+>>> daemon.taster_geaendert(0, False)
+>>> daemon.beenden()
+>>> gesten
+['kurz', 'lang']
+"""
+
+import json
+import logging
+import os
+import queue
+import signal
+import socket
+import subprocess
+import threading
+import time
+from eapi.hw import EAModul
+
+log = logging.getLogger(__name__)
+
+GESTEN = ("kurz", "lang", "doppelt")
+
+STANDARD_AKTIONEN = {"0:lang": ["shutdown", "-h", "now"],
+                     "1:lang": "beenden"}
+STANDARD_HALTEZEITEN = {0: 5.0, 1: 2.0}
+
+
+def systemd_melden(zustand):
+    """Sendet eine Zustandsmeldung (z.B. 'READY=1') an systemd, sofern der
+    Prozess von systemd mit NOTIFY_SOCKET gestartet wurde. Gibt zurück, ob
+    die Meldung gesendet wurde."""
+    adresse = os.environ.get("NOTIFY_SOCKET")
+    if not adresse:
+        return False
+
+    if adresse.startswith("@"):
+        # abstrakter Namensraum
+        adresse = "\0" + adresse[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.sendto(zustand.encode(), adresse)
+    except OSError as e:
+        log.warning("Meldung an systemd fehlgeschlagen: %s", e)
+        return False
+
+    return True
+
+
+class _Gesten:
+    """Erkennt die Gesten eines Tasters aus den Wechseln zwischen gedrückt
+    und losgelassen. Zeiten werden mit Timern gemessen.
+
+    Ein verlorener Wechsel beim Loslassen (z.B. durch Prellen innerhalb der
+    Entprellzeit) darf keine Geste 'lang' auslösen. Vor 'lang' wird der
+    Taster daher mit taster_lesen() erneut gelesen.
+    """
+
+    def __init__(self, nr, haltezeit, doppelzeit, mit_doppelt, ausloesen,
+                 taster_lesen):
+        self.nr = nr
+        self.haltezeit = haltezeit
+        self.doppelzeit = doppelzeit
+        self.mit_doppelt = mit_doppelt
+        self.__ausloesen = ausloesen
+        self.__taster_lesen = taster_lesen
+        self.__sperre = threading.Lock()
+        self.__gedrueckt = False
+        self.__gehalten = False
+        self.__zweiter_druck = False
+        # laufende Timer für die Gesten 'lang' und 'kurz'
+        self.__timer = {"lang": None, "kurz": None}
+
+    def wechsel(self, gedrueckt):
+        with self.__sperre:
+            if gedrueckt == self.__gedrueckt:
+                return
+            self.__gedrueckt = gedrueckt
+
+            if gedrueckt:
+                self.__gehalten = False
+                # Wartet ein kurzer Druck noch auf einen zweiten?
+                self.__zweiter_druck = self.__abbrechen("kurz")
+                self.__starten("lang", self.haltezeit)
+                return
+
+            self.__abbrechen("lang")
+            if self.__gehalten:
+                return
+            if self.__zweiter_druck:
+                self.__ausloesen(self.nr, "doppelt")
+            elif self.mit_doppelt:
+                self.__starten("kurz", self.doppelzeit)
+            else:
+                self.__ausloesen(self.nr, "kurz")
+
+    def abbrechen(self):
+        """Bricht laufende Timer ab."""
+        with self.__sperre:
+            for geste in self.__timer:
+                self.__abbrechen(geste)
+
+    def __starten(self, geste, sekunden):
+        timer = threading.Timer(sekunden, self.__abgelaufen)
+        timer.args = (geste, timer)
+        timer.daemon = True
+        timer.start()
+        self.__timer[geste] = timer
+
+    def __abbrechen(self, geste):
+        """Bricht den Timer der Geste ab. Gibt zurück, ob er noch lief."""
+        timer, self.__timer[geste] = self.__timer[geste], None
+        if timer is None:
+            return False
+        timer.cancel()
+        return True
+
+    def __abgelaufen(self, geste, timer):
+        # Den Pin außerhalb der Sperre lesen, damit Wechsel nicht warten.
+        gehalten = geste != "lang" or self.__taster_lesen()
+        with self.__sperre:
+            if self.__timer[geste] is not timer:
+                # inzwischen abgebrochen
+                return
+            self.__timer[geste] = None
+            if not gehalten:
+                log.warning("Taster %s ist nicht mehr gedrückt; das "
+                            "Loslassen wurde nicht gemeldet.", self.nr)
+                self.__gedrueckt = False
+                self.__gehalten = False
+                self.__zweiter_druck = False
+                return
+            if geste == "lang":
+                self.__gehalten = True
+        self.__ausloesen(self.nr, geste)
+
+
+class EAModulDaemon:
+    """Ein Dienst, der Gesten an den Tastern eines EAModuls Aktionen
+    zuordnet."""
+
+    def __init__(self, eamodul=None, aktionen=None, haltezeiten=None,
+                 doppelzeit=0.4):
+        """Erstellt den Dienst für das eamodul (Standard: ein neues
+        EAModul).
+
+        aktionen ordnet Schlüsseln der Form '<taster>:<geste>' (z.B.
+        '0:lang') eine Aktion zu: eine Liste mit einem Befehl und seinen
+        Argumenten, eine Funktion ohne Argumente oder 'beenden'. haltezeiten
+        ordnet den Tasternummern die Sekunden für die Geste 'lang' zu.
+        """
+        self.eamodul = eamodul if eamodul is not None else EAModul()
+        self.aktionen = dict(STANDARD_AKTIONEN if aktionen is None
+                             else aktionen)
+        zeiten = dict(STANDARD_HALTEZEITEN)
+        for nr, zeit in (haltezeiten or {}).items():
+            zeiten[int(nr)] = float(zeit)
+
+        for schluessel, aktion in self.aktionen.items():
+            nr, _, geste = schluessel.partition(":")
+            if not nr.isdigit() or geste not in GESTEN:
+                raise ValueError("Ungültige Geste: " + schluessel)
+            if not (callable(aktion) or aktion == "beenden" or
+                    isinstance(aktion, list)):
+                raise ValueError("Ungültige Aktion für " + schluessel)
+
+        self.__gesten = [
+            _Gesten(nr, zeiten.get(nr, 1.0), doppelzeit,
+                    "{n}:doppelt".format(n=nr) in self.aktionen,
+                    self.ausloesen,
+                    lambda nr=nr: self.eamodul.taster_gedrueckt(nr))
+            for nr in range(2)]
+        self.__auftraege = queue.Queue()
+        self.__arbeiter = threading.Thread(target=self.__abarbeiten,
+                                           daemon=True)
+        self.__arbeiter.start()
+
+    def starten(self):
+        """Registriert die Taster und schaltet die grüne LED als
+        Betriebsanzeige ein."""
+        for nr in range(len(self.__gesten)):
+            self.eamodul.taster_wechsel_registrieren(
+                nr, lambda gedrueckt, nr=nr: self.taster_geaendert(
+                    nr, gedrueckt))
+        self.eamodul.schalte_led(EAModul.LED_GRUEN, 1)
+
+    def taster_geaendert(self, nr, gedrueckt):
+        """Wird beim Drücken (True) oder Loslassen (False) eines Tasters
+        aufgerufen."""
+        self.__gesten[nr].wechsel(gedrueckt)
+
+    def ausloesen(self, nr, geste):
+        """Übergibt die Aktion der Geste an den Arbeits-Thread."""
+        aktion = self.aktionen.get("{n}:{g}".format(n=nr, g=geste))
+        log.info("Taster %s: %s", nr, geste)
+        if aktion is not None:
+            self.__auftraege.put(aktion)
+
+    def __abarbeiten(self):
+        while True:
+            aktion = self.__auftraege.get()
+            if aktion is None:
+                return
+
+            try:
+                if aktion == "beenden":
+                    os.kill(os.getpid(), signal.SIGTERM)
+                elif callable(aktion):
+                    aktion()
+                else:
+                    ergebnis = subprocess.run(aktion)
+                    if ergebnis.returncode != 0:
+                        log.warning("%s endete mit %s", aktion,
+                                    ergebnis.returncode)
+            except Exception:
+                log.exception("Aktion %s fehlgeschlagen", aktion)
+
+    def warten(self):
+        """Wartet ohne Rechenzeit auf SIGTERM, SIGINT oder SIGHUP. Muss im
+        Hauptthread aufgerufen werden."""
+        signal.sigwait({signal.SIGTERM, signal.SIGINT, signal.SIGHUP})
+
+    def beenden(self):
+        """Bricht laufende Gesten ab, führt noch ausstehende Aktionen aus
+        und gibt die Pins frei."""
+        for gesten in self.__gesten:
+            gesten.abbrechen()
+        self.__auftraege.put(None)
+        self.__arbeiter.join()
+        self.eamodul.schalte_led(EAModul.LED_GRUEN, 0)
+        self.eamodul.cleanup()
+
+
+def konfiguration_laden(pfad):
+    """Liest eine Konfiguration im JSON-Format und gibt die Argumente für
+    EAModul und EAModulDaemon zurück."""
+    with open(pfad) as datei:
+        konfiguration = json.load(datei)
+
+    pins = konfiguration.get("pins", {})
+    argumente = {schluessel: konfiguration[schluessel]
+                 for schluessel in ("aktionen", "haltezeiten", "doppelzeit")
+                 if schluessel in konfiguration}
+    return pins, argumente
+
+
+def main(argumente=None):
+    """Startet den Dienst und beendet ihn bei SIGTERM, SIGINT oder
+    SIGHUP."""
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python3 -m eapi.daemon")
+    parser.add_argument("--konfiguration",
+                        help="Konfigurationsdatei im JSON-Format")
+    argumente = parser.parse_args(argumente)
+
+    logging.basicConfig(level=logging.INFO)
+    pins, einstellungen = {}, {}
+    if argumente.konfiguration:
+        pins, einstellungen = konfiguration_laden(argumente.konfiguration)
+
+    # Signale vor dem Start weiterer Threads blockieren, damit sie nur von
+    # sigwait im Hauptthread entgegengenommen werden.
+    signal.pthread_sigmask(signal.SIG_BLOCK,
+                           {signal.SIGTERM, signal.SIGINT, signal.SIGHUP})
+
+    daemon = EAModulDaemon(EAModul(**pins), **einstellungen)
+    daemon.starten()
+    systemd_melden("READY=1")
+    log.info("Bereit")
+
+    daemon.warten()
+
+    systemd_melden("STOPPING=1")
+    log.info("Beende")
+    daemon.beenden()
+
+
+if __name__ == "__main__":
+    main()
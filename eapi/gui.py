@@ -17,10 +17,11 @@ EAModul.
 
 >>> ea = EAModul()
 
-Nun kann z.B. eine GUI für das EA-Modul erstellt werden. Der Aufruf ist
-blockierend und zeigt ein Fenster mit drei LEDs (rot, gelb und grün) an.
+Nun kann z.B. eine GUI für das EA-Modul erstellt werden. Der Aufruf von run()
+ist blockierend und zeigt ein Fenster mit drei LEDs (rot, gelb und grün) an.
 
    gui = EAModulGui(ea)
+   gui.run()
 
 Änderungen an den LEDs am Modul werden nun ebenfalls in der GUI dargestellt.
 
@@ -35,9 +36,17 @@ Konsole angezeigt werden.
    ea.schalte_led(EAModul.LED_ROT, 1)   
 """
 
-from tkinter import Tk, Label, StringVar, YES, BOTH
+import array
+import atexit
+import collections
+import logging
+import sys
+import threading
+import time
 from eapi.hw import EAModul
 
+log = logging.getLogger(__name__)
+
 
 class EAModulVisualisierer:
     """
@@ -69,29 +78,250 @@ class EAModulVisualisierer:
             "Muss von einer Unterklasse überschrieben werden!")
 
 
+class Verlauf:
+    """Ein Ringpuffer fester Größe, der zeitgestempelte Werte mehrerer Kanäle
+    (z.B. LEDs und Taster) aufbewahrt.
+
+    Zeitpunkte, Kanäle und Werte liegen in vorab angelegten Arrays, so dass
+    beim Erfassen kein Speicher angefordert wird. Ist der Puffer voll, werden
+    die ältesten Einträge überschrieben.
+
+    >>> verlauf = Verlauf(groesse=3)
+    >>> verlauf.erfassen(0, 1, zeitpunkt=1.0)
+    >>> verlauf.erfassen(2, 0.5, zeitpunkt=1.5)
+    >>> position, eintraege = verlauf.seit(0)
+    >>> eintraege
+    [(1.0, 0, 1.0), (1.5, 2, 0.5)]
+
+    Mit der zurückgegebenen Position erhält man beim nächsten Aufruf nur
+    neue Einträge. Bereits überschriebene Einträge werden übersprungen.
+
+    >>> for i in range(4):
+    ...     verlauf.erfassen(1, i % 2, zeitpunkt=2.0 + i)
+    >>> verlauf.seit(position)
+    (6, [(3.0, 1, 1.0), (4.0, 1, 0.0), (5.0, 1, 1.0)])
+    """
+
+    def __init__(self, groesse=8192):
+        """Erstellt einen Verlauf für höchstens groesse Einträge."""
+        self.groesse = groesse
+        self.geschrieben = 0
+        self.__zeiten = array.array("d", bytes(8 * groesse))
+        self.__werte = array.array("d", bytes(8 * groesse))
+        self.__kanaele = array.array("B", bytes(groesse))
+        self.__sperre = threading.Lock()
+
+    def erfassen(self, kanal, wert, zeitpunkt=None):
+        """Speichert einen Wert für den Kanal (0 bis 255). Ohne zeitpunkt
+        wird time.perf_counter() verwendet."""
+        if zeitpunkt is None:
+            zeitpunkt = time.perf_counter()
+
+        with self.__sperre:
+            i = self.geschrieben % self.groesse
+            self.__zeiten[i] = zeitpunkt
+            self.__kanaele[i] = kanal
+            self.__werte[i] = wert
+            self.geschrieben += 1
+
+    def seit(self, position):
+        """Gibt alle Einträge ab der gegebenen Position als Liste von Tupeln
+        (zeitpunkt, kanal, wert) und die Position für den nächsten Aufruf
+        zurück."""
+        with self.__sperre:
+            ende = self.geschrieben
+            eintraege = []
+            for n in range(max(position, ende - self.groesse), ende):
+                i = n % self.groesse
+                eintraege.append((self.__zeiten[i], self.__kanaele[i],
+                                  self.__werte[i]))
+
+        return ende, eintraege
+
+
+class Zeitleiste:
+    """Eine fortlaufende Zeitleiste auf einem Tk-Canvas, die die Werte
+    mehrerer Kanäle aus einem Verlauf als Signalverläufe darstellt.
+
+    Bei jeder Aktualisierung wird die Ansicht um die vergangene Zeit
+    verschoben und es werden nur die neuen Abschnitte angefügt. Mehrere
+    Wechsel innerhalb eines Pixels werden zu einer senkrechten Linie
+    zusammengefasst, so dass auch sehr schnelle Wechsel (z.B. Prellen)
+    sichtbar bleiben, ohne viele Elemente zu erzeugen. Abschnitte, die aus
+    dem sichtbaren Bereich geschoben wurden, werden gelöscht.
+    """
+
+    def __init__(self, master, verlauf, kanaele, pixel_pro_sekunde=100,
+                 breite=600, zeilenhoehe=30):
+        """Erstellt die Zeitleiste im Tk-Element master. kanaele ist eine
+        Liste von Tupeln (name, farbe) in der Reihenfolge der Kanalnummern im
+        verlauf."""
+        self.verlauf = verlauf
+        self.pixel_pro_sekunde = pixel_pro_sekunde
+        self.__breite = breite
+        self.__zeilenhoehe = zeilenhoehe
+        self.__kanaele = kanaele
+
+        from tkinter import Canvas
+
+        self.canvas = Canvas(master, width=breite,
+                             height=zeilenhoehe * len(kanaele),
+                             bg="white", xscrollincrement=1)
+
+        self.__start = time.perf_counter()
+        self.__position = verlauf.geschrieben
+        # linker Rand der Ansicht in Pixeln
+        self.__links = 0
+        # nicht mehr veränderte Elemente als Tupel (x, id)
+        self.__alt = collections.deque()
+        # je Kanal: aktuelle y-Position, offene Linie mit Startpunkt,
+        # letzter Wechsel und noch nicht gezeichnete Wechsel
+        self.__y_aktuell = [self.__y(k, 0) for k in range(len(kanaele))]
+        self.__offen = [(self.canvas.create_line(0, y, 0, y, fill=farbe), 0)
+                        for y, (_, farbe) in zip(self.__y_aktuell, kanaele)]
+        self.__senkrecht = [None] * len(kanaele)
+        self.__ausstehend = [None] * len(kanaele)
+        self.__namen = [
+            self.canvas.create_text(3, k * zeilenhoehe + 2, anchor="nw",
+                                    text=name, fill="grey")
+            for k, (name, _) in enumerate(kanaele)]
+
+    def __y(self, kanal, wert):
+        """Die y-Koordinate eines Wertes zwischen 0 und 1."""
+        unten = (kanal + 1) * self.__zeilenhoehe - 4
+        return unten - float(wert) * (self.__zeilenhoehe - 16)
+
+    def __x(self, zeitpunkt):
+        return int((zeitpunkt - self.__start) * self.pixel_pro_sekunde)
+
+    def aktualisieren(self, jetzt=None):
+        """Übernimmt neue Einträge aus dem Verlauf und verschiebt die
+        Ansicht. Muss im Tk-Thread aufgerufen werden."""
+        x_jetzt = self.__x(time.perf_counter() if jetzt is None else jetzt)
+
+        self.__position, eintraege = self.verlauf.seit(self.__position)
+        for zeitpunkt, kanal, wert in eintraege:
+            if kanal >= len(self.__kanaele):
+                continue
+
+            x = self.__x(zeitpunkt)
+            y = self.__y(kanal, wert)
+            offen = self.__ausstehend[kanal]
+            if offen is not None and offen[0] != x:
+                self.__wechsel_zeichnen(kanal, *offen)
+                offen = self.__ausstehend[kanal] = None
+
+            if offen is None:
+                y_alt = self.__y_aktuell[kanal]
+                if y != y_alt:
+                    self.__ausstehend[kanal] = [x, min(y, y_alt),
+                                                max(y, y_alt), y, y_alt]
+            else:
+                offen[1] = min(offen[1], y)
+                offen[2] = max(offen[2], y)
+                offen[3] = y
+
+        for kanal, offen in enumerate(self.__ausstehend):
+            if offen is not None:
+                self.__wechsel_zeichnen(kanal, *offen)
+                self.__ausstehend[kanal] = None
+
+        # offene Linien bis zum aktuellen Zeitpunkt verlängern
+        for kanal, (linie, x_start) in enumerate(self.__offen):
+            y = self.__y_aktuell[kanal]
+            self.canvas.coords(linie, x_start, y, max(x_start, x_jetzt), y)
+
+        # Ansicht verschieben und Namen am linken Rand halten
+        ziel = x_jetzt - self.__breite + 10
+        if ziel > self.__links:
+            self.canvas.xview_scroll(ziel - self.__links, "units")
+            self.__links = ziel
+            for k, name in enumerate(self.__namen):
+                self.canvas.coords(name, self.__links + 3,
+                                   k * self.__zeilenhoehe + 2)
+
+        while self.__alt and self.__alt[0][0] < self.__links:
+            self.canvas.delete(self.__alt.popleft()[1])
+
+    def __wechsel_zeichnen(self, kanal, x, y_min, y_max, y_neu, y_alt):
+        """Zeichnet alle Wechsel eines Kanals innerhalb eines Pixels."""
+        farbe = self.__kanaele[kanal][1]
+        linie, x_start = self.__offen[kanal]
+        senkrecht = self.__senkrecht[kanal]
+
+        if senkrecht is not None and senkrecht[1] == x:
+            # Der letzte Wechsel lag im selben Pixel: Linie verlängern
+            y_min = min(y_min, senkrecht[2])
+            y_max = max(y_max, senkrecht[3])
+            self.canvas.coords(senkrecht[0], x, y_min, x, y_max)
+            self.canvas.coords(linie, x, y_neu, x, y_neu)
+        else:
+            self.canvas.coords(linie, x_start, y_alt, x, y_alt)
+            self.__alt.append((x, linie))
+            senkrecht_id = self.canvas.create_line(x, y_min, x, y_max,
+                                                   fill=farbe)
+            self.__alt.append((x, senkrecht_id))
+            linie = self.canvas.create_line(x, y_neu, x, y_neu, fill=farbe)
+            senkrecht = (senkrecht_id,)
+
+        self.__senkrecht[kanal] = (senkrecht[0], x, y_min, y_max)
+        self.__offen[kanal] = (linie, x)
+        self.__y_aktuell[kanal] = y_neu
+
+
 class EAModulGui(EAModulVisualisierer):
     """
     Eine GUI für ein EAModul mit zwei Tastern und drei LEDs.
+
+    Die LEDs können aus beliebigen Threads (z.B. GPIO- oder Netzwerk-Threads)
+    geschaltet werden. Die neuen Werte werden dabei nur vermerkt; die
+    Widgets werden ausschließlich im Tk-Thread höchstens fps-mal pro Sekunde
+    aktualisiert. Zwischenzustände werden übersprungen.
+
+    Unter den LEDs zeigt eine Zeitleiste den Verlauf der LEDs und der
+    Taster. LEDs und Taster werden bei jeder Änderung mit ihrem Zeitpunkt
+    erfasst; die Taster melden ihre Wechsel über taster_wechsel_registrieren,
+    so dass auch kurzes Prellen sichtbar wird.
     """
 
-    def __init__(self, eamodul):
+    FARBEN = ["red", "yellow", "green"]
+    KANAELE = [("rot", "red"), ("gelb", "goldenrod"), ("grün", "green"),
+               ("Taster 0", "black"), ("Taster 1", "black")]
+
+    def __init__(self, eamodul, fps=60, zeitleiste=True, entprellzeit=0):
         """
-        Erstellt eine GUI für das gegebenen EAModul.
+        Erstellt eine GUI für das gegebenen EAModul. Das Fenster wird erst
+        mit run() angezeigt. Mit zeitleiste=False wird keine Zeitleiste
+        angezeigt. Die entprellzeit in Millisekunden gilt für die Wechsel der
+        Taster in der Zeitleiste, sofern die GUI die Taster als Erste
+        verfolgt.
         """
+        # Verlauf vor der Registrierung der Beobachter anlegen
+        self.verlauf = Verlauf() if zeitleiste else None
         super().__init__(eamodul)
+        if self.verlauf is not None:
+            self.__taster_verfolgen(entprellzeit)
+
+        # Neueste Werte der LEDs und die zuletzt angezeigten Werte
+        self.__leds = [0, 0, 0]
+        self.__angezeigt = [0, 0, 0]
+        self.__intervall = max(1, int(1000 / fps))
 
         # gui init
-        fenster = Tk()
-        fenster.title("EAModul - GUI")
-        fenster.geometry('300x300')
+        # tkinter erst hier laden, damit die Konsole ohne Tk auskommt
+        from tkinter import Tk, Label, StringVar, YES, BOTH
+
+        self.fenster = Tk()
+        self.fenster.title("EAModul - GUI")
+        self.fenster.geometry('600x450' if zeitleiste else '300x300')
 
         # TODO entfernen, wenn nicht mehr gebraucht
         """
-        btn_taster0 = Button(fenster, text="Taster 0",
+        btn_taster0 = Button(self.fenster, text="Taster 0",
                              command=self.__taster0_gedrueckt)
         btn_taster0.pack()
 
-        btn_taster1 = Button(fenster, text="Taster 1",
+        btn_taster1 = Button(self.fenster, text="Taster 1",
                              command=self.__taster1_gedrueckt)
         btn_taster1.pack()
         """
@@ -99,21 +329,40 @@ class EAModulGui(EAModulVisualisierer):
         # LEDs erzeugen
         # TODO Icons statt Text verwenden
         self.var_rot = StringVar(value="0")
-        self.lbl_led_rot = Label(fenster, textvariable=self.var_rot,
+        self.lbl_led_rot = Label(self.fenster, textvariable=self.var_rot,
                                  bg='lightgrey')
         self.lbl_led_rot.pack(expand=YES, fill=BOTH)
 
         self.var_gelb = StringVar(value="0")
-        self.lbl_led_gelb = Label(fenster, textvariable=self.var_gelb,
+        self.lbl_led_gelb = Label(self.fenster, textvariable=self.var_gelb,
                                   bg='lightgrey')
         self.lbl_led_gelb.pack(expand=YES, fill=BOTH)
 
         self.var_gruen = StringVar(value="0")
-        self.lbl_led_gruen = Label(fenster, textvariable=self.var_gruen,
+        self.lbl_led_gruen = Label(self.fenster, textvariable=self.var_gruen,
                                    bg='lightgrey')
         self.lbl_led_gruen.pack(expand=YES, fill=BOTH)
 
-        fenster.mainloop()
+        self.__variablen = [self.var_rot, self.var_gelb, self.var_gruen]
+        self.__labels = [self.lbl_led_rot, self.lbl_led_gelb,
+                         self.lbl_led_gruen]
+
+        self.zeitleiste = None
+        if zeitleiste:
+            self.zeitleiste = Zeitleiste(self.fenster, self.verlauf,
+                                         self.KANAELE)
+            self.zeitleiste.canvas.pack(fill=BOTH)
+
+        self.fenster.after(self.__intervall, self.__aktualisieren)
+
+    def run(self):
+        """Zeigt das Fenster an. Der Aufruf blockiert, bis das Fenster
+        geschlossen wird."""
+        self.fenster.mainloop()
+
+    def schliessen(self):
+        """Schließt das Fenster. Muss im Tk-Thread aufgerufen werden."""
+        self.fenster.destroy()
 
     def __taster0_gedrueckt(self):
         self._ea.schalte_led(EAModul.LED_ROT, True)
@@ -132,20 +381,49 @@ class EAModulGui(EAModulVisualisierer):
         else:
             return "lightgrey"
 
+    def __aktualisieren(self):
+        """Überträgt geänderte LED-Werte in die Widgets. Läuft im Tk-Thread
+        und plant sich selbst erneut ein."""
+        for i, wert in enumerate(list(self.__leds)):
+            if wert != self.__angezeigt[i]:
+                self.__variablen[i].set(wert)
+                self.__labels[i].configure(
+                    bg=self.__farbe_fuer_ledwert(wert, self.FARBEN[i]))
+                self.__angezeigt[i] = wert
+
+        if self.zeitleiste is not None:
+            self.zeitleiste.aktualisieren()
+
+        self.fenster.after(self.__intervall, self.__aktualisieren)
+
+    def __taster_verfolgen(self, entprellzeit):
+        """Erfasst den aktuellen Zustand der Taster und danach jeden Wechsel
+        mit seinem Zeitpunkt im Verlauf."""
+        for nr in range(2):
+            self.verlauf.erfassen(3 + nr, self._ea.taster_gedrueckt(nr))
+            try:
+                self._ea.taster_wechsel_registrieren(
+                    nr, lambda gedrueckt, nr=nr: self.verlauf.erfassen(
+                        3 + nr, gedrueckt), entprellzeit)
+            except RuntimeError as e:
+                # Der Pin meldet bereits nur steigende Flanken
+                # (taster_event_registrieren).
+                log.warning("Taster %d wird nicht in der Zeitleiste "
+                            "angezeigt: %s", nr, e)
+
+    def __led_update(self, farbe, neuer_wert):
+        self.__leds[farbe] = neuer_wert
+        if self.verlauf is not None:
+            self.verlauf.erfassen(farbe, neuer_wert)
+
     def _rote_led_update(self, neuer_wert):
-        self.var_rot.set(neuer_wert)
-        self.lbl_led_rot.configure(bg=self.__farbe_fuer_ledwert(neuer_wert,
-                                                                "red"))
+        self.__led_update(0, neuer_wert)
 
     def _gelbe_led_update(self, neuer_wert):
-        self.var_gelb.set(neuer_wert)
-        self.lbl_led_gelb.configure(bg=self.__farbe_fuer_ledwert(neuer_wert,
-                                                                 "yellow"))
+        self.__led_update(1, neuer_wert)
 
     def _gruene_led_update(self, neuer_wert):
-        self.var_gruen.set(neuer_wert)
-        self.lbl_led_gruen.configure(bg=self.__farbe_fuer_ledwert(neuer_wert,
-                                                                  "green"))
+        self.__led_update(2, neuer_wert)
 
 
 class EAModulKonsole(EAModulVisualisierer):
@@ -156,6 +434,17 @@ class EAModulKonsole(EAModulVisualisierer):
 
     Wenn nun die LEDs geschaltet werden, wird dies durch eine bunte
     Visualisierung auf der Konsole angezeigt.
+
+    Die Ausgabe erfolgt in einem eigenen Thread, so dass das Schalten der
+    LEDs nicht auf die Konsole warten muss. Es werden höchstens fps Bilder
+    pro Sekunde gezeichnet; Zwischenzustände werden dabei übersprungen. Nach
+    dem ersten Bild werden nur noch die LEDs neu gezeichnet, die sich
+    geändert haben. Helligkeiten eines DimmbarenEAModuls werden als
+    abgestufte Farben dargestellt.
+
+    Mit schliessen() endet der Thread und der letzte Zustand wird gezeichnet,
+    damit das letzte Bild nicht durch die Begrenzung der Bildrate verloren
+    geht. Beim Beenden des Programms geschieht dies automatisch.
     """
 
     # nach http://ascii-table.com/ansi-escape-sequences.php
@@ -169,46 +458,111 @@ class EAModulKonsole(EAModulVisualisierer):
     ANSI_ALL_ATTRIBUTES_OFF = "\033[0m"
     ANSI_ERASE_DISPLAY = "\033[2J"
     ANSI_CURSOR_HOME = "\033[;H"
+    ANSI_CURSOR_POSITION = "\033[{zeile};{spalte}H"
     ANSI_BOLD = "\033[1m"
     ANSI_SAVE_CURSOR = "\033[s"
     ANSI_RESTORE_CURSOR = "\033[u"
+    # Hintergrundfarbe als RGB-Wert (24 Bit)
+    ANSI_BG_RGB = "\033[48;2;{r};{g};{b}m"
 
-    def __init__(self, eamodul):
+    FARBNAMEN = [" rot  ", " gelb ", " grün "]
+    ANSI_FARBEN = [ANSI_BG_RED, ANSI_BG_YELLOW, ANSI_BG_GREEN]
+    RGB_FARBEN = [(255, 0, 0), (255, 255, 0), (0, 255, 0)]
+
+    def __init__(self, eamodul, fps=25, ausgabe=None):
+        """Erstellt eine Visualisierung, die höchstens fps Bilder pro Sekunde
+        auf die ausgabe (Standard: sys.stdout) schreibt."""
         super().__init__(eamodul)
 
         self.__leds = [0, 0, 0]
+        self.__gezeichnet = None
+        self.__intervall = 1 / fps
+        self.__ausgabe = ausgabe
+        self.__geaendert = threading.Event()
+        self.__sperre = threading.Lock()
+        self.__geschlossen = threading.Event()
+        self.__thread = threading.Thread(target=self.__zeichnen_fortlaufend,
+                                         daemon=True)
+        self.__thread.start()
+        atexit.register(self.schliessen)
 
     def _rote_led_update(self, neuer_wert):
         self.__leds[0] = neuer_wert
-        self.__print_leds()
+        self.__geaendert.set()
 
     def _gelbe_led_update(self, neuer_wert):
         self.__leds[1] = neuer_wert
-        self.__print_leds()
+        self.__geaendert.set()
 
     def _gruene_led_update(self, neuer_wert):
         self.__leds[2] = neuer_wert
-        self.__print_leds()
-
-    def __print_leds(self):
-        farbnamen = [" rot  ", " gelb ", " grün "]
-        ansifarben = [self.ANSI_BG_RED, self.ANSI_BG_YELLOW, self.ANSI_BG_GREEN]
-
-        s = self.ANSI_ERASE_DISPLAY + self.ANSI_CURSOR_HOME + \
-            "LEDs: " + self.ANSI_BOLD + self.ANSI_FG_WHITE
-
-        for i in range(len(self.__leds)):
-
-            if self.__leds[i] == 1:
-                s += ansifarben[i]
+        self.__geaendert.set()
+
+    def zeichnen(self):
+        """Zeichnet den aktuellen Zustand sofort. Beim ersten Aufruf wird die
+        Konsole gelöscht, danach werden nur geänderte LEDs gezeichnet."""
+        with self.__sperre:
+            leds = list(self.__leds)
+            if self.__gezeichnet is None:
+                s = (self.ANSI_ERASE_DISPLAY + self.ANSI_CURSOR_HOME +
+                     "LEDs: " + "".join(self.__zelle(i, wert)
+                                        for i, wert in enumerate(leds)) +
+                     "\n")
             else:
-                s += self.ANSI_BG_BLACK
-
-            s += farbnamen[i]
+                s = "".join(
+                    self.ANSI_CURSOR_POSITION.format(zeile=1,
+                                                     spalte=7 + 6 * i) +
+                    self.__zelle(i, wert)
+                    for i, wert in enumerate(leds)
+                    if wert != self.__gezeichnet[i])
+                if s:
+                    s = self.ANSI_SAVE_CURSOR + s + self.ANSI_RESTORE_CURSOR
+
+            self.__gezeichnet = leds
+            if s:
+                ausgabe = self.__ausgabe or sys.stdout
+                ausgabe.write(s)
+                ausgabe.flush()
+
+    def schliessen(self):
+        """Beendet den Thread der Konsole und zeichnet den letzten Zustand.
+        Weitere Aufrufe haben keine Wirkung."""
+        if self.__geschlossen.is_set():
+            return
+
+        self.__geschlossen.set()
+        atexit.unregister(self.schliessen)
+        self.__geaendert.set()
+        if threading.current_thread() is not self.__thread:
+            self.__thread.join()
+        self.zeichnen()
+
+    def __zelle(self, i, wert):
+        """Die Ausgabe für eine LED mit Farbe und Namen."""
+        if wert == 1:
+            farbe = self.ANSI_FARBEN[i]
+        elif wert == 0:
+            farbe = self.ANSI_BG_BLACK
+        else:
+            r, g, b = [int(anteil * wert) for anteil in self.RGB_FARBEN[i]]
+            farbe = self.ANSI_BG_RGB.format(r=r, g=g, b=b)
 
-        s += self.ANSI_ALL_ATTRIBUTES_OFF
+        return (farbe + self.ANSI_BOLD + self.ANSI_FG_WHITE +
+                self.FARBNAMEN[i] + self.ANSI_ALL_ATTRIBUTES_OFF)
 
-        print(s)
+    def __zeichnen_fortlaufend(self):
+        """Zeichnet im eigenen Thread nach Änderungen, höchstens aber fps
+        Bilder pro Sekunde."""
+        while True:
+            self.__geaendert.wait()
+            if self.__geschlossen.is_set():
+                return
+            self.__geaendert.clear()
+            start = time.perf_counter()
+            self.zeichnen()
+            # Beim Schließen nicht bis zum nächsten Bild warten
+            self.__geschlossen.wait(max(0, self.__intervall -
+                                        (time.perf_counter() - start)))
 
 
 __eamodul = None
@@ -244,13 +598,14 @@ def demo_cli():
     ea.taster_event_registrieren(0, taster0_gedrueckt)
     ea.taster_event_registrieren(1, taster1_gedrueckt)
 
-    EAModulKonsole(ea)
+    konsole = EAModulKonsole(ea)
 
     try:
         while True:
             time.sleep(0.2)
 
     except KeyboardInterrupt:
+        konsole.schliessen()
         ea.cleanup()
 
 
@@ -263,7 +618,7 @@ def demo_cli_blinken():
 
     input(str(demo_cli_blinken.__doc__) + "\n(Enter)")
     ea = EAModul()
-    EAModulKonsole(ea)
+    konsole = EAModulKonsole(ea)
 
     ea.schalte_led(EAModul.LED_ROT, 1)
     time.sleep(0.5)
@@ -279,6 +634,7 @@ def demo_cli_blinken():
     time.sleep(0.5)
     ea.schalte_led(EAModul.LED_GRUEN, 1)
 
+    konsole.schliessen()
     ea.cleanup()
 
 
@@ -299,11 +655,13 @@ def demo_taster():
         _ea.schalte_led(EAModul.LED_ROT, ea.taster_gedrueckt(1))
 
     ea = __eamodul_erzeugen()
-    ea.taster_event_registrieren(0, taster0_gedrueckt)
-    ea.taster_event_registrieren(1, taster1_gedrueckt)
+    # Die GUI teilt sich die Wechsel der Taster mit dem Demo, daher kein
+    # taster_event_registrieren.
+    ea.taster_wechsel_registrieren(0, taster0_gedrueckt)
+    ea.taster_wechsel_registrieren(1, taster1_gedrueckt)
 
     # GUI startet und blockiert bis zum Ende
-    EAModulGui(ea)
+    EAModulGui(ea).run()
 
     ea.cleanup()
 
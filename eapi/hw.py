@@ -40,15 +40,127 @@ Zum Schluss fahren wir das Modul wieder herunter:
 
 Schaue in die Dokumentation der anderen Methoden, um weitere
 Quelltextbeispiele zu finden.
+
+Wo ein Modul im Betrieb seine Zeit verbringt, zeigt eine Laufzeitmessung, die
+jederzeit ein- und wieder ausgeschaltet werden kann (s.
+EAModul.messung_einschalten).
+
+Ein Programm, das oft neu gestartet wird, erstellt sein Modul mit warm=True.
+Es übernimmt dann bereits eingerichtete Pins samt den Pegeln der LEDs, statt
+sie zurückzusetzen, und lässt die Pins beim cleanup stehen. Ein Neustart ist
+so an den LEDs nicht zu sehen.
 """
 
-# Versuche, die Bibliothek für GPIO-Pins zu laden. Wenn dies scheitert, wird
-# ein Dummy verwendet.
-try:
-    # TODO switch to gpiozero
-    import RPi.GPIO as GPIO
-except ImportError:
-    import eapi.GPIODummy as GPIO
+import bisect
+import numbers
+import threading
+import time
+import warnings
+
+# Die Bibliothek für GPIO-Pins wird erst beim Erstellen des ersten Moduls
+# geladen (s. gpio_laden), damit der Import von eapi.hw schnell bleibt.
+GPIO = None
+
+# Pins, die in diesem Prozess bereits eingerichtet wurden, mit ihrer Richtung.
+# Ein warm gestartetes Modul richtet sie nicht erneut ein.
+_eingerichtet = {}
+
+
+def gpio_laden():
+    """Lädt die Bibliothek für GPIO-Pins, falls noch nicht geschehen, und
+    gibt sie zurück. Wenn RPi.GPIO nicht vorhanden ist, wird ein Dummy
+    verwendet."""
+    global GPIO
+
+    if GPIO is None:
+        try:
+            # TODO switch to gpiozero
+            import RPi.GPIO as gpio
+        except ImportError:
+            import eapi.GPIODummy as gpio
+        GPIO = gpio
+
+    return GPIO
+
+
+class Laufzeiten:
+    """Sammelt die Laufzeiten der Operationen eines EAModuls und seiner
+    Beobachter.
+
+    Für jede Operation (z.B. 'schalte_led' oder 'gpio.output') werden die
+    Anzahl der Aufrufe, die Summe und das Maximum der Laufzeiten sowie ein
+    Histogramm mit festen Intervallen (in Sekunden) geführt. Für jeden
+    Beobachter der LEDs werden Anzahl, Summe und Maximum geführt.
+
+    >>> laufzeiten = Laufzeiten()
+    >>> laufzeiten.erfassen("schalte_led", 0.000004)
+    >>> laufzeiten.erfassen("schalte_led", 0.00002)
+    >>> operation = laufzeiten.schnappschuss()["operationen"]["schalte_led"]
+    >>> operation["anzahl"], operation["max"]
+    (2, 2e-05)
+    """
+
+    GRENZEN = (0.000001, 0.0000025, 0.000005, 0.00001, 0.000025, 0.00005,
+               0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1)
+
+    def __init__(self, langsamste=5):
+        """Erstellt eine leere Messung. Im Schnappschuss werden die
+        langsamste Beobachter mit der größten Laufzeit gesondert
+        aufgeführt."""
+        self.langsamste = langsamste
+        # Name -> [Anzahl, Summe, Maximum, Histogramm]
+        self.__operationen = {}
+        # Beobachter -> [LED-Farbe, Anzahl, Summe, Maximum]
+        self.__beobachter = {}
+        self.__sperre = threading.Lock()
+
+    def erfassen(self, operation, sekunden):
+        """Erfasst eine Laufzeit der Operation."""
+        with self.__sperre:
+            werte = self.__operationen.get(operation)
+            if werte is None:
+                werte = self.__operationen[operation] = [
+                    0, 0.0, 0.0, [0] * (len(self.GRENZEN) + 1)]
+            werte[0] += 1
+            werte[1] += sekunden
+            if sekunden > werte[2]:
+                werte[2] = sekunden
+            werte[3][bisect.bisect_left(self.GRENZEN, sekunden)] += 1
+
+    def beobachter_erfassen(self, led_farbe, methode, sekunden):
+        """Erfasst die Laufzeit eines Beobachters der LED."""
+        with self.__sperre:
+            werte = self.__beobachter.get(methode)
+            if werte is None:
+                werte = self.__beobachter[methode] = [led_farbe, 0, 0.0, 0.0]
+            werte[1] += 1
+            werte[2] += sekunden
+            if sekunden > werte[3]:
+                werte[3] = sekunden
+
+    def schnappschuss(self):
+        """Gibt alle Messwerte als dict zurück. Die Beobachter sind nach
+        ihrer größten Laufzeit absteigend sortiert."""
+        with self.__sperre:
+            operationen = {
+                name: {"anzahl": anzahl, "summe": summe, "max": maximum,
+                       "histogramm": list(histogramm)}
+                for name, (anzahl, summe, maximum, histogramm)
+                in self.__operationen.items()}
+            beobachter = [
+                {"name": getattr(methode, "__qualname__", repr(methode)),
+                 "led": led_farbe, "anzahl": anzahl, "summe": summe,
+                 "max": maximum}
+                for methode, (led_farbe, anzahl, summe, maximum)
+                in self.__beobachter.items()]
+
+        beobachter.sort(key=lambda b: b["max"], reverse=True)
+        return {
+            "grenzen": list(self.GRENZEN),
+            "operationen": operationen,
+            "beobachter": beobachter,
+            "langsamste": [b["name"] for b in beobachter[:self.langsamste]],
+        }
 
 
 class EAModul:
@@ -60,7 +172,8 @@ class EAModul:
     LED_GRUEN = 2
 
     def __init__(self, pin_taster0=29, pin_taster1=31,
-                 pin_led_rot=33, pin_led_gelb=35, pin_led_gruen=37):
+                 pin_led_rot=33, pin_led_gelb=35, pin_led_gruen=37, *,
+                 warm=False):
         """
         Das Modul wird mit den gegebenen Pins konfiguriert.
 
@@ -85,24 +198,124 @@ class EAModul:
         >>> ea2 = EAModul(pin_taster0=29, pin_taster1=31, pin_led_rot=33,
         ...               pin_led_gelb=35, pin_led_gruen=37)
         >>> ea2.cleanup()
-        """
-        GPIO.setmode(GPIO.BOARD)
 
+        Mit warm=True werden Pins, die bereits wie erwartet eingerichtet
+        sind, übernommen: Die LEDs behalten ihren Pegel, und Pins, die dieser
+        Prozess schon eingerichtet hat, werden nicht erneut eingerichtet. Ob
+        alle Pins übernommen wurden, steht in warmstart. Beim cleanup bleiben
+        die LEDs dann stehen.
+
+        >>> ea3 = EAModul()
+        >>> ea3.schalte_led(EAModul.LED_GELB, 1)
+        >>> ea4 = EAModul(warm=True)
+        >>> ea4.warmstart, ea4.led_wert(EAModul.LED_GELB)
+        (True, 1)
+        >>> ea4.cleanup()
+        >>> ea3.cleanup()
+        """
+        gpio_laden()
         self._taster = [pin_taster0, pin_taster1]
-        GPIO.setup(self._taster, GPIO.IN)
-
         self._leds = [pin_led_rot, pin_led_gelb, pin_led_gruen]
-        GPIO.setup(self._leds, GPIO.OUT)
+        self.warm = warm
+
+        if warm:
+            self.warmstart = self.__warm_einrichten()
+        else:
+            GPIO.setmode(GPIO.BOARD)
+            GPIO.setup(self._taster, GPIO.IN)
+            GPIO.setup(self._leds, GPIO.OUT)
+            _eingerichtet.update(dict.fromkeys(self._taster, GPIO.IN))
+            _eingerichtet.update(dict.fromkeys(self._leds, GPIO.OUT))
+            self.warmstart = False
 
         # Observer initialisieren
         self.__observer_leds = dict()
         self.__observer_leds[EAModul.LED_ROT] = []
         self.__observer_leds[EAModul.LED_GELB] = []
         self.__observer_leds[EAModul.LED_GRUEN] = []
-
-    def led_event_registrieren(self, led_farbe, methode):
+        # Methoden, die über Wechsel der Taster informiert werden
+        self.__observer_taster = {nr: [] for nr in range(len(self._taster))}
+        # Zustandsblock, falls der Zustand veröffentlicht wird
+        self.__zustand = None
+
+        # Laufzeitmessung, solange sie eingeschaltet ist
+        self.laufzeiten = None
+
+    def __warm_einrichten(self):
+        """Richtet nur die Pins ein, die dieser Prozess noch nicht
+        eingerichtet hat. Ausgänge, die bereits Ausgänge sind, behalten dabei
+        ihren Pegel. Gibt zurück, ob alle Pins schon passend eingerichtet
+        waren."""
+        if GPIO.getmode() != GPIO.BOARD:
+            GPIO.setmode(GPIO.BOARD)
+
+        uebernommen = True
+        with warnings.catch_warnings():
+            # RPi.GPIO warnt, wenn ein Pin schon von einem anderen Prozess
+            # eingerichtet wurde. Genau diese Pins sollen übernommen werden.
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for pins, richtung in ((self._taster, GPIO.IN),
+                                   (self._leds, GPIO.OUT)):
+                for pin in pins:
+                    if _eingerichtet.get(pin) == richtung:
+                        continue
+                    if GPIO.gpio_function(pin) != richtung:
+                        uebernommen = False
+                    # Ohne initial behält ein Ausgang seinen Pegel.
+                    GPIO.setup(pin, richtung)
+                    _eingerichtet[pin] = richtung
+        return uebernommen
+
+    # Methoden, die während einer Laufzeitmessung durch ihre messende
+    # Variante (_<name>_gemessen) ersetzt werden
+    GEMESSENE_METHODEN = ("schalte_led", "schalte_leds", "taster_gedrueckt",
+                          "_notify_leds")
+
+    def messung_einschalten(self, laufzeiten=None):
+        """Schaltet die Laufzeitmessung ein und gibt die Laufzeiten zurück,
+        in denen gemessen wird.
+
+        Dazu werden die Methoden des Moduls durch messende Varianten
+        ersetzt. Ohne Messung wird daher keine zusätzliche Zeit benötigt.
+        Gemessen werden die Aufrufe von schalte_led, schalte_leds und
+        taster_gedrueckt, die Zugriffe auf die GPIO-Pins sowie die
+        Beobachter der LEDs.
+
+        >>> def beobachter(wert):
+        ...     pass
+        >>> ea = EAModul()
+        >>> ea.led_event_registrieren(EAModul.LED_ROT, beobachter)
+        >>> laufzeiten = ea.messung_einschalten()
+        >>> ea.schalte_leds(1, 0, 1)
+        >>> schnappschuss = laufzeiten.schnappschuss()
+        >>> schnappschuss["operationen"]["schalte_led"]["anzahl"]
+        3
+        >>> schnappschuss["langsamste"]
+        ['beobachter']
+        >>> ea.messung_ausschalten()
+        >>> ea.schalte_led(EAModul.LED_ROT, 0)
+        >>> laufzeiten.schnappschuss()["operationen"]["schalte_led"]["anzahl"]
+        3
+        >>> ea.cleanup()
+        """
+        self.laufzeiten = laufzeiten if laufzeiten is not None else \
+            Laufzeiten()
+        for name in self.GEMESSENE_METHODEN:
+            setattr(self, name, getattr(self, "_" + name.lstrip("_") +
+                                        "_gemessen"))
+        return self.laufzeiten
+
+    def messung_ausschalten(self):
+        """Schaltet die Laufzeitmessung aus. Die bisherigen Laufzeiten
+        bleiben erhalten."""
+        for name in self.GEMESSENE_METHODEN:
+            self.__dict__.pop(name, None)
+        self.laufzeiten = None
+
+    def led_event_registrieren(self, led_farbe, methode, zuerst=False):
         """Registriert eine Methode, die ausgeführt wird, sobald die
-        entsprechende LED ihren Wert ändert.
+        entsprechende LED ihren Wert ändert. Mit zuerst=True wird sie vor
+        allen bisher registrierten Methoden aufgerufen.
 
         Die Methode wird über alle Veränderungen an der LED informiert. Dazu
         wird die übergebene Methode aufgerufen.
@@ -129,7 +342,10 @@ class EAModul:
 
         >>> ea.cleanup()
         """
-        self.__observer_leds[led_farbe].append(methode)
+        if zuerst:
+            self.__observer_leds[led_farbe].insert(0, methode)
+        else:
+            self.__observer_leds[led_farbe].append(methode)
 
     def _notify_leds(self, led_farbe, neuer_wert):
         """Alle registrierten Beobachter werden über eine Änderung
@@ -138,6 +354,17 @@ class EAModul:
         for methode in self.__observer_leds[led_farbe]:
             methode(neuer_wert)
 
+    def _notify_leds_gemessen(self, led_farbe, neuer_wert):
+        """Informiert die Beobachter und misst dabei ihre Laufzeiten."""
+        laufzeiten = self.laufzeiten
+        uhr = time.perf_counter
+        start = uhr()
+        for methode in self.__observer_leds[led_farbe]:
+            beginn = uhr()
+            methode(neuer_wert)
+            laufzeiten.beobachter_erfassen(led_farbe, methode, uhr() - beginn)
+        laufzeiten.erfassen("beobachter", uhr() - start)
+
     def taster_gedrueckt(self, num=0):
         """
         Liest den Wert des Tasters mit der gegebenen Nummer aus und gibt den
@@ -188,6 +415,20 @@ class EAModul:
         self.schalte_led(led_farbe, 1 - alter_wert)
     '''
 
+    def led_wert(self, led_farbe):
+        """Liest den aktuellen Wert (0 oder 1) einer LED vom Pin zurück.
+
+        >>> ea_modul = EAModul()
+        >>> ea_modul.schalte_led(EAModul.LED_GRUEN, 1)
+        >>> ea_modul.led_wert(EAModul.LED_GRUEN)
+        1
+        >>> ea_modul.cleanup()
+        """
+        if 0 <= led_farbe < len(self._leds):
+            return 1 if GPIO.input(self._leds[led_farbe]) else 0
+        else:
+            raise ValueError("Falsche LED-Farbe.")
+
     def schalte_led(self, led_farbe, an_aus):
         """Schalte die LED mit der gegebenen Nummer ein (1) oder aus (0).
 
@@ -203,16 +444,48 @@ class EAModul:
         >>> ea_modul.schalte_led(EAModul.LED_GRUEN, 1)
         >>> ea_modul.cleanup()
         """
-
-        if 0 <= led_farbe < len(self._leds):
-            if an_aus == 1 or an_aus == 0:
-                GPIO.output(self._leds[led_farbe], an_aus)
-                self._notify_leds(led_farbe, an_aus)
-            else:
-                raise ValueError("Wert für an_aus muss 0 oder 1 sein.")
-        else:
+        self._led_pruefen(led_farbe, an_aus)
+        GPIO.output(self._leds[led_farbe], an_aus)
+        self._notify_leds(led_farbe, an_aus)
+
+    def _schalte_led_gemessen(self, led_farbe, an_aus):
+        """Wie schalte_led, misst aber die Laufzeiten des Aufrufs und des
+        Schaltens des Pins. Die Differenz zu GPIO-Zugriff und Beobachtern
+        entfällt auf die Prüfung der Argumente."""
+        uhr = time.perf_counter
+        start = uhr()
+        self._led_pruefen(led_farbe, an_aus)
+        beginn = uhr()
+        GPIO.output(self._leds[led_farbe], an_aus)
+        self.laufzeiten.erfassen("gpio.output", uhr() - beginn)
+        self._notify_leds(led_farbe, an_aus)
+        self.laufzeiten.erfassen("schalte_led", uhr() - start)
+
+    def _led_farbe_pruefen(self, led_farbe):
+        """Löst einen ValueError aus, wenn led_farbe keine LED des Moduls
+        bezeichnet."""
+        if not (isinstance(led_farbe, numbers.Integral) and
+                0 <= led_farbe < len(self._leds)):
             raise ValueError("Falsche LED-Farbe.")
 
+    def _led_pruefen(self, led_farbe, an_aus):
+        """Prüft die Argumente von schalte_led und _schalte_led_gemessen.
+
+        >>> ea_modul = EAModul()
+        >>> ea_modul.schalte_led(EAModul.LED_ROT, 0.5)
+        Traceback (most recent call last):
+        ...
+        ValueError: Wert für an_aus muss 0 oder 1 sein.
+        >>> ea_modul.schalte_led("rot", 1)
+        Traceback (most recent call last):
+        ...
+        ValueError: Falsche LED-Farbe.
+        >>> ea_modul.cleanup()
+        """
+        self._led_farbe_pruefen(led_farbe)
+        if not (an_aus == 1 or an_aus == 0):
+            raise ValueError("Wert für an_aus muss 0 oder 1 sein.")
+
     def schalte_leds(self, rot_anaus, gelb_anaus, gruen_anaus):
         """Schalte alle drei LEDs zu gleichen Zeit an oder aus.
 
@@ -226,6 +499,18 @@ class EAModul:
         self.schalte_led(EAModul.LED_GELB, gelb_anaus)
         self.schalte_led(EAModul.LED_GRUEN, gruen_anaus)
 
+    def _schalte_leds_gemessen(self, rot_anaus, gelb_anaus, gruen_anaus):
+        start = time.perf_counter()
+        EAModul.schalte_leds(self, rot_anaus, gelb_anaus, gruen_anaus)
+        self.laufzeiten.erfassen("schalte_leds", time.perf_counter() - start)
+
+    def _taster_gedrueckt_gemessen(self, num=0):
+        start = time.perf_counter()
+        gedrueckt = EAModul.taster_gedrueckt(self, num)
+        self.laufzeiten.erfassen("taster_gedrueckt",
+                                 time.perf_counter() - start)
+        return gedrueckt
+
     def taster_event_registrieren(self, taster_nr, methode):
         """Registriere eine Methode, die bei Betätigung eines Tasters
         ausgeführt wird.
@@ -251,14 +536,109 @@ class EAModul:
         GPIO.add_event_detect(self._taster[taster_nr], GPIO.RISING,
                               callback=methode, bouncetime=200)
 
+    def taster_wechsel_registrieren(self, taster_nr, methode,
+                                    entprellzeit=20):
+        """Registriere eine Methode, die beim Drücken und beim Loslassen eines
+        Tasters ausgeführt wird.
+
+        Die Methode wird mit True (gedrückt) oder False (losgelassen)
+        aufgerufen. Wechsel innerhalb von entprellzeit Millisekunden werden
+        ignoriert; mit entprellzeit=0 wird jeder Wechsel gemeldet. Für einen
+        Taster können mehrere Methoden registriert
+        werden; es gilt die entprellzeit der ersten. Für einen Taster kann
+        entweder diese Methode oder taster_event_registrieren verwendet
+        werden.
+
+        >>> def taster0_gewechselt(gedrueckt):
+        ...  print("Taster 0 gedrückt:", gedrueckt)
+
+        >>> ea_modul = EAModul()
+        >>> ea_modul.taster_wechsel_registrieren(0, taster0_gewechselt)
+        >>> ea_modul.cleanup()
+        """
+        if taster_nr < 0 or taster_nr >= len(self._taster):
+            raise ValueError("Falsche Taster Nummer: " + str(taster_nr))
+
+        methoden = self.__observer_taster[taster_nr]
+        if not methoden:
+            # RPi.GPIO lehnt eine bouncetime von 0 ab; ohne Angabe wird
+            # nicht entprellt.
+            entprellen = {"bouncetime": entprellzeit} if entprellzeit else {}
+            GPIO.add_event_detect(
+                self._taster[taster_nr], GPIO.BOTH,
+                callback=lambda pin: self._notify_taster(
+                    taster_nr, bool(GPIO.input(pin))),
+                **entprellen)
+        methoden.append(methode)
+
+    def _notify_taster(self, taster_nr, gedrueckt):
+        """Alle registrierten Methoden werden über einen Wechsel des Tasters
+        informiert."""
+        for methode in self.__observer_taster[taster_nr]:
+            methode(gedrueckt)
+
+    def veroeffentlichen(self, pfad=None):
+        """Veröffentlicht die Werte der LEDs und Taster in einem Zustandsblock
+        im gemeinsamen Speicher (s. eapi.zustand), den andere Prozesse lesen
+        können, ohne selbst auf die Pins zuzugreifen. Gibt den Pfad des
+        Blocks zurück.
+
+        Die Taster werden über Wechsel (s. taster_wechsel_registrieren)
+        verfolgt, nicht abgefragt. Mit cleanup endet die Veröffentlichung.
+
+        >>> from eapi.zustand import ZustandLeser
+        >>> import os, tempfile
+        >>> pfad = os.path.join(tempfile.mkdtemp(), "zustand")
+        >>> ea = EAModul()
+        >>> ea.veroeffentlichen(pfad) == pfad
+        True
+        >>> ea.schalte_led(EAModul.LED_GELB, 1)
+        >>> ZustandLeser(pfad).lesen().leds
+        (0.0, 1.0, 0.0)
+        >>> ea.cleanup()
+        """
+        from eapi.zustand import ZustandSchreiber
+
+        if self.__zustand is not None:
+            raise ValueError("Der Zustand wird bereits veröffentlicht.")
+
+        zustand = self.__zustand = ZustandSchreiber(pfad)
+        for farbe in range(len(self._leds)):
+            zustand.led_setzen(farbe, self.led_wert(farbe))
+            self.led_event_registrieren(
+                farbe, lambda wert, farbe=farbe: zustand.led_setzen(farbe,
+                                                                    wert))
+        for nr in range(len(self._taster)):
+            self.taster_wechsel_registrieren(
+                nr, lambda gedrueckt, nr=nr: zustand.taster_setzen(nr,
+                                                                   gedrueckt))
+            zustand.taster_setzen(nr, self.taster_gedrueckt(nr))
+
+        return zustand.pfad
+
     def cleanup(self):
-        """Setzt alle Pins des Pi wieder in den Ausgangszustand.
+        """Setzt alle Pins des Pi wieder in den Ausgangszustand. Ein warm
+        gestartetes Modul setzt nur die Taster zurück; die LEDs behalten
+        ihren Pegel für den nächsten Start.
 
         >>> from eapi.hw import EAModul
         >>> ea = EAModul()
         >>> ea.cleanup()
         """
-        GPIO.cleanup()
+        if self.warm:
+            GPIO.cleanup(self._taster)
+            for pin in self._taster:
+                _eingerichtet.pop(pin, None)
+        else:
+            GPIO.cleanup()
+            _eingerichtet.clear()
+
+        # Die Pins melden keine Wechsel mehr.
+        for methoden in self.__observer_taster.values():
+            methoden.clear()
+        if self.__zustand is not None:
+            self.__zustand.schliessen()
+            self.__zustand = None
 
 
 class DimmbaresEAModul(EAModul):
@@ -281,7 +661,8 @@ class DimmbaresEAModul(EAModul):
     """
 
     def __init__(self, pin_taster0=29, pin_taster1=31,
-                 pin_led_rot=33, pin_led_gelb=35, pin_led_gruen=37):
+                 pin_led_rot=33, pin_led_gelb=35, pin_led_gruen=37, *,
+                 warm=False):
         """
         Die PINs des Moduls werden konfiguriert.
 
@@ -293,9 +674,18 @@ class DimmbaresEAModul(EAModul):
 
         >>> ea = DimmbaresEAModul()
         >>> ea.cleanup()
+
+        Bei warm=True starten die LEDs mit dem Pegel, den sie haben. Ein
+        gedimmter Wert lässt sich nicht vom Pin zurücklesen; eine LED ist
+        dann ganz an oder aus.
         """
         super().__init__(pin_taster0, pin_taster1,
-                         pin_led_rot, pin_led_gelb, pin_led_gruen)
+                         pin_led_rot, pin_led_gelb, pin_led_gruen,
+                         warm=warm)
+
+        self.__helligkeiten = [
+            EAModul.led_wert(self, farbe) if warm else 0
+            for farbe in range(len(self._leds))]
 
         # Für jede LED wird ein PWM bereitgestellt, ueber den die LED
         # gedimmt werden kann
@@ -304,8 +694,22 @@ class DimmbaresEAModul(EAModul):
             GPIO.PWM(pin_led_gelb, 50),
             GPIO.PWM(pin_led_gruen, 50)
             ]
-        for pwm in self.__pwms:
-            pwm.start(0)
+        for pwm, helligkeit in zip(self.__pwms, self.__helligkeiten):
+            pwm.start(helligkeit*100)
+
+    def led_wert(self, led_farbe):
+        """Die zuletzt gesetzte Helligkeit einer LED.
+
+        >>> ea = DimmbaresEAModul()
+        >>> ea.schalte_led(EAModul.LED_ROT, 0.5)
+        >>> ea.led_wert(EAModul.LED_ROT)
+        0.5
+        >>> ea.cleanup()
+        """
+        if 0 <= led_farbe < len(self._leds):
+            return self.__helligkeiten[led_farbe]
+        else:
+            raise ValueError("Falsche LED-Farbe.")
 
     def schalte_led(self, led_farbe, helligkeit):
         """Schalte die LED mit der gegebenen Nummer ein (1) oder aus (0).
@@ -326,18 +730,47 @@ class DimmbaresEAModul(EAModul):
         >>> ea_modul.schalte_led(EAModul.LED_GRUEN, 0.5)
         >>> ea_modul.cleanup()
         """
+        self._led_pruefen(led_farbe, helligkeit)
+        # LED dimmen
+        pwm = self.__pwms[led_farbe]
+        pwm.ChangeDutyCycle(helligkeit*100)
+        self.__helligkeiten[led_farbe] = helligkeit
+        self._notify_leds(led_farbe, helligkeit)
+
+    def _schalte_led_gemessen(self, led_farbe, helligkeit):
+        """Wie schalte_led, misst aber die Laufzeiten des Aufrufs und des
+        Änderns der PWM."""
+        uhr = time.perf_counter
+        start = uhr()
+        self._led_pruefen(led_farbe, helligkeit)
+        beginn = uhr()
+        self.__pwms[led_farbe].ChangeDutyCycle(helligkeit*100)
+        self.laufzeiten.erfassen("gpio.pwm", uhr() - beginn)
+        self.__helligkeiten[led_farbe] = helligkeit
+        self._notify_leds(led_farbe, helligkeit)
+        self.laufzeiten.erfassen("schalte_led", uhr() - start)
+
+    def _led_pruefen(self, led_farbe, helligkeit):
+        """Prüft die Argumente von schalte_led und _schalte_led_gemessen.
+        Die Helligkeit muss eine Zahl zwischen 0 und 1 sein; Texte, NaN und
+        Unendlich werden wie Werte außerhalb des Bereichs abgelehnt.
 
-        if 0 <= led_farbe < len(self._leds):
-            if 0 <= helligkeit <= 1:
-                # LED dimmen
-                pwm = self.__pwms[led_farbe]
-                pwm.ChangeDutyCycle(helligkeit*100)
-                self._notify_leds(led_farbe, helligkeit)
-
-            else:
-                raise ValueError("Wert für Helligkeit muss zwischen 0 und 1 liegen.")
-        else:
-            raise ValueError("Falsche LED-Farbe.")
+        >>> ea = DimmbaresEAModul()
+        >>> ea.schalte_led(EAModul.LED_ROT, "x")
+        Traceback (most recent call last):
+        ...
+        ValueError: Wert für Helligkeit muss zwischen 0 und 1 liegen.
+        >>> ea.schalte_led(EAModul.LED_ROT, float("nan"))
+        Traceback (most recent call last):
+        ...
+        ValueError: Wert für Helligkeit muss zwischen 0 und 1 liegen.
+        >>> ea.cleanup()
+        """
+        self._led_farbe_pruefen(led_farbe)
+        if not (isinstance(helligkeit, numbers.Real) and
+                0 <= helligkeit <= 1):
+            raise ValueError(
+                "Wert für Helligkeit muss zwischen 0 und 1 liegen.")
 
 __ea_modul = None
 def demo_led_taster():
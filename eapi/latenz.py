@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+
+"""Misst, wie lange es vom Drücken eines Tasters bis zum Schalten einer LED
+dauert.
+
+Für jede Reaktion werden drei Zeitpunkte erfasst: die Flanke am Taster, der
+Aufruf des Callbacks und das Ende des Schaltens (GPIO-Ausgabe und alle
+Beobachter der LED). Ausgewertet werden p50, p99 und das Maximum der
+gesamten Latenz sowie der Anteile bis zum Callback (Zustellung) und danach
+(Ausführung).
+
+  $ python3 -m eapi.latenz --simulation --anzahl 1000
+  $ python3 -m eapi.latenz --ausloeser-pin 40 --entprellzeit 20
+  $ python3 -m eapi.latenz --modus warteschlange
+
+In der Simulation werden die Flanken mit GPIODummy.flanke_ausloesen
+erzeugt. Auf einem Pi kann ein Ausgang (--ausloeser-pin) mit dem Pin des
+Tasters verbunden werden; er erzeugt dann echte Flanken, deren Zeitpunkt
+bekannt ist. Ohne Auslöser werden die Tastendrücke von Hand ausgeführt und
+die Latenz erst ab dem Aufruf des Callbacks gemessen, da RPi.GPIO den
+Zeitpunkt der Flanke nicht liefert.
+
+Mit modus 'direkt' schaltet der Callback die LED selbst, mit
+'warteschlange' übergibt er den Tastendruck einem eigenen Thread (wie z.B.
+eapi.daemon). So lassen sich Entprellzeiten, GPIO-Bibliotheken und die Art
+der Weitergabe vergleichen.
+
+>>> from eapi.benchmark import simulation
+>>> with simulation():
+...     messung = ReaktionsMessung(EAModul())
+...     messung.messen(messung.simulierter_ausloeser(), 20)
+...     messung.eamodul.cleanup()
+>>> ergebnis = messung.ergebnis()
+>>> ergebnis["anzahl"], ergebnis["verpasst"]
+(20, 0)
+>>> ergebnis["latenz"]["p50"] <= ergebnis["latenz"]["max"]
+True
+"""
+
+import bisect
+import queue
+import threading
+import time
+from eapi.hw import EAModul, Laufzeiten
+
+MODI = ("direkt", "warteschlange")
+
+
+def perzentil(werte, anteil):
+    """Das Perzentil (anteil zwischen 0 und 1) der sortierten werte nach der
+    Nearest-Rank-Methode oder None, wenn keine Werte vorhanden sind.
+
+    >>> perzentil([1, 2, 3, 4], 0.5), perzentil([1, 2, 3, 4], 0.99)
+    (2, 4)
+    """
+    if not werte:
+        return None
+    rang = max(1, -(-len(werte) * anteil // 1))
+    return werte[int(rang) - 1]
+
+
+def verteilung(sekunden):
+    """Fasst eine Liste von Latenzen in Sekunden als dict mit p50, p99, max
+    und einem Histogramm mit den Grenzen aus Laufzeiten.GRENZEN zusammen."""
+    sortiert = sorted(sekunden)
+    histogramm = [0] * (len(Laufzeiten.GRENZEN) + 1)
+    for wert in sortiert:
+        histogramm[bisect.bisect_left(Laufzeiten.GRENZEN, wert)] += 1
+
+    return {
+        "p50": perzentil(sortiert, 0.5),
+        "p99": perzentil(sortiert, 0.99),
+        "max": sortiert[-1] if sortiert else None,
+        "grenzen": list(Laufzeiten.GRENZEN),
+        "histogramm": histogramm,
+    }
+
+
+class ReaktionsMessung:
+    """Schaltet bei jedem Wechsel eines Tasters eine LED und misst die
+    Latenz dieser Reaktion.
+
+    Die Reaktionen werden in reaktionen als Tupel (flanke, callback, fertig)
+    aus Zeitpunkten von time.perf_counter() abgelegt.
+    """
+
+    def __init__(self, eamodul, taster_nr=0, led_farbe=EAModul.LED_ROT,
+                 entprellzeit=0, modus="direkt"):
+        """Registriert die Messung am Taster taster_nr des eamodul. Beim
+        Drücken wird die LED led_farbe ein-, beim Loslassen ausgeschaltet.
+        Die entprellzeit wird in Millisekunden angegeben."""
+        if modus not in MODI:
+            raise ValueError("Unbekannter Modus: " + str(modus))
+
+        self.eamodul = eamodul
+        self.taster_nr = taster_nr
+        self.led_farbe = led_farbe
+        self.modus = modus
+        self.reaktionen = []
+        self.verpasst = 0
+        self.__flanke = None
+        self.__fertig = threading.Event()
+
+        if modus == "warteschlange":
+            self.__auftraege = queue.Queue()
+            threading.Thread(target=self.__abarbeiten, daemon=True).start()
+
+        eamodul.taster_wechsel_registrieren(taster_nr, self.__gewechselt,
+                                            entprellzeit)
+
+    def __gewechselt(self, gedrueckt):
+        callback = time.perf_counter()
+        if self.modus == "direkt":
+            self.__reagieren(gedrueckt, callback)
+        else:
+            self.__auftraege.put((gedrueckt, callback))
+
+    def __abarbeiten(self):
+        while True:
+            self.__reagieren(*self.__auftraege.get())
+
+    def __reagieren(self, gedrueckt, callback):
+        self.eamodul.schalte_led(self.led_farbe, int(gedrueckt))
+        fertig = time.perf_counter()
+
+        # Ohne bekannte Flanke (Tastendruck von Hand) beginnt die Messung
+        # mit dem Callback.
+        flanke, self.__flanke = self.__flanke, None
+        self.reaktionen.append(
+            (callback if flanke is None else flanke, callback, fertig))
+        self.__fertig.set()
+
+    def simulierter_ausloeser(self):
+        """Gibt einen Auslöser zurück, der Flanken am Taster mit der
+        GPIO-Simulation erzeugt."""
+        import eapi.hw
+
+        pin = self.eamodul._taster[self.taster_nr]
+        return lambda pegel: eapi.hw.GPIO.flanke_ausloesen(pin, pegel)
+
+    def pin_ausloeser(self, pin):
+        """Gibt einen Auslöser zurück, der den Ausgang pin schaltet. Der Pin
+        muss mit dem Pin des Tasters verbunden sein."""
+        import eapi.hw
+
+        gpio = eapi.hw.GPIO
+        gpio.setup(pin, gpio.OUT)
+        gpio.output(pin, 0)
+        return lambda pegel: gpio.output(pin, int(pegel))
+
+    def messen(self, ausloeser, anzahl, timeout=1.0, pause=0.0):
+        """Erzeugt mit dem ausloeser (einer Funktion, die den Pegel am Taster
+        setzt) anzahl Flanken, abwechselnd steigend und fallend, und wartet
+        jeweils höchstens timeout Sekunden auf die Reaktion. Bleibt sie aus,
+        z.B. wegen der Entprellzeit, wird die Flanke als verpasst gezählt.
+        Zwischen zwei Flanken wird pause Sekunden gewartet."""
+        for i in range(anzahl):
+            self.__fertig.clear()
+            self.__flanke = time.perf_counter()
+            ausloeser(i % 2 == 0)
+            if not self.__fertig.wait(timeout):
+                self.__flanke = None
+                self.verpasst += 1
+            if pause:
+                time.sleep(pause)
+
+    def warten(self, anzahl):
+        """Wartet auf anzahl Tastendrücke von Hand."""
+        while len(self.reaktionen) < anzahl:
+            self.__fertig.wait()
+            self.__fertig.clear()
+
+    def ergebnis(self):
+        """Gibt die Auswertung aller bisherigen Reaktionen als dict
+        zurück."""
+        reaktionen = list(self.reaktionen)
+        return {
+            "modus": self.modus,
+            "anzahl": len(reaktionen),
+            "verpasst": self.verpasst,
+            "latenz": verteilung([fertig - flanke
+                                  for flanke, _, fertig in reaktionen]),
+            "zustellung": verteilung([callback - flanke
+                                      for flanke, callback, _ in reaktionen]),
+            "ausfuehrung": verteilung([fertig - callback
+                                       for _, callback, fertig in reaktionen]),
+        }
+
+
+def main(argumente=None):
+    """Führt eine Messung gemäß der Kommandozeile aus und gibt das Ergebnis
+    aus."""
+    import argparse
+    import contextlib
+    import json
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m eapi.latenz",
+        description="Latenz vom Tastendruck bis zum Schalten der LED.")
+    parser.add_argument("--anzahl", type=int, default=1000,
+                        help="Anzahl der Flanken bzw. Tastendrücke")
+    parser.add_argument("--taster", type=int, default=0, choices=(0, 1))
+    parser.add_argument("--entprellzeit", type=int, default=0,
+                        help="Entprellzeit in Millisekunden (0: keine)")
+    parser.add_argument("--modus", choices=MODI, default="direkt")
+    parser.add_argument("--simulation", action="store_true",
+                        help="Flanken mit der GPIO-Simulation erzeugen")
+    parser.add_argument("--ausloeser-pin", type=int,
+                        help="Ausgang, der mit dem Taster verbunden ist")
+    parser.add_argument("--pause", type=float, default=0.0,
+                        help="Sekunden zwischen zwei Flanken")
+    parser.add_argument("--json", action="store_true",
+                        help="Ergebnis als JSON ausgeben")
+    args = parser.parse_args(argumente)
+
+    if args.simulation:
+        from eapi.benchmark import simulation
+        umgebung = simulation()
+    else:
+        umgebung = contextlib.nullcontext()
+
+    with umgebung:
+        messung = ReaktionsMessung(EAModul(), args.taster, EAModul.LED_ROT,
+                                   args.entprellzeit, args.modus)
+        try:
+            if args.simulation:
+                messung.messen(messung.simulierter_ausloeser(), args.anzahl,
+                               pause=args.pause)
+            elif args.ausloeser_pin is not None:
+                messung.messen(messung.pin_ausloeser(args.ausloeser_pin),
+                               args.anzahl, pause=args.pause)
+            else:
+                print("Taster {t} {a} Mal drücken und loslassen (Strg+C "
+                      "beendet)".format(t=args.taster, a=args.anzahl // 2))
+                messung.warten(args.anzahl)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            messung.eamodul.cleanup()
+
+    ergebnis = messung.ergebnis()
+    if args.json:
+        print(json.dumps(ergebnis, indent=2))
+        return
+
+    print("Modus {m}, {n} Reaktionen, {v} verpasst".format(
+        m=ergebnis["modus"], n=ergebnis["anzahl"], v=ergebnis["verpasst"]))
+    for name in ("latenz", "zustellung", "ausfuehrung"):
+        werte = ergebnis[name]
+        if werte["max"] is None:
+            continue
+        print("{n:<12} p50 {p50:9.1f} µs  p99 {p99:9.1f} µs  max {m:9.1f} µs"
+              .format(n=name, p50=werte["p50"] * 1e6, p99=werte["p99"] * 1e6,
+                      m=werte["max"] * 1e6))
+
+
+if __name__ == "__main__":
+    main()
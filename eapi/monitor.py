@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+
+"""Ein Monitor, der die LEDs und Taster vieler EAModulServer gleichzeitig im
+Terminal anzeigt.
+
+  python3 -m eapi.monitor pi1:9999 pi2:9999 192.168.0.17:9999
+
+Der Monitor abonniert den Zustand jedes Servers (ABO_ANFRAGE, s. eapi.net)
+und erneuert die Abos regelmäßig. Die Server melden jede Änderung der LEDs
+von sich aus. Alle Server werden über einen einzigen UDP-Socket und einen
+Selektor bedient, so dass auch viele Boards kaum Rechenzeit kosten.
+
+In der Anzeige steht jedes Board in einer eigenen Zelle. Hat ein Board
+länger nichts gemeldet, wird die Zelle als veraltet markiert. Neu gezeichnet
+werden nur Zellen, deren Inhalt sich geändert hat. Mit 'q' wird der Monitor
+beendet.
+
+>>> import threading
+>>> from eapi.net import EAModulServer, EAModulClient
+>>> from eapi.hw import EAModul
+>>> easerver = EAModulServer("127.0.0.1", 0, eamodul=EAModul())
+>>> threading.Thread(target=easerver.serve_forever).start()
+>>> monitor = FlottenMonitor([easerver.server_address])
+>>> EAModulClient(*easerver.server_address).sende(1, 0, 0)
+>>> while monitor.bearbeiten(timeout=1) and monitor.boards[
+...         monitor.schluessel[0]].leds[0] != 1:
+...     pass
+>>> monitor.zelle(monitor.schluessel[0])[1]
+'Ro● Ge○ Gr○'
+>>> monitor.schliessen()
+>>> easerver.shutdown()
+>>> easerver.server_close()
+"""
+
+import json
+import selectors
+import socket
+import time
+from eapi.net import ABO_ANFRAGE, ABO_DAUER, ZUSTAND_MELDUNG
+
+
+class Board:
+    """Der zuletzt gemeldete Zustand eines Moduls."""
+
+    __slots__ = ("leds", "taster", "zeitpunkt")
+
+    def __init__(self):
+        self.leds = [0, 0, 0]
+        self.taster = [0, 0]
+        # Zeitpunkt der letzten Meldung (time.monotonic()) oder None
+        self.zeitpunkt = None
+
+
+class FlottenMonitor:
+    """Abonniert den Zustand mehrerer EAModulServer über einen gemeinsamen
+    Socket.
+
+    Die Boards werden in boards unter dem Schlüssel (name, modul_id)
+    abgelegt, wobei name 'host:port' des Servers ist. Die Reihenfolge der
+    Schlüssel steht in schluessel.
+    """
+
+    def __init__(self, ziele, erneuern=ABO_DAUER / 4, veraltet=ABO_DAUER / 2):
+        """Erstellt einen Monitor für die ziele, eine Liste von Tupeln (host,
+        port). Die Abos werden alle erneuern Sekunden erneuert; ein Board, das
+        veraltet Sekunden lang nichts gemeldet hat, gilt als veraltet."""
+        self.erneuern = erneuern
+        self.veraltet = veraltet
+        self.boards = {}
+        self.schluessel = []
+        self.__namen = {}
+        self.__naechstes_abo = 0
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.__selektor = selectors.DefaultSelector()
+        self.__selektor.register(self.sock, selectors.EVENT_READ)
+
+        for host, port in ziele:
+            adresse = (socket.gethostbyname(host), int(port))
+            name = "{h}:{p}".format(h=host, p=port)
+            self.__namen[adresse] = name
+            # Modul 0 sofort anlegen, damit auch Server angezeigt werden,
+            # die nie antworten.
+            self.__board((name, "0"))
+
+    def __board(self, schluessel):
+        board = self.boards.get(schluessel)
+        if board is None:
+            board = self.boards[schluessel] = Board()
+            self.schluessel.append(schluessel)
+        return board
+
+    def abonnieren(self):
+        """Sendet allen Servern eine ABO_ANFRAGE."""
+        for adresse in self.__namen:
+            try:
+                self.sock.sendto(ABO_ANFRAGE, adresse)
+            except OSError:
+                pass
+        self.__naechstes_abo = time.monotonic() + self.erneuern
+
+    def bearbeiten(self, timeout=None):
+        """Erneuert fällige Abos, wartet höchstens timeout Sekunden auf
+        Meldungen und verarbeitet alle eingetroffenen. Zurückgegeben wird die
+        Menge der Schlüssel aller Boards mit neuen Meldungen."""
+        jetzt = time.monotonic()
+        if jetzt >= self.__naechstes_abo:
+            self.abonnieren()
+
+        warten = self.__naechstes_abo - jetzt
+        if timeout is not None:
+            warten = min(warten, timeout)
+
+        geaendert = set()
+        if not self.__selektor.select(max(0, warten)):
+            return geaendert
+
+        while True:
+            try:
+                daten, adresse = self.sock.recvfrom(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # z.B. ICMP 'Port nicht erreichbar' eines Servers
+                continue
+
+            name = self.__namen.get(adresse)
+            if name is None or not daten.startswith(ZUSTAND_MELDUNG):
+                continue
+            try:
+                zustand = json.loads(daten[len(ZUSTAND_MELDUNG):])
+            except ValueError:
+                continue
+
+            zeitpunkt = time.monotonic()
+            for modul_id, werte in zustand.items():
+                schluessel = (name, modul_id)
+                board = self.__board(schluessel)
+                board.leds = werte.get("leds", board.leds)
+                board.taster = werte.get("taster", board.taster)
+                board.zeitpunkt = zeitpunkt
+                geaendert.add(schluessel)
+
+        return geaendert
+
+    def ist_veraltet(self, schluessel, jetzt=None):
+        """Prüft, ob das Board länger als veraltet Sekunden nichts gemeldet
+        hat."""
+        zeitpunkt = self.boards[schluessel].zeitpunkt
+        if jetzt is None:
+            jetzt = time.monotonic()
+        return zeitpunkt is None or jetzt - zeitpunkt > self.veraltet
+
+    def zelle(self, schluessel, jetzt=None):
+        """Der Inhalt der Zelle eines Boards als Tupel (titel, leds, taster,
+        veraltet) aus Texten und einem Wahrheitswert."""
+        board = self.boards[schluessel]
+        leds = " ".join(name + ("●" if wert == 1 else "◐" if wert else "○")
+                        for name, wert in zip(["Ro", "Ge", "Gr"], board.leds))
+        taster = " ".join("T{n}{z}".format(n=n, z="▼" if wert else "▲")
+                          for n, wert in enumerate(board.taster))
+        return ("{n}/{m}".format(n=schluessel[0], m=schluessel[1]), leds,
+                taster, self.ist_veraltet(schluessel, jetzt))
+
+    def schliessen(self):
+        """Schließt den Socket."""
+        self.__selektor.close()
+        self.sock.close()
+
+
+# Breite und Höhe einer Zelle in Zeichen
+ZELLENBREITE = 26
+ZELLENHOEHE = 4
+
+
+def anzeigen(fenster, monitor):
+    """Zeigt die Boards des Monitors im curses-Fenster an, bis 'q' gedrückt
+    wird. Es werden nur Zellen neu gezeichnet, deren Inhalt sich geändert
+    hat."""
+    import curses
+
+    curses.curs_set(0)
+    fenster.nodelay(True)
+    curses.start_color()
+    curses.use_default_colors()
+    curses.init_pair(1, curses.COLOR_RED, -1)
+    curses.init_pair(2, curses.COLOR_GREEN, -1)
+    curses.init_pair(3, curses.COLOR_YELLOW, -1)
+    led_farben = [curses.color_pair(1), curses.color_pair(3),
+                  curses.color_pair(2)]
+
+    angezeigt = {}
+    while True:
+        taste = fenster.getch()
+        if taste in (ord("q"), ord("Q")):
+            return
+        if taste == curses.KEY_RESIZE:
+            angezeigt.clear()
+            fenster.erase()
+
+        monitor.bearbeiten(timeout=0.1)
+
+        hoehe, breite = fenster.getmaxyx()
+        spalten = max(1, breite // ZELLENBREITE)
+        jetzt = time.monotonic()
+        for i, schluessel in enumerate(monitor.schluessel):
+            inhalt = monitor.zelle(schluessel, jetzt)
+            if angezeigt.get(schluessel) == inhalt:
+                continue
+
+            y = (i // spalten) * ZELLENHOEHE
+            x = (i % spalten) * ZELLENBREITE
+            if y + ZELLENHOEHE > hoehe:
+                continue
+
+            titel, leds, taster, veraltet = inhalt
+            try:
+                fenster.addstr(y, x, (("? " if veraltet else "") + titel)
+                               [:ZELLENBREITE - 1].ljust(ZELLENBREITE - 1),
+                               curses.A_DIM if veraltet else curses.A_BOLD)
+                for n, led in enumerate(leds.split(" ")):
+                    fenster.addstr(y + 1, x + 4 * n, led,
+                                   curses.A_DIM if veraltet
+                                   else led_farben[n])
+                fenster.addstr(y + 2, x, taster)
+            except curses.error:
+                # Zelle ragt über den Rand des Fensters
+                pass
+            angezeigt[schluessel] = inhalt
+
+        fenster.refresh()
+
+
+def main():
+    """Startet den Monitor für die in der Kommandozeile als host:port
+    angegebenen Server."""
+    import curses
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Aufruf: python3 -m eapi.monitor host:port [host:port ...]")
+        return
+
+    ziele = []
+    for ziel in sys.argv[1:]:
+        host, _, port = ziel.rpartition(":")
+        ziele.append((host, int(port)))
+
+    monitor = FlottenMonitor(ziele)
+    try:
+        curses.wrapper(anzeigen, monitor)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.schliessen()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,635 @@
+# -*- coding: utf-8 -*-
+
+"""Ein Modul, das ein EAModul mit einem MQTT-Broker verbindet.
+
+Die Klasse EAModulMQTTBruecke hält genau eine dauerhafte Verbindung zu einem
+Broker. Über sie empfängt sie Befehle für die LEDs und veröffentlicht die
+Zustände der LEDs und Taster. Bricht die Verbindung ab, wird sie mit
+wachsenden Wartezeiten neu aufgebaut.
+
+  from eapi.hw import EAModul
+  from eapi.mqtt import EAModulMQTTBruecke
+
+  bruecke = EAModulMQTTBruecke(EAModul(), "broker.example.org")
+  bruecke.start()
+
+Die Themen beginnen mit einem Präfix (Standard: 'eapi'):
+
+  eapi/led/rot/set    Befehl: 0 oder 1 (bzw. 0.0 bis 1.0 beim
+                      DimmbarenEAModul) schaltet die rote LED.
+  eapi/led/rot        Zustand der roten LED (retained).
+  eapi/taster/0       Anzahl der bisherigen Tastendrücke von Taster 0.
+  eapi/taster/0/zustand
+                      1 (gedrückt) oder 0 (losgelassen) (retained).
+
+Entsprechendes gilt für 'gelb', 'gruen' und Taster 1. Zustandsänderungen
+werden gesammelt und höchstens alle 'intervall' Sekunden gemeinsam gesendet.
+Wird eine LED in dieser Zeit mehrmals geschaltet oder ein Taster mehrmals
+gedrückt und losgelassen, wird nur der letzte Zustand veröffentlicht. Da für
+die Taster zusätzlich die Anzahl der Drücke veröffentlicht wird, geht beim
+Zusammenfassen kein Tastendruck verloren.
+
+Das Modul implementiert die benötigten Teile von MQTT 3.1.1 (QoS 0) selbst
+und benötigt daher keine weiteren Bibliotheken. Für Tests ohne externen
+Dienst steht mit MQTTTestBroker ein minimaler Broker bereit.
+
+>>> broker = MQTTTestBroker("127.0.0.1", 0)
+>>> broker.starten()
+>>> beobachter = MQTTVerbindung(*broker.server_address, "beobachter")
+>>> beobachter.abonnieren("eapi/led/#")
+
+>>> from eapi.hw import EAModul
+>>> ea = EAModul()
+>>> bruecke = EAModulMQTTBruecke(ea, *broker.server_address, intervall=0.01)
+>>> bruecke.start()
+>>> bruecke.warte_auf_verbindung()
+True
+>>> ea.schalte_led(EAModul.LED_GELB, 1)
+>>> beobachter.empfangen()
+('eapi/led/gelb', b'1')
+
+>>> bruecke.stop()
+>>> beobachter.schliessen()
+>>> broker.beenden()
+>>> ea.cleanup()
+"""
+
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+import time
+from eapi.hw import EAModul
+
+log = logging.getLogger(__name__)
+
+# Pakettypen nach MQTT 3.1.1
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+SUBSCRIBE = 8
+SUBACK = 9
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+LED_NAMEN = {EAModul.LED_ROT: "rot",
+             EAModul.LED_GELB: "gelb",
+             EAModul.LED_GRUEN: "gruen"}
+
+
+def _laenge_kodieren(laenge):
+    """Kodiert die Restlänge eines Pakets mit variabler Länge."""
+    kodiert = bytearray()
+    while True:
+        byte, laenge = laenge % 128, laenge // 128
+        if laenge > 0:
+            byte |= 128
+        kodiert.append(byte)
+        if laenge == 0:
+            return bytes(kodiert)
+
+
+def _text(text):
+    """Kodiert einen Text mit vorangestellter Länge."""
+    kodiert = text.encode()
+    return len(kodiert).to_bytes(2, "big") + kodiert
+
+
+def _paket(typ, flags, rumpf):
+    """Erstellt ein vollständiges Paket aus Typ, Flags und Rumpf."""
+    return bytes([typ << 4 | flags]) + _laenge_kodieren(len(rumpf)) + rumpf
+
+
+def publish_paket(thema, nutzdaten, retain=False):
+    """Erstellt ein PUBLISH-Paket mit QoS 0.
+
+    >>> publish_paket("a/b", b"1")
+    b'0\\x06\\x00\\x03a/b1'
+    """
+    return _paket(PUBLISH, 1 if retain else 0, _text(thema) + nutzdaten)
+
+
+def paket_zerlegen(puffer):
+    """Liest ein Paket vom Anfang des Puffers.
+
+    Zurückgegeben wird ein Tupel aus Typ, Flags, Rumpf und der Anzahl der
+    verbrauchten Bytes oder None, falls der Puffer noch kein vollständiges
+    Paket enthält.
+
+    >>> paket_zerlegen(publish_paket("a/b", b"1", retain=True))
+    (3, 1, b'\\x00\\x03a/b1', 8)
+    >>> paket_zerlegen(b"\\x30\\x06\\x00") is None
+    True
+    """
+    laenge, faktor, position = 0, 1, 1
+    while True:
+        if position >= len(puffer):
+            return None
+        byte = puffer[position]
+        laenge += (byte & 127) * faktor
+        faktor *= 128
+        position += 1
+        if byte & 128 == 0:
+            break
+        if position > 4:
+            raise ValueError("Ungültige Paketlänge.")
+
+    ende = position + laenge
+    if len(puffer) < ende:
+        return None
+
+    return puffer[0] >> 4, puffer[0] & 15, bytes(puffer[position:ende]), ende
+
+
+def publish_zerlegen(rumpf):
+    """Zerlegt den Rumpf eines PUBLISH-Pakets (QoS 0) in Thema und
+    Nutzdaten."""
+    laenge = int.from_bytes(rumpf[:2], "big")
+    return rumpf[2:2 + laenge].decode(), rumpf[2 + laenge:]
+
+
+def thema_passt(filter, thema):
+    """Prüft, ob ein Thema zu einem Themenfilter mit den Platzhaltern + und #
+    passt.
+
+    >>> thema_passt("eapi/led/+/set", "eapi/led/rot/set")
+    True
+    >>> thema_passt("eapi/#", "eapi/taster/0")
+    True
+    >>> thema_passt("eapi/led/+", "eapi/led/rot/set")
+    False
+    """
+    filterteile = filter.split("/")
+    thementeile = thema.split("/")
+    for i, teil in enumerate(filterteile):
+        if teil == "#":
+            return True
+        if i >= len(thementeile):
+            return False
+        if teil != "+" and teil != thementeile[i]:
+            return False
+
+    return len(filterteile) == len(thementeile)
+
+
+class MQTTVerbindung:
+    """Eine einfache Verbindung zu einem MQTT-Broker (nur QoS 0).
+
+    Beim Erstellen wird die Verbindung aufgebaut und die Anmeldung beim
+    Broker durchgeführt. Anschließend können Themen abonniert, Nachrichten
+    veröffentlicht und empfangen werden. In zuletzt_empfangen steht der
+    Zeitpunkt (time.monotonic()), zu dem zuletzt Daten vom Broker kamen.
+    """
+
+    def __init__(self, host, port, client_id, keepalive=30, timeout=5.0):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__puffer = bytearray()
+        self.__vorgemerkt = []
+        self.__schreibsperre = threading.Lock()
+        self.__paket_id = 0
+        self.zuletzt_empfangen = time.monotonic()
+
+        rumpf = (_text("MQTT") + bytes([4, 2]) +
+                 keepalive.to_bytes(2, "big") + _text(client_id))
+        self.senden(_paket(CONNECT, 0, rumpf))
+
+        typ, _, rumpf = self.__naechstes_paket()
+        if typ != CONNACK or rumpf[1] != 0:
+            self.sock.close()
+            raise ConnectionError("Broker lehnt die Verbindung ab.")
+
+    def senden(self, daten):
+        """Sendet bereits kodierte Pakete. Mehrere Pakete können
+        aneinandergehängt in einem Aufruf gesendet werden."""
+        with self.__schreibsperre:
+            self.sock.sendall(daten)
+
+    def abonnieren(self, *filter):
+        """Abonniert die angegebenen Themenfilter und wartet auf die
+        Bestätigung des Brokers."""
+        self.__paket_id = self.__paket_id % 65535 + 1
+        rumpf = self.__paket_id.to_bytes(2, "big")
+        for f in filter:
+            rumpf += _text(f) + bytes([0])
+        self.senden(_paket(SUBSCRIBE, 2, rumpf))
+
+        while True:
+            typ, _, rumpf = self.__naechstes_paket()
+            if typ == SUBACK:
+                return
+            if typ == PUBLISH:
+                # Nachrichten vor der Bestätigung (z.B. retained) aufheben
+                self.__vorgemerkt.append(publish_zerlegen(rumpf))
+
+    def veroeffentlichen(self, thema, nutzdaten, retain=False):
+        """Veröffentlicht eine Nachricht."""
+        self.senden(publish_paket(thema, nutzdaten, retain))
+
+    def ping(self):
+        """Sendet ein PINGREQ an den Broker."""
+        self.senden(_paket(PINGREQ, 0, b""))
+
+    def empfangen(self):
+        """Wartet auf die nächste Nachricht und gibt sie als Tupel aus Thema
+        und Nutzdaten zurück.
+
+        Läuft der Timeout des Sockets ab, wird socket.timeout ausgelöst. Wird
+        die Verbindung geschlossen, wird ein ConnectionError ausgelöst.
+        """
+        if self.__vorgemerkt:
+            return self.__vorgemerkt.pop(0)
+
+        while True:
+            typ, _, rumpf = self.__naechstes_paket()
+            if typ == PUBLISH:
+                return publish_zerlegen(rumpf)
+
+    def settimeout(self, timeout):
+        """Setzt den Timeout für das Empfangen."""
+        self.sock.settimeout(timeout)
+
+    def schliessen(self):
+        """Meldet sich beim Broker ab und schließt die Verbindung."""
+        try:
+            self.senden(_paket(DISCONNECT, 0, b""))
+            # Weckt auch einen Thread, der gerade in empfangen() wartet.
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def __naechstes_paket(self):
+        """Liest das nächste vollständige Paket. Bereits empfangene Bytes
+        bleiben bei einem Timeout im Puffer erhalten."""
+        while True:
+            paket = paket_zerlegen(self.__puffer)
+            if paket is not None:
+                typ, flags, rumpf, verbraucht = paket
+                del self.__puffer[:verbraucht]
+                return typ, flags, rumpf
+
+            daten = self.sock.recv(4096)
+            if not daten:
+                raise ConnectionError("Verbindung vom Broker geschlossen.")
+            self.zuletzt_empfangen = time.monotonic()
+            self.__puffer += daten
+
+
+class EAModulMQTTBruecke:
+    """Verbindet ein EAModul über eine dauerhafte Verbindung mit einem
+    MQTT-Broker.
+
+    Befehle an die LEDs werden über das EAModul geschaltet. Zustände der LEDs
+    und Taster werden gesammelt und gebündelt veröffentlicht.
+    """
+
+    def __init__(self, eamodul, host="localhost", port=1883, praefix="eapi",
+                 client_id=None, intervall=0.05, keepalive=30,
+                 backoff_min=0.5, backoff_max=30.0):
+        """Erstellt die Brücke für das gegebene eamodul. Die Verbindung zum
+        Broker auf host und port wird erst mit start() aufgebaut.
+
+        Ohne client_id meldet sich die Brücke mit dem Rechnernamen und der
+        Prozess-ID an. Mit intervall wird festgelegt, wie lange
+        Zustandsänderungen höchstens gesammelt werden. Kommt länger als das
+        1,5-fache von keepalive (Sekunden) nichts vom Broker, auch keine
+        Antwort auf ein PINGREQ, wird neu verbunden. Nach einem
+        Verbindungsabbruch wird zunächst backoff_min Sekunden gewartet, bei
+        weiteren Fehlschlägen jeweils doppelt so lange, höchstens aber
+        backoff_max Sekunden.
+        """
+        self._ea = eamodul
+        self.host = host
+        self.port = port
+        self.praefix = praefix
+        self.client_id = client_id or "eapi-{host}-{pid}".format(
+            host=socket.gethostname(), pid=os.getpid())
+        self.intervall = intervall
+        self.keepalive = keepalive
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.verbindungen = 0
+
+        self.__verbindung = None
+        self.__verbunden = threading.Event()
+        self.__gestoppt = threading.Event()
+        self.__threads = []
+
+        # Zu veröffentlichende Nachrichten: thema -> (nutzdaten, retain)
+        self.__sperre = threading.Lock()
+        self.__ausstehend = {}
+        self.__neu = threading.Event()
+
+        self.__led_werte = {}
+        self.__tastendruecke = [0, 0]
+        self.__taster_zustaende = [self._ea.taster_gedrueckt(nr)
+                                   for nr in range(2)]
+
+        for farbe in LED_NAMEN:
+            self._ea.led_event_registrieren(
+                farbe, lambda wert, farbe=farbe: self.__led_geaendert(
+                    farbe, wert))
+        for nr in range(len(self.__tastendruecke)):
+            self._ea.taster_wechsel_registrieren(
+                nr, lambda gedrueckt, nr=nr: self.__taster_gewechselt(
+                    nr, gedrueckt))
+
+    def start(self):
+        """Startet die Threads für die Verbindung und das Veröffentlichen."""
+        self.__gestoppt.clear()
+        self.__threads = [
+            threading.Thread(target=self.__verbindung_halten, daemon=True),
+            threading.Thread(target=self.__veroeffentlichen, daemon=True)]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        """Beendet die Verbindung zum Broker und alle Threads."""
+        self.__gestoppt.set()
+        self.__neu.set()
+        verbindung = self.__verbindung
+        if verbindung is not None:
+            verbindung.schliessen()
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+
+    def warte_auf_verbindung(self, timeout=5.0):
+        """Wartet, bis eine Verbindung zum Broker besteht."""
+        return self.__verbunden.wait(timeout)
+
+    def __led_geaendert(self, farbe, wert):
+        self.__led_werte[farbe] = wert
+        self.__vormerken("led/" + LED_NAMEN[farbe], str(wert).encode(), True)
+
+    def __taster_gewechselt(self, nr, gedrueckt):
+        self.__taster_zustaende[nr] = gedrueckt
+        self.__vormerken("taster/{nr}/zustand".format(nr=nr),
+                         str(int(gedrueckt)).encode(), True)
+        if gedrueckt:
+            self.__tastendruecke[nr] += 1
+            self.__vormerken("taster/" + str(nr),
+                             str(self.__tastendruecke[nr]).encode(), False)
+
+    def __vormerken(self, thema, nutzdaten, retain):
+        """Merkt eine Nachricht vor. Eine ältere Nachricht zum selben Thema
+        wird dabei ersetzt."""
+        with self.__sperre:
+            self.__ausstehend[self.praefix + "/" + thema] = (nutzdaten, retain)
+        self.__neu.set()
+
+    def __veroeffentlichen(self):
+        """Sendet die vorgemerkten Nachrichten gebündelt in einem Aufruf."""
+        while not self.__gestoppt.is_set():
+            self.__neu.wait()
+            self.__verbunden.wait()
+            if self.__gestoppt.wait(self.intervall):
+                return
+
+            with self.__sperre:
+                self.__neu.clear()
+                ausstehend, self.__ausstehend = self.__ausstehend, {}
+
+            daten = b"".join(publish_paket(thema, nutzdaten, retain)
+                             for thema, (nutzdaten, retain)
+                             in ausstehend.items())
+            try:
+                verbindung = self.__verbindung
+                if verbindung is None:
+                    raise ConnectionError("Keine Verbindung zum Broker.")
+                verbindung.senden(daten)
+            except OSError:
+                # Nicht gesendete Nachrichten nach dem Wiederverbinden senden,
+                # sofern nicht inzwischen neuere vorliegen.
+                with self.__sperre:
+                    for thema, nachricht in ausstehend.items():
+                        self.__ausstehend.setdefault(thema, nachricht)
+                self.__neu.set()
+                self.__verbunden.clear()
+
+    def __verbindung_halten(self):
+        """Baut die Verbindung auf und empfängt Befehle. Nach einem Abbruch
+        wird mit wachsenden Wartezeiten neu verbunden."""
+        backoff = self.backoff_min
+        while not self.__gestoppt.is_set():
+            try:
+                verbindung = MQTTVerbindung(self.host, self.port,
+                                            self.client_id, self.keepalive)
+                verbindung.abonnieren(self.praefix + "/led/+/set")
+                verbindung.settimeout(self.keepalive / 2)
+            except OSError as e:
+                log.warning("Verbindung zu %s:%s fehlgeschlagen: %s",
+                            self.host, self.port, e)
+                self.__gestoppt.wait(backoff)
+                backoff = min(backoff * 2, self.backoff_max)
+                continue
+
+            backoff = self.backoff_min
+            self.verbindungen += 1
+            self.__verbindung = verbindung
+
+            # Bekannte Zustände nach dem (Wieder-)Verbinden veröffentlichen
+            for farbe, wert in list(self.__led_werte.items()):
+                self.__vormerken("led/" + LED_NAMEN[farbe],
+                                 str(wert).encode(), True)
+            for nr, gedrueckt in enumerate(self.__taster_zustaende):
+                self.__vormerken("taster/{nr}/zustand".format(nr=nr),
+                                 str(int(gedrueckt)).encode(), True)
+            self.__verbunden.set()
+
+            try:
+                self.__befehle_empfangen(verbindung)
+            except (OSError, ValueError) as e:
+                if not self.__gestoppt.is_set():
+                    log.warning("Verbindung zum Broker verloren: %s", e)
+
+            self.__verbunden.clear()
+            self.__verbindung = None
+            verbindung.sock.close()
+
+        # Wartenden Veröffentlichungs-Thread zum Beenden freigeben
+        self.__verbunden.set()
+
+    def __befehle_empfangen(self, verbindung):
+        """Empfängt Befehle, bis die Verbindung abbricht."""
+        farben = {name: farbe for farbe, name in LED_NAMEN.items()}
+        while not self.__gestoppt.is_set():
+            try:
+                thema, nutzdaten = verbindung.empfangen()
+            except socket.timeout:
+                stille = time.monotonic() - verbindung.zuletzt_empfangen
+                if stille > 1.5 * self.keepalive:
+                    raise ConnectionError(
+                        "Broker antwortet seit {:.1f} s nicht.".format(stille))
+                verbindung.ping()
+                continue
+
+            name = thema.split("/")[-2]
+            if name not in farben:
+                continue
+
+            try:
+                wert = float(nutzdaten)
+                if wert in (0, 1):
+                    wert = int(wert)
+                self._ea.schalte_led(farben[name], wert)
+            except ValueError:
+                log.warning("Ungültiger Befehl auf %s: %r", thema, nutzdaten)
+
+
+class _MQTTTestBrokerHandler(socketserver.BaseRequestHandler):
+    """Bedient eine Client-Verbindung des MQTTTestBroker."""
+
+    def setup(self):
+        self.abos = []
+        self.__schreibsperre = threading.Lock()
+
+    def senden(self, daten):
+        with self.__schreibsperre:
+            self.request.sendall(daten)
+
+    def handle(self):
+        puffer = bytearray()
+        with self.server.sperre:
+            self.server.clients.add(self)
+
+        try:
+            while True:
+                paket = paket_zerlegen(puffer)
+                if paket is None:
+                    daten = self.request.recv(4096)
+                    if not daten:
+                        return
+                    puffer += daten
+                    continue
+
+                typ, flags, rumpf, verbraucht = paket
+                del puffer[:verbraucht]
+                if typ == DISCONNECT:
+                    return
+                self.__bearbeiten(typ, flags, rumpf)
+        except OSError:
+            pass
+        finally:
+            with self.server.sperre:
+                self.server.clients.discard(self)
+
+    def __bearbeiten(self, typ, flags, rumpf):
+        if typ == CONNECT:
+            self.senden(_paket(CONNACK, 0, bytes([0, 0])))
+
+        elif typ == SUBSCRIBE:
+            position, filter = 2, []
+            while position < len(rumpf):
+                laenge = int.from_bytes(rumpf[position:position + 2], "big")
+                filter.append(rumpf[position + 2:position + 2 + laenge]
+                              .decode())
+                position += 3 + laenge
+            self.senden(_paket(SUBACK, 0, rumpf[:2] + bytes(len(filter))))
+            self.abos.extend(filter)
+
+            with self.server.sperre:
+                gespeichert = list(self.server.retained.items())
+            for thema, nutzdaten in gespeichert:
+                if any(thema_passt(f, thema) for f in filter):
+                    self.senden(publish_paket(thema, nutzdaten, True))
+
+        elif typ == PUBLISH:
+            thema, nutzdaten = publish_zerlegen(rumpf)
+            self.server.nachrichten.append((thema, nutzdaten))
+            with self.server.sperre:
+                if flags & 1:
+                    self.server.retained[thema] = nutzdaten
+                clients = list(self.server.clients)
+            for client in clients:
+                if any(thema_passt(f, thema) for f in client.abos):
+                    try:
+                        client.senden(publish_paket(thema, nutzdaten))
+                    except OSError:
+                        pass
+
+        elif typ == PINGREQ and self.server.pings_beantworten:
+            self.senden(_paket(PINGRESP, 0, b""))
+
+
+class MQTTTestBroker(socketserver.ThreadingTCPServer):
+    """Ein minimaler MQTT-Broker für Tests.
+
+    Er unterstützt CONNECT, SUBSCRIBE (mit Platzhaltern), PUBLISH mit QoS 0
+    und retained-Nachrichten sowie PINGREQ. Alle veröffentlichten Nachrichten
+    werden in der Liste nachrichten festgehalten. Ist pings_beantworten
+    False, bleiben PINGREQs unbeantwortet wie bei einem hängenden Broker.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=1883):
+        super().__init__((host, port), _MQTTTestBrokerHandler)
+        self.sperre = threading.Lock()
+        self.clients = set()
+        self.retained = {}
+        self.nachrichten = []
+        self.pings_beantworten = True
+        self.__thread = None
+
+    def starten(self):
+        """Startet den Broker in einem eigenen Thread."""
+        self.__thread = threading.Thread(target=self.serve_forever,
+                                         daemon=True)
+        self.__thread.start()
+
+    def verbindungen_trennen(self):
+        """Trennt alle Client-Verbindungen, z.B. um das Wiederverbinden zu
+        testen."""
+        with self.sperre:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def beenden(self):
+        """Trennt alle Verbindungen und beendet den Broker."""
+        self.verbindungen_trennen()
+        self.shutdown()
+        self.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+
+
+def main():
+    """Hauptprogramm, das ein EAModul mit einem Broker verbindet. Es
+    endet bei SIGTERM oder SIGINT.
+
+      $ python3 -m eapi.mqtt brokerhost [port] [praefix]
+    """
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Aufruf: python3 -m eapi.mqtt brokerhost [port] [praefix]")
+        return
+
+    port = int(sys.argv[2]) if len(sys.argv) >= 3 else 1883
+    praefix = sys.argv[3] if len(sys.argv) >= 4 else "eapi"
+
+    # Signale vor dem Start weiterer Threads blockieren, damit sie nur von
+    # sigwait im Hauptthread entgegengenommen werden.
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM, signal.SIGINT})
+
+    ea = EAModul()
+    bruecke = EAModulMQTTBruecke(ea, sys.argv[1], port, praefix)
+    bruecke.start()
+    signal.sigwait({signal.SIGTERM, signal.SIGINT})
+
+    bruecke.stop()
+    ea.cleanup()
+
+
+if __name__ == "__main__":
+    main()
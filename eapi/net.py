@@ -18,9 +18,9 @@ gestartet werden.
   $ python3 -m eapi.net startserver
 
 Nun wartet der Server auf dem Port 9999 auf UDP-Pakete. Ein an den Server
-gesendeter Request besteht aus genau einem Byte - weitere gesendete Bytes
-werden ignoriert. Die letzen sechs Bit (0 oder 1) des gesendeten Bytes, werden
-als Werte für die rote, gelbe und grüne LED interpretiert:
+gesendeter Request besteht aus einem Byte. Die letzen sechs Bit (0 oder 1)
+des gesendeten Bytes, werden als Werte für die rote, gelbe und grüne LED
+interpretiert:
 
   ? ? 0 0 1 1 1 0
       ^   ^   ^
@@ -48,11 +48,87 @@ Escapesequenz verschickt, die Option -n besagt, dass kein Zeilenumbruch
 gesendet werden soll - also nur die angegebenen Bytes. Die Option -4 von nc
 sendet ein IPv4-Paket, das als UDP-Paket (-u) verschickt werden soll.
 
+Steuert der Server mehrere Module an, wählt ein zweites Byte das Modul aus
+(s. EAModulServer); auf dieses kann ein Zeitpunkt (8 Byte, s.u.) folgen.
+Dieses erweiterte Format kennzeichnet das oberste Bit des ersten Bytes
+(MIT_MODUL_ID), das für die LEDs nicht verwendet wird:
+
+  1 ? 0 0 1 1 1 0   0 0 0 0 0 1 1 1   [Zeitpunkt]
+  ^                 Modul-ID 7
+  erweitertes Format
+
+Ist das Bit nicht gesetzt, schaltet das Paket wie in älteren Versionen das
+Modul 0, weitere Bytes werden ignoriert. Der Zeilenumbruch von echo ohne -n
+schadet daher nicht. Erweiterte Pakete müssen genau 2 oder 10 Byte lang
+sein, sonst werden sie als fehlerhaft gezählt.
+
+Wenn langsame Beobachter (z.B. Visualisierungen) am EAModul registriert
+sind, kann der Server im entkoppelten Modus gestartet werden. Der
+Empfangsthread nimmt dann nur noch Pakete entgegen, während ein eigener
+Hardware-Thread die LEDs schaltet. Dazwischen liegende Zustände werden
+zusammengefasst.
+
+  easerver = EAModulServer("localhost", 9999, entkoppelt=True)
+
+Der Server zählt empfangene Pakete und misst, wie lange es vom Empfang bis
+zum Schalten der LEDs dauert. Die Zeit der Beobachter der LEDs wird dabei
+getrennt ausgewiesen. Die Metriken können über einen Client abgefragt
+werden:
+
+  client = EAModulClient("localhost", 9999)
+  client.statistik()
+
+Mit netcat kann die Statistik auch im Textformat von Prometheus abgerufen
+werden:
+
+  $ echo -en '\\x00metrics' | nc -4u -w1 localhost 9999
+
+Ist bei einem Modul die Laufzeitmessung eingeschaltet
+(eamodul.messung_einschalten()), enthalten beide Formate zusätzlich die
+Laufzeiten seiner Operationen und Beobachter.
+
+Viele Server lassen sich mit eapi.monitor gleichzeitig im Terminal
+beobachten. Der Monitor abonniert dazu den Zustand der LEDs und Taster
+(ABO_ANFRAGE).
+
+  $ python3 -m eapi.monitor pi1:9999 pi2:9999
+
+Über unzuverlässige Verbindungen (z.B. WLAN) können UDP-Pakete verloren
+gehen oder in anderer Reihenfolge ankommen. Hierfür gibt es mit
+EAModulStreamServer und EAModulStreamClient eine Variante, die dauerhafte
+TCP-Verbindungen oder lokal einen Unix Domain Socket verwendet.
+
 Das Modul enthält einen einfachen Konsolenclient, der über die Konsole
 gestartet werden kann:
 
   $ python3 -m eapi.net startclient
 
+Um die LEDs aus anderen Programmen heraus anzusteuern, liest der Befehl play
+Frames von der Standardeingabe oder aus einer Datei und sendet sie im
+angegebenen Takt. Jede Zeile enthält die drei Werte wie beim startclient,
+optional mit vorangestelltem Zeitpunkt in Sekunden:
+
+  $ printf '0.0 100\\n0.5 010\\n1.0 001\\n' | python3 -m eapi.net play
+
+Ein Server kann alle empfangenen Requests in einem Mitschnitt speichern.
+Dieser lässt sich später im ursprünglichen Tempo oder so schnell wie möglich
+erneut an einen Server senden:
+
+  $ python3 -m eapi.net replay eamodul.cap localhost 9999 --schnell
+
+Damit mehrere Boards trotz schwankender Laufzeiten im Netz gleichzeitig
+schalten, können Befehle mit einem Zeitpunkt versehen werden. Dazu gleicht
+der Client zunächst seine Uhr mit der des Servers ab:
+
+  client.uhr_abgleichen()
+  client.sende(1, 0, 1, zeitpunkt=time.time() + 0.1)
+
+Wie viele Pakete pro Sekunde ein Server verarbeiten kann, lässt sich ohne
+Pi mit dem folgenden Befehl messen. Das Ergebnis wird im JSON-Format
+ausgegeben.
+
+  $ python3 -m eapi.net bench --sender 2 --pakete 10000
+
 Mit dem Python-Modul socket kann ein Packet in Python selbst erstellt und an
 den Server gesendet werden.
 
@@ -68,52 +144,808 @@ Die zu sendenen Daten bestehen aus nur einem Byte.
 
 """
 
-# TODO Modul sendet an MQTT-Broker: https://www.dinotools.de/2015/04/12/mqtt-mit-python-nutzen/
-
+# Die Anbindung an einen MQTT-Broker befindet sich im Modul eapi.mqtt.
+
+import bisect
+import collections
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import selectors
 import socket
 import socketserver
+import struct
+import threading
+import time
 from eapi.hw import EAModul
 
+log = logging.getLogger(__name__)
+
+# Ein Request, dessen erstes Byte 0 ist, schaltet keine LED. Folgt darauf
+# der Text 'stats', antwortet der Server mit seinen Metriken im JSON-Format,
+# bei 'metrics' im Textformat von Prometheus.
+STATISTIK_ANFRAGE = b"\x00stats"
+PROMETHEUS_ANFRAGE = b"\x00metrics"
+# Auf 'zeit' mit einem Zeitstempel des Clients antwortet der Server mit dem
+# Zeitstempel sowie seiner Empfangs- und Sendezeit (je 8 Byte, double).
+ZEIT_ANFRAGE = b"\x00zeit"
+# Mit 'abo' abonniert ein Client für ABO_DAUER Sekunden den Zustand des
+# Servers. Er erhält sofort und nach jeder Änderung der LEDs (höchstens alle
+# ABO_INTERVALL Sekunden) eine ZUSTAND_MELDUNG, gefolgt von einem
+# JSON-Dokument mit den LEDs und Tastern jedes Moduls.
+ABO_ANFRAGE = b"\x00abo"
+ZUSTAND_MELDUNG = b"\x00zustand"
+ABO_DAUER = 10.0
+ABO_INTERVALL = 0.1
+ABO_MAX = 256
+# Ist das oberste Bit des ersten Bytes gesetzt, folgt eine Modul-ID und
+# optional ein Zeitpunkt (s. zerlege).
+MIT_MODUL_ID = 0x80
+
+
+def kodiere(rot, gelb, gruen):
+    """Kodiert die Werte für die rote, gelbe und grüne LED in ein Byte gemäß
+    der Modulbeschreibung. Werte ungleich 0 oder 1 belassen die LED in ihrem
+    bisherigen Zustand.
+
+    >>> bin(kodiere(9, 1, 0))
+    '0b1110'
+    """
+    # ? ?  ? ?  ? ?
+    # r o  g e  g r
+    # 3 1  8 4  2 1
+    # 2 6
+    #
+    byte = 0
+    if gruen == 0 or gruen == 1:
+        byte += 2
+        if gruen:
+            byte += 1
+    if gelb == 0 or gelb == 1:
+        byte += 8
+        if gelb:
+            byte += 4
+    if rot == 0 or rot == 1:
+        byte += 32
+        if rot:
+            byte += 16
+
+    return byte
+
+
+def dekodiere(byte):
+    """Zerlegt ein empfangenes Byte in die Werte für die rote, gelbe und grüne
+    LED. Eine LED, die nicht geschaltet werden soll, erhält den Wert None.
+
+    >>> dekodiere(0xe)
+    [None, 1, 0]
+    >>> dekodiere(0b110011)
+    [1, None, 1]
+    """
+    # ?? ?? ??
+    # ro ge gr
+    # 31 84 21
+    # 26
+    #
+    werte = [None, None, None]
+    if byte & 32 == 32:
+        werte[EAModul.LED_ROT] = 1 if byte & 16 == 16 else 0
+    if byte & 8 == 8:
+        werte[EAModul.LED_GELB] = 1 if byte & 4 == 4 else 0
+    if byte & 2 == 2:
+        werte[EAModul.LED_GRUEN] = 1 if byte & 1 == 1 else 0
+
+    return werte
+
+
+def zerlege(data):
+    """Zerlegt einen Request, der LEDs schaltet, in die Modul-ID, die Werte
+    der LEDs (s. dekodiere) und den Zeitpunkt, zu dem geschaltet werden soll
+    (None für sofort). Ein erweitertes Paket mit falscher Länge führt zu
+    einem ValueError.
+
+    >>> zerlege(b"\\x0e")
+    (0, [None, 1, 0], None)
+    >>> zerlege(b"\\x0e\\n")
+    (0, [None, 1, 0], None)
+    >>> zerlege(bytes([0x0e | MIT_MODUL_ID, 7]))
+    (7, [None, 1, 0], None)
+    >>> zerlege(bytes([0x0e | MIT_MODUL_ID, 7]) + struct.pack("!d", 1.5))
+    (7, [None, 1, 0], 1.5)
+    """
+    werte = dekodiere(data[0])
+    if not data[0] & MIT_MODUL_ID:
+        return 0, werte, None
+
+    if len(data) == 2:
+        return data[1], werte, None
+    if len(data) == 10:
+        return data[1], werte, struct.unpack("!d", data[2:10])[0]
+
+    raise ValueError("Erweitertes Paket mit {} statt 2 oder 10 Byte"
+                     .format(len(data)))
+
+
+def _udp_verluste(sock):
+    """Gibt die Anzahl der Pakete zurück, die der Kernel für den UDP-Socket
+    sock verworfen hat, oder None, wenn das Betriebssystem sie nicht
+    ausweist (nur Linux, /proc/net/udp)."""
+    try:
+        inode = str(os.fstat(sock.fileno()).st_ino)
+        for pfad in ("/proc/net/udp", "/proc/net/udp6"):
+            with open(pfad) as datei:
+                next(datei)
+                for zeile in datei:
+                    spalten = zeile.split()
+                    if spalten[9] == inode:
+                        return int(spalten[-1])
+    except (OSError, ValueError, IndexError, StopIteration):
+        pass
+    return None
+
+
+class ServerMetriken:
+    """Zähler und ein Latenz-Histogramm für einen EAModulServer.
+
+    Gezählt wird aus mehreren Threads: dem Empfangsthread, den
+    Hardware-Threads im entkoppelten Modus und dem Thread des Zeitplaners.
+    Alle Änderungen laufen daher über die Methoden (z.B. zaehlen()), die
+    eine gemeinsame Sperre halten. Die Latenz wird vom Empfang eines Pakets
+    bis zum Ende der GPIO-Ausgabe gemessen und in feste Intervalle (in
+    Sekunden) einsortiert. Die Zeit, die die Beobachter der LEDs (z.B.
+    Visualisierungen) dabei benötigen, wird getrennt erfasst.
+
+    Der Zähler leer erfasst nur leere Pakete. Pakete, die der Kernel wegen
+    eines vollen Empfangspuffers verwirft, erreichen den Server nie; sie
+    stehen, soweit das Betriebssystem sie ausweist, in verloren (sonst
+    None).
+
+    >>> metriken = ServerMetriken()
+    >>> metriken.paket_empfangen(b"\\x0e")
+    >>> metriken.latenz_messen(0.0003)
+    >>> metriken.zaehlen("fehlerhaft")
+    >>> metriken.schnappschuss()["latenz"]["anzahl"], metriken.fehlerhaft
+    (1, 1)
+    >>> print(metriken.prometheus().splitlines()[0])
+    # TYPE eapi_pakete_empfangen_total counter
+    """
+
+    LATENZ_GRENZEN = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                      0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+    def __init__(self):
+        self.__sperre = threading.Lock()
+        self.empfangen = 0
+        self.bytes = 0
+        self.zuletzt_empfangen = None
+        self.leer = 0
+        self.verloren = None
+        self.fehlerhaft = 0
+        self.zusammengefasst = 0
+        self.gedrosselt = 0
+
+        # Ein Eintrag mehr für Latenzen oberhalb der größten Grenze (+Inf)
+        self.latenz_histogramm = [0] * (len(self.LATENZ_GRENZEN) + 1)
+        self.latenz_summe = 0.0
+        self.latenz_anzahl = 0
+        self.latenz_max = 0.0
+        self.beobachter_summe = 0.0
+        self.beobachter_max = 0.0
+
+    def paket_empfangen(self, daten, zeitpunkt=None):
+        """Zählt ein empfangenes Paket mit seiner Länge. Der zeitpunkt
+        (time.perf_counter()) des Empfangs wird in zuletzt_empfangen
+        festgehalten."""
+        if zeitpunkt is None:
+            zeitpunkt = time.perf_counter()
+        with self.__sperre:
+            self.empfangen += 1
+            self.bytes += len(daten)
+            self.zuletzt_empfangen = zeitpunkt
+
+    def zaehlen(self, name, anzahl=1):
+        """Erhöht den Zähler name (z.B. 'fehlerhaft') um anzahl."""
+        with self.__sperre:
+            setattr(self, name, getattr(self, name) + anzahl)
+
+    def latenz_messen(self, sekunden):
+        """Sortiert eine gemessene Latenz in das Histogramm ein."""
+        intervall = bisect.bisect_left(self.LATENZ_GRENZEN, sekunden)
+        with self.__sperre:
+            self.latenz_histogramm[intervall] += 1
+            self.latenz_summe += sekunden
+            self.latenz_anzahl += 1
+            if sekunden > self.latenz_max:
+                self.latenz_max = sekunden
+
+    def beobachter_messen(self, sekunden):
+        """Erfasst die Zeit, die die Beobachter der LEDs beim Schalten
+        benötigt haben."""
+        with self.__sperre:
+            self.beobachter_summe += sekunden
+            if sekunden > self.beobachter_max:
+                self.beobachter_max = sekunden
+
+    def latenz_perzentil(self, anteil):
+        """Gibt eine obere Schranke für das Perzentil (anteil zwischen 0 und
+        1) der gemessenen Latenzen zurück: die Obergrenze des Intervalls, in
+        dem es liegt, höchstens aber die größte gemessene Latenz.
+
+        >>> metriken = ServerMetriken()
+        >>> for sekunden in [0.0002, 0.0002, 0.003, 2.0]:
+        ...     metriken.latenz_messen(sekunden)
+        >>> metriken.latenz_perzentil(0.5), metriken.latenz_perzentil(1.0)
+        (0.00025, 2.0)
+        """
+        with self.__sperre:
+            histogramm = list(self.latenz_histogramm)
+            gesamt, latenz_max = self.latenz_anzahl, self.latenz_max
+        if gesamt == 0:
+            return None
+
+        kumuliert = 0
+        for grenze, anzahl in zip(self.LATENZ_GRENZEN, histogramm):
+            kumuliert += anzahl
+            if kumuliert >= anteil * gesamt:
+                return min(grenze, latenz_max)
+
+        return latenz_max
+
+    def schnappschuss(self):
+        """Gibt alle Metriken als dict zurück."""
+        with self.__sperre:
+            return {
+                "empfangen": self.empfangen,
+                "bytes": self.bytes,
+                "leer": self.leer,
+                "verloren": self.verloren,
+                "fehlerhaft": self.fehlerhaft,
+                "zusammengefasst": self.zusammengefasst,
+                "gedrosselt": self.gedrosselt,
+                "latenz": {
+                    "grenzen": list(self.LATENZ_GRENZEN),
+                    "histogramm": list(self.latenz_histogramm),
+                    "summe": self.latenz_summe,
+                    "anzahl": self.latenz_anzahl,
+                    "max": self.latenz_max,
+                },
+                "beobachter": {
+                    "summe": self.beobachter_summe,
+                    "max": self.beobachter_max,
+                },
+            }
+
+    def prometheus(self):
+        """Gibt alle Metriken im Textformat von Prometheus zurück."""
+        werte = self.schnappschuss()
+        latenz = werte["latenz"]
+        zeilen = []
+        for name, wert in [("pakete_empfangen", werte["empfangen"]),
+                           ("bytes_empfangen", werte["bytes"]),
+                           ("pakete_leer", werte["leer"]),
+                           ("pakete_fehlerhaft", werte["fehlerhaft"]),
+                           ("pakete_zusammengefasst",
+                            werte["zusammengefasst"]),
+                           ("pakete_gedrosselt", werte["gedrosselt"])]:
+            zeilen.append("# TYPE eapi_{n}_total counter".format(n=name))
+            zeilen.append("eapi_{n}_total {w}".format(n=name, w=wert))
+        if werte["verloren"] is not None:
+            zeilen.append("# TYPE eapi_pakete_verloren_total counter")
+            zeilen.append("eapi_pakete_verloren_total {w}".format(
+                w=werte["verloren"]))
+
+        zeilen.append("# TYPE eapi_latenz_sekunden histogram")
+        kumuliert = 0
+        grenzen = [repr(g) for g in self.LATENZ_GRENZEN] + ["+Inf"]
+        for grenze, anzahl in zip(grenzen, latenz["histogramm"]):
+            kumuliert += anzahl
+            zeilen.append('eapi_latenz_sekunden_bucket{{le="{g}"}} {a}'.format(
+                g=grenze, a=kumuliert))
+        zeilen.append("eapi_latenz_sekunden_sum {s}".format(
+            s=repr(latenz["summe"])))
+        zeilen.append("eapi_latenz_sekunden_count {a}".format(
+            a=latenz["anzahl"]))
+
+        zeilen.append("# TYPE eapi_beobachter_sekunden_total counter")
+        zeilen.append("eapi_beobachter_sekunden_total {s}".format(
+            s=repr(werte["beobachter"]["summe"])))
+
+        return "\n".join(zeilen) + "\n"
+
+
+class _Ausgabe:
+    """Schaltet die LEDs eines Moduls und trennt dabei die Zeit der
+    GPIO-Ausgabe von der ihrer Beobachter.
+
+    Das EAModul ruft seine Beobachter nach der Ausgabe auf. Ein Beobachter,
+    der vor allen anderen registriert wird, merkt sich daher das Ende der
+    Ausgabe.
+    """
+
+    def __init__(self):
+        self.__lokal = threading.local()
+
+    def registrieren(self, eamodul):
+        """Registriert den Zeitnehmer an allen LEDs des eamodul."""
+        for farbe in range(3):
+            eamodul.led_event_registrieren(farbe, self.__ausgegeben,
+                                           zuerst=True)
+
+    def __ausgegeben(self, wert):
+        self.__lokal.zeitpunkt = time.perf_counter()
+
+    def schalten(self, eamodul, werte):
+        """Schaltet die LEDs gemäß der dekodierten werte und gibt die Zeit in
+        Sekunden zurück, die auf die Beobachter entfiel."""
+        lokal = self.__lokal
+        beobachter = 0.0
+        for farbe, wert in enumerate(werte):
+            if wert is not None:
+                lokal.zeitpunkt = None
+                eamodul.schalte_led(farbe, wert)
+                if lokal.zeitpunkt is not None:
+                    beobachter += time.perf_counter() - lokal.zeitpunkt
+        return beobachter
+
+    def messen(self, metriken, eamodul, werte, empfangen):
+        """Schaltet die LEDs und erfasst die Latenz seit dem Zeitpunkt
+        empfangen ohne die Zeit der Beobachter."""
+        beobachter = self.schalten(eamodul, werte)
+        metriken.latenz_messen(time.perf_counter() - empfangen - beobachter)
+        metriken.beobachter_messen(beobachter)
+
+
+class Ratenbegrenzer:
+    """Begrenzt die Anzahl der Requests je Absenderadresse mit einem
+    Token-Bucket.
+
+    Jede Adresse darf im Mittel rate Requests pro Sekunde senden und kurzzeitig
+    bis zu burst Requests auf einmal. Damit ein Angreifer mit gefälschten
+    Adressen den Speicher nicht füllen kann, werden höchstens max_quellen
+    Adressen gespeichert; die am längsten nicht gesehene Adresse wird
+    verdrängt. Ist eine Menge erlaubter Adressen angegeben, werden Requests
+    aller anderen Adressen abgelehnt.
+
+    >>> begrenzer = Ratenbegrenzer(rate=10, burst=2)
+    >>> [begrenzer.erlauben("10.0.0.1", jetzt=0.0) for _ in range(3)]
+    [True, True, False]
+    >>> begrenzer.erlauben("10.0.0.1", jetzt=0.1)
+    True
+    >>> begrenzer.gedrosselt_je_quelle()
+    {'10.0.0.1': 1}
+    """
+
+    def __init__(self, rate, burst, max_quellen=1024, erlaubt=None):
+        self.rate = rate
+        self.burst = burst
+        self.max_quellen = max_quellen
+        self.erlaubt = set(erlaubt) if erlaubt is not None else None
+        self.abgelehnt = 0
+
+        # Adresse -> [Tokens, Zeitpunkt der letzten Auffüllung, gedrosselt]
+        self.__quellen = collections.OrderedDict()
+
+    def erlauben(self, adresse, jetzt=None):
+        """Prüft, ob ein Request von der adresse bearbeitet werden darf, und
+        verbraucht dabei ein Token."""
+        if self.erlaubt is not None and adresse not in self.erlaubt:
+            self.abgelehnt += 1
+            return False
+
+        if jetzt is None:
+            jetzt = time.monotonic()
+
+        quelle = self.__quellen.get(adresse)
+        if quelle is None:
+            quelle = self.__quellen[adresse] = [self.burst, jetzt, 0]
+            if len(self.__quellen) > self.max_quellen:
+                self.__quellen.popitem(last=False)
+        else:
+            self.__quellen.move_to_end(adresse)
+            quelle[0] = min(self.burst,
+                            quelle[0] + (jetzt - quelle[1]) * self.rate)
+            quelle[1] = jetzt
+
+        if quelle[0] >= 1:
+            quelle[0] -= 1
+            return True
+
+        quelle[2] += 1
+        return False
+
+    def gedrosselt_je_quelle(self):
+        """Gibt für alle gespeicherten Adressen, die gedrosselt wurden, die
+        Anzahl der gedrosselten Requests zurück."""
+        return {adresse: quelle[2]
+                for adresse, quelle in self.__quellen.items() if quelle[2]}
+
+
+class Zeitplaner:
+    """Führt Aktionen in einem eigenen Thread zu festgelegten Zeitpunkten
+    (time.time()) aus.
+
+    Der Thread schläft bis kurz vor dem Zeitpunkt und wartet die letzten
+    Millisekunden aktiv, damit die Aktion möglichst genau ausgeführt wird.
+
+    >>> zeitplaner = Zeitplaner()
+    >>> ergebnis = []
+    >>> zeitplaner.einplanen(time.time() + 0.02, lambda: ergebnis.append(2))
+    >>> zeitplaner.einplanen(time.time() + 0.01, lambda: ergebnis.append(1))
+    >>> time.sleep(0.05)
+    >>> ergebnis
+    [1, 2]
+    >>> zeitplaner.schliessen()
+
+    Zeitpunkte, die keine endlichen Zahlen sind oder zu weit von jetzt
+    entfernt liegen, werden ebenso mit einem ValueError abgelehnt wie
+    Aktionen, wenn der Plan voll ist.
+
+    >>> zeitplaner = Zeitplaner(max_abstand=60)
+    >>> zeitplaner.einplanen(float("nan"), print)
+    Traceback (most recent call last):
+    ...
+    ValueError: Ungültiger Zeitpunkt: nan
+    >>> zeitplaner.einplanen(time.time() + 3600, print)
+    Traceback (most recent call last):
+    ...
+    ValueError: Zeitpunkt liegt mehr als 60 s von jetzt entfernt.
+    >>> zeitplaner.schliessen()
+    """
+
+    # So viele Sekunden vor dem Zeitpunkt wird aktiv gewartet.
+    VORLAUF = 0.002
+
+    def __init__(self, max_abstand=3600, max_aktionen=10000):
+        """Zeitpunkte dürfen höchstens max_abstand Sekunden von jetzt
+        entfernt liegen; es werden höchstens max_aktionen Aktionen
+        gleichzeitig eingeplant."""
+        self.max_abstand = max_abstand
+        self.max_aktionen = max_aktionen
+        self.__bedingung = threading.Condition()
+        self.__plan = []
+        self.__nummern = itertools.count()
+        self.__geschlossen = False
+        self.verspaetet = 0
+        self.__thread = threading.Thread(target=self.__ausfuehren,
+                                         daemon=True)
+        self.__thread.start()
+
+    def einplanen(self, zeitpunkt, aktion):
+        """Plant die aktion (ohne Argumente) für den zeitpunkt ein. Liegt der
+        Zeitpunkt in der Vergangenheit, wird sie sofort ausgeführt."""
+        if not math.isfinite(zeitpunkt):
+            raise ValueError("Ungültiger Zeitpunkt: " + str(zeitpunkt))
+        if abs(zeitpunkt - time.time()) > self.max_abstand:
+            raise ValueError(
+                "Zeitpunkt liegt mehr als {a} s von jetzt entfernt.".format(
+                    a=self.max_abstand))
+
+        with self.__bedingung:
+            if len(self.__plan) >= self.max_aktionen:
+                raise ValueError("Es sind bereits {n} Aktionen eingeplant."
+                                 .format(n=self.max_aktionen))
+            heapq.heappush(self.__plan,
+                           (zeitpunkt, next(self.__nummern), aktion))
+            self.__bedingung.notify()
+
+    def schliessen(self):
+        """Beendet den Thread. Noch nicht ausgeführte Aktionen verfallen."""
+        with self.__bedingung:
+            self.__geschlossen = True
+            self.__bedingung.notify()
+        self.__thread.join()
+
+    def __ausfuehren(self):
+        while True:
+            with self.__bedingung:
+                while True:
+                    if self.__geschlossen:
+                        return
+                    if not self.__plan:
+                        self.__bedingung.wait()
+                        continue
+
+                    warten = self.__plan[0][0] - time.time()
+                    if warten <= self.VORLAUF:
+                        zeitpunkt, _, aktion = heapq.heappop(self.__plan)
+                        break
+                    self.__bedingung.wait(warten - self.VORLAUF)
+
+            if warten < 0:
+                self.verspaetet += 1
+            while time.time() < zeitpunkt:
+                time.sleep(0)
+            try:
+                aktion()
+            except Exception:
+                log.exception("Fehler in einer eingeplanten Aktion")
+
+
+class LEDPostfach:
+    """Ein Postfach, über das der Empfangsthread neue LED-Zustände an den
+    Hardware-Thread übergibt.
+
+    Es wird immer nur der neueste Zustand aufbewahrt. Trifft ein neuer
+    Zustand ein, bevor der alte abgeholt wurde, werden beide zusammengefasst:
+    Werte des neuen Zustands überschreiben die des alten, LEDs ohne neuen Wert
+    (None) behalten den alten Wert.
+
+    >>> postfach = LEDPostfach()
+    >>> postfach.ablegen([1, None, None])
+    >>> postfach.ablegen([0, 1, None])
+    >>> postfach.zusammengefasst
+    1
+    >>> postfach.abholen()
+    [0, 1, None]
+    """
+
+    def __init__(self):
+        self.__bedingung = threading.Condition()
+        self.__werte = None
+        self.__zeitpunkt = None
+        self.__geschlossen = False
+        self.zusammengefasst = 0
+
+    def ablegen(self, werte, zeitpunkt=None):
+        """Legt einen neuen LED-Zustand in das Postfach. Die Methode blockiert
+        nie.
+
+        Der optionale zeitpunkt gibt an, wann der Zustand empfangen wurde.
+        Bei zusammengefassten Zuständen wird der älteste Zeitpunkt behalten.
+        """
+        with self.__bedingung:
+            if self.__werte is None:
+                self.__werte = list(werte)
+                self.__zeitpunkt = zeitpunkt
+            else:
+                self.zusammengefasst += 1
+                for i, wert in enumerate(werte):
+                    if wert is not None:
+                        self.__werte[i] = wert
+            self.__bedingung.notify()
+
+    def abholen(self):
+        """Wartet, bis ein LED-Zustand vorliegt, und gibt ihn zurück. Wurde das
+        Postfach geschlossen, wird None zurückgegeben."""
+        return self.abholen_mit_zeitpunkt()[0]
+
+    def abholen_mit_zeitpunkt(self):
+        """Wie abholen, gibt aber zusätzlich den Empfangszeitpunkt des
+        ältesten zusammengefassten Zustands zurück."""
+        with self.__bedingung:
+            while self.__werte is None and not self.__geschlossen:
+                self.__bedingung.wait()
+
+            werte, self.__werte = self.__werte, None
+            return werte, self.__zeitpunkt
+
+    def schliessen(self):
+        """Schließt das Postfach und weckt einen wartenden Hardware-Thread."""
+        with self.__bedingung:
+            self.__geschlossen = True
+            self.__bedingung.notify_all()
+
+
+class Mitschnitt:
+    """Schreibt empfangene Requests in eine kompakte Datei, an die nur
+    angehängt wird.
+
+    Jeder Eintrag besteht aus einem monotonen Zeitstempel, der Adresse des
+    Absenders und den empfangenen Daten. Überschreitet die Datei
+    max_groesse Bytes, wird sie wie bei einem RotatingFileHandler in
+    pfad.1 umbenannt (ältere Dateien in pfad.2 usw.). Es werden höchstens
+    max_dateien alte Dateien aufbewahrt.
+
+    >>> import os, tempfile
+    >>> pfad = os.path.join(tempfile.mkdtemp(), "eamodul.cap")
+    >>> mitschnitt = Mitschnitt(pfad)
+    >>> mitschnitt.schreiben(b"\\x0e", ("127.0.0.1", 5000), zeitpunkt=1.5)
+    >>> mitschnitt.schliessen()
+    >>> list(mitschnitt_lesen(pfad))
+    [(1.5, ('127.0.0.1', 5000), b'\\x0e')]
+    """
+
+    KOPF = b"EACAP1\n"
+    # Frühere Versionen schrieben einen Backslash und ein n statt des
+    # Zeilenumbruchs. Solche Dateien werden weiterhin gelesen.
+    ALTER_KOPF = b"EACAP1\\n"
+    # Zeitstempel, Port, Länge der Adresse, Länge der Daten
+    EINTRAG = struct.Struct("!dHBH")
+
+    def __init__(self, pfad, max_groesse=10 * 1024 * 1024, max_dateien=5):
+        self.pfad = pfad
+        self.max_groesse = max_groesse
+        self.max_dateien = max_dateien
+        self.__sperre = threading.Lock()
+        self.__datei = None
+        self.__oeffnen()
+
+    def schreiben(self, daten, adresse, zeitpunkt=None):
+        """Hängt einen Request an. Ohne zeitpunkt wird time.monotonic()
+        verwendet."""
+        if zeitpunkt is None:
+            zeitpunkt = time.monotonic()
+
+        host, port = adresse[0].split("%")[0], adresse[1]
+        familie = socket.AF_INET6 if ":" in host else socket.AF_INET
+        host = socket.inet_pton(familie, host)
+        eintrag = (self.EINTRAG.pack(zeitpunkt, port, len(host), len(daten)) +
+                   host + daten)
+
+        with self.__sperre:
+            self.__datei.write(eintrag)
+            if self.__datei.tell() >= self.max_groesse:
+                self.__rotieren()
+
+    def flush(self):
+        """Schreibt gepufferte Einträge in die Datei."""
+        with self.__sperre:
+            self.__datei.flush()
+
+    def schliessen(self):
+        """Schreibt alle Einträge und schließt die Datei."""
+        with self.__sperre:
+            self.__datei.close()
+
+    def __oeffnen(self):
+        self.__datei = open(self.pfad, "ab")
+        if self.__datei.tell() == 0:
+            self.__datei.write(self.KOPF)
+
+    def __rotieren(self):
+        self.__datei.close()
+        for nr in range(self.max_dateien - 1, 0, -1):
+            alt = "{p}.{n}".format(p=self.pfad, n=nr)
+            if os.path.exists(alt):
+                os.replace(alt, "{p}.{n}".format(p=self.pfad, n=nr + 1))
+        os.replace(self.pfad, self.pfad + ".1")
+        self.__oeffnen()
+
+
+def mitschnitt_dateien(pfad):
+    """Gibt die vorhandenen Dateien eines rotierten Mitschnitts von der
+    ältesten bis zur neuesten zurück."""
+    dateien = []
+    nr = 1
+    while os.path.exists("{p}.{n}".format(p=pfad, n=nr)):
+        dateien.insert(0, "{p}.{n}".format(p=pfad, n=nr))
+        nr += 1
+    if os.path.exists(pfad):
+        dateien.append(pfad)
+
+    return dateien
+
+
+def mitschnitt_lesen(pfad):
+    """Liest die Einträge einer Mitschnittdatei und liefert sie als Tupel
+    aus Zeitstempel, Adresse und Daten."""
+    with open(pfad, "rb") as datei:
+        kopf = datei.read(len(Mitschnitt.KOPF))
+        if kopf == Mitschnitt.ALTER_KOPF[:len(kopf)]:
+            kopf += datei.read(len(Mitschnitt.ALTER_KOPF) - len(kopf))
+        if kopf not in (Mitschnitt.KOPF, Mitschnitt.ALTER_KOPF):
+            raise ValueError("Keine Mitschnittdatei: " + str(pfad))
+
+        groesse = Mitschnitt.EINTRAG.size
+        while True:
+            kopf = datei.read(groesse)
+            if len(kopf) < groesse:
+                return
+            zeitpunkt, port, adresslaenge, datenlaenge = \
+                Mitschnitt.EINTRAG.unpack(kopf)
+            host = datei.read(adresslaenge)
+            daten = datei.read(datenlaenge)
+            if len(daten) < datenlaenge:
+                # Unvollständiger letzter Eintrag
+                return
+
+            familie = socket.AF_INET6 if adresslaenge == 16 else socket.AF_INET
+            yield zeitpunkt, (socket.inet_ntop(familie, host), port), daten
+
+
+def abspielen(pfad, host, port, tempo=1.0):
+    """Sendet die Requests eines Mitschnitts (inklusive rotierter Dateien)
+    erneut an einen Server.
+
+    Mit tempo=1.0 werden die ursprünglichen Abstände eingehalten, mit 2.0
+    wird doppelt so schnell gesendet. Ist tempo None, wird so schnell wie
+    möglich gesendet. Zurückgegeben wird die Anzahl der erfolgreich
+    gesendeten Requests.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect((host, port))
+
+    anzahl = 0
+    start = erster = None
+    for datei in mitschnitt_dateien(pfad):
+        for zeitpunkt, _, daten in mitschnitt_lesen(datei):
+            if tempo is not None:
+                if start is None:
+                    start, erster = time.perf_counter(), zeitpunkt
+                _warten_bis(start + (zeitpunkt - erster) / tempo)
+            try:
+                sock.send(daten)
+                anzahl += 1
+            except ConnectionRefusedError:
+                # Der Server war (noch) nicht erreichbar.
+                pass
+
+    sock.close()
+    return anzahl
+
 
 class EAModulUDPHandler(socketserver.BaseRequestHandler):
-    """Ein Handler für UDP requests an den EAModulServer."""
+    """Ein Handler für UDP requests an den EAModulServer.
 
-    # eamodul als Klassenattribut, da für jeden Request auf den Server
-    # eine neue Handlerinstanz erzeugt wird.
-    eamodul = None
+    Für jeden Request wird eine neue Handlerinstanz erzeugt. Alle Zustände,
+    insbesondere die angesteuerten Module, gehören daher zum Server.
+    """
 
     def handle(self):
         """Der UDP-Handler bearbeitet UDP-Requests gemäß der Modulbeschreibung 
         (s.o.)."""
-        print("request erhalten!", self.request)
-
-        # statisches Modul initaisieren, falls noch nicht geschehen
-        if EAModulUDPHandler.eamodul is None:
-            EAModulUDPHandler.eamodul = EAModul()
+        empfangen = time.perf_counter()
+        log.debug("request erhalten! %s", self.request)
 
         # Der Request besteht aus einem Tupel aus Daten und Socket des
         # Senders. Wir greifen die Daten heraus.
         data = self.request[0]
+        metriken = self.server.metriken
+        metriken.paket_empfangen(data, empfangen)
 
         # Erwarte mindestens ein Byte im Request
         if len(data) < 1:
+            metriken.zaehlen("leer")
             return
 
-        # ?? ?? ??
-        # ro ge gr
-        # 31 84 21
-        # 26
-        #
-        byte = int(data[0])
-        if byte & 32 == 32:
-            EAModulUDPHandler.eamodul.schalte_led(EAModul.LED_ROT,
-                                                  byte & 16 == 16)
-        if byte & 8 == 8:
-            EAModulUDPHandler.eamodul.schalte_led(EAModul.LED_GELB,
-                                                  byte & 4 == 4)
-        if byte & 2 == 2:
-            EAModulUDPHandler.eamodul.schalte_led(EAModul.LED_GRUEN,
-                                                  byte & 1 == 1)
+        # Steueranfragen beginnen mit einem Nullbyte
+        if data[0] == 0 and len(data) > 1:
+            self.steueranfrage(data)
+            return
+
+        try:
+            modul_id, werte, zeitpunkt = zerlege(data)
+        except ValueError as e:
+            log.warning("Paket verworfen: %s", e)
+            metriken.zaehlen("fehlerhaft")
+            return
+
+        if modul_id not in self.server.module:
+            metriken.zaehlen("fehlerhaft")
+            return
+
+        # Enthält das Paket einen Zeitpunkt, wird erst dann geschaltet.
+        if zeitpunkt is not None:
+            try:
+                self.server.einplanen(zeitpunkt, modul_id, werte)
+            except ValueError as e:
+                log.warning("Zeitpunkt abgelehnt: %s", e)
+                metriken.zaehlen("fehlerhaft")
+            return
+
+        self.server.ausfuehren(modul_id, werte, empfangen)
+
+    def steueranfrage(self, data):
+        """Beantwortet eine Steueranfrage. Unbekannte Anfragen werden als
+        fehlerhaft gezählt."""
+        if data == STATISTIK_ANFRAGE:
+            antwort = json.dumps(self.server.statistik).encode()
+            self.request[1].sendto(antwort, self.client_address)
+        elif data == PROMETHEUS_ANFRAGE:
+            antwort = self.server.prometheus().encode()
+            self.request[1].sendto(antwort, self.client_address)
+        elif data == ABO_ANFRAGE:
+            self.server.abonnieren(self.client_address)
+        elif (data.startswith(ZEIT_ANFRAGE) and
+              len(data) == len(ZEIT_ANFRAGE) + 8):
+            empfangen = time.time()
+            antwort = data + struct.pack("!dd", empfangen, time.time())
+            self.request[1].sendto(antwort, self.client_address)
+        else:
+            self.server.metriken.zaehlen("fehlerhaft")
 
 
 class EAModulServer(socketserver.UDPServer):
@@ -129,20 +961,649 @@ class EAModulServer(socketserver.UDPServer):
     
     Ein an den Server gesendeter Request wird vom EAModulUDPHandler
     verarbeitet.
+
+    >>> easerver.server_close()
+
+    Ein Server kann mehrere Module ansteuern. Dazu wird ihm eine
+    Routingtabelle übergeben, die einer Modul-ID (0 bis 255) ein EAModul
+    zuordnet. Die Modul-ID wird als zweites Byte eines Requests gesendet,
+    dessen erstes Byte das Bit MIT_MODUL_ID gesetzt hat. Alle anderen
+    Requests gehen an das Modul mit der ID 0.
+
+    >>> ea0, ea1 = EAModul(), EAModul(12, 16, 18, 22, 24)
+    >>> easerver = EAModulServer("localhost", 9999, module={0: ea0, 1: ea1})
+    >>> easerver.module[1] is ea1
+    True
+    >>> easerver.server_close()
+
+    Im entkoppelten Modus nimmt der Empfangsthread die Pakete nur entgegen und
+    legt die gewünschten LED-Zustände in einem LEDPostfach ab. Für jedes Modul
+    schaltet ein eigener Hardware-Thread die LEDs und benachrichtigt die
+    Beobachter. Ist der Hardware-Thread langsamer als die eintreffenden
+    Pakete, werden die Zustände zusammengefasst, so dass nur der neueste
+    Zustand geschaltet wird.
+
+    >>> easerver = EAModulServer("localhost", 9999, entkoppelt=True,
+    ...                          empfangspuffer=1 << 20)
+    >>> easerver.statistik["empfangen"]
+    0
+    >>> easerver.server_close()
+
+    Damit mehrere Boards genau gleichzeitig schalten, kann ein Request nach
+    der Modul-ID einen Zeitpunkt (double, 8 Byte, Sekunden seit 1970 nach
+    der Uhr des Servers) enthalten. Die LEDs werden dann erst zu diesem
+    Zeitpunkt geschaltet. Der Client gleicht dazu vorher seine Uhr mit der
+    des Servers ab (s. EAModulClient.uhr_abgleichen).
+
+    Für die Fehlersuche kann jeder empfangene Request in einem Mitschnitt
+    gespeichert werden, der später mit abspielen() erneut gesendet wird.
+
+      easerver = EAModulServer("localhost", 9999,
+                               mitschnitt=Mitschnitt("eamodul.cap"))
+
+    Mit einem Ratenbegrenzer kann verhindert werden, dass ein einzelner
+    Absender den Server überlastet und andere Absender verdrängt.
+
+    >>> easerver = EAModulServer("localhost", 9999,
+    ...                          ratenbegrenzer=Ratenbegrenzer(100, 20))
+    >>> easerver.server_close()
+
+    Über das Attribut metriken (ServerMetriken) zählt der Server empfangene,
+    leere und fehlerhafte Pakete und misst die Latenz vom Empfang bis zum
+    Schalten der LEDs. Die Werte können auch über das Netzwerk mit einer
+    Statistik-Anfrage (STATISTIK_ANFRAGE) abgefragt werden, auf die der Server
+    mit einem JSON-Dokument antwortet.
+
+    Mit einer ABO_ANFRAGE kann ein Client (z.B. eapi.monitor) den Zustand
+    der LEDs und Taster abonnieren. Die Taster werden erst verfolgt, wenn
+    sich der erste Abonnent anmeldet; ihre Wechsel werden dann ebenso wie die
+    der LEDs sofort gemeldet.
     """
 
-    def __init__(self, host, port, eamodul=None):
+    def __init__(self, host, port, eamodul=None, entkoppelt=False,
+                 empfangspuffer=None, module=None, ratenbegrenzer=None,
+                 mitschnitt=None):
         """Starte einen Server auf dem angegebnen hostname, oder IP-Adresse - 
         lokale Server können hier auch 'localhost' als Name verwenden.
 
         Über den Parameter eamodul kann ein EAModul übergeben werden. Wird
-        kein Modul übergeben, wird ein Standardmodul selbst erstellt.
+        kein Modul übergeben, wird beim ersten Request ein Standardmodul
+        selbst erstellt. Mit module kann stattdessen eine Routingtabelle (dict)
+        von Modul-IDs auf EAModule übergeben werden.
+
+        Mit entkoppelt=True werden Empfang und Schalten der LEDs auf
+        verschiedene Threads verteilt. Über empfangspuffer kann die Größe des
+        Empfangspuffers (SO_RCVBUF) des Sockets in Byte festgelegt werden.
+
+        Wird ein Ratenbegrenzer übergeben, werden Requests von Absendern, die
+        ihr Kontingent überschreiten, verworfen und als gedrosselt gezählt.
+        Ist ein Mitschnitt angegeben, wird jeder empfangene Request vor der
+        weiteren Bearbeitung darin gespeichert.
         """
+        self.empfangspuffer = empfangspuffer
+        self.ratenbegrenzer = ratenbegrenzer
+        self.mitschnitt = mitschnitt
+        self.metriken = ServerMetriken()
+        self.postfaecher = {}
+        self.__ausgabe = _Ausgabe()
+        self.__hardware_threads = []
+        self.__zeitplaner = None
+        # Abonnenten (Adresse -> Ablaufzeitpunkt) und bekannte LED-Zustände
+        self.abonnenten = {}
+        self.__leds = {}
+        self.__taster_verfolgt = False
+        self.__meldung_geplant = None
+        self.__abo_sperre = threading.Lock()
+
+        # Die Routingtabelle ist ein dict, so dass ein Modul in konstanter
+        # Zeit gefunden wird. Ein Eintrag None steht für das Standardmodul,
+        # das erst beim ersten Request erzeugt wird.
+        self.module = dict(module) if module else {0: eamodul}
 
         super().__init__((host, port), EAModulUDPHandler)
 
-        if eamodul:
-            EAModulUDPHandler.eamodul = eamodul
+        if entkoppelt:
+            for modul_id in self.module:
+                self.postfaecher[modul_id] = LEDPostfach()
+                thread = threading.Thread(target=self.__hardware_schalten,
+                                          args=(modul_id,), daemon=True)
+                thread.start()
+                self.__hardware_threads.append(thread)
+
+    @property
+    def statistik(self):
+        """Die aktuellen Metriken des Servers als dict."""
+        self.__zaehler_uebernehmen()
+        statistik = self.metriken.schnappschuss()
+        if self.ratenbegrenzer is not None:
+            statistik["gedrosselt_je_quelle"] = \
+                self.ratenbegrenzer.gedrosselt_je_quelle()
+
+        laufzeiten = self.laufzeiten()
+        if laufzeiten:
+            statistik["laufzeiten"] = laufzeiten
+
+        return statistik
+
+    def laufzeiten(self):
+        """Die Schnappschüsse der Laufzeitmessungen aller Module, deren
+        Messung eingeschaltet ist (s. EAModul.messung_einschalten), als dict
+        von der Modul-ID (als Text) auf den Schnappschuss."""
+        return {str(modul_id): eamodul.laufzeiten.schnappschuss()
+                for modul_id, eamodul in self.module.items()
+                if getattr(eamodul, "laufzeiten", None) is not None}
+
+    def prometheus(self):
+        """Die aktuellen Metriken des Servers im Textformat von Prometheus.
+        Laufzeitmessungen der Module werden als Histogramm
+        eapi_operation_sekunden angehängt."""
+        self.__zaehler_uebernehmen()
+        text = self.metriken.prometheus()
+
+        laufzeiten = self.laufzeiten()
+        if not laufzeiten:
+            return text
+
+        zeilen = ["# TYPE eapi_operation_sekunden histogram"]
+        for modul_id, schnappschuss in sorted(laufzeiten.items()):
+            grenzen = [repr(g) for g in schnappschuss["grenzen"]] + ["+Inf"]
+            for operation, werte in sorted(
+                    schnappschuss["operationen"].items()):
+                marken = 'modul="{m}",operation="{o}"'.format(
+                    m=modul_id, o=operation)
+                kumuliert = 0
+                for grenze, anzahl in zip(grenzen, werte["histogramm"]):
+                    kumuliert += anzahl
+                    zeilen.append(
+                        'eapi_operation_sekunden_bucket{{{m},le="{g}"}} {a}'
+                        .format(m=marken, g=grenze, a=kumuliert))
+                zeilen.append("eapi_operation_sekunden_sum{{{m}}} {s}".format(
+                    m=marken, s=repr(werte["summe"])))
+                zeilen.append("eapi_operation_sekunden_count{{{m}}} {a}"
+                              .format(m=marken, a=werte["anzahl"]))
+
+        return text + "\n".join(zeilen) + "\n"
+
+    def __zaehler_uebernehmen(self):
+        """Übernimmt die Zähler der Postfächer und die vom Kernel verworfenen
+        Pakete in die Metriken."""
+        self.metriken.verloren = _udp_verluste(self.socket)
+        if self.postfaecher:
+            self.metriken.zusammengefasst = sum(
+                postfach.zusammengefasst
+                for postfach in self.postfaecher.values())
+
+    def modul(self, modul_id=0):
+        """Gibt das Modul mit der gegebenen ID zurück. Das Standardmodul wird
+        erzeugt, falls noch nicht geschehen."""
+        eamodul = self.module[modul_id]
+        if eamodul is None:
+            eamodul = self.module[modul_id] = EAModul()
+
+        if modul_id not in self.__leds:
+            self.__leds[modul_id] = [eamodul.led_wert(farbe)
+                                     for farbe in range(3)]
+            for farbe in range(3):
+                eamodul.led_event_registrieren(
+                    farbe, lambda wert, modul_id=modul_id, farbe=farbe:
+                    self.__led_geaendert(modul_id, farbe, wert))
+            self.__ausgabe.registrieren(eamodul)
+
+        return eamodul
+
+    def abonnieren(self, adresse):
+        """Trägt die adresse für ABO_DAUER Sekunden als Abonnent ein und
+        sendet ihr sofort den aktuellen Zustand. Bei mehr als ABO_MAX
+        Abonnenten wird die Anfrage ignoriert."""
+        jetzt = time.monotonic()
+        with self.__abo_sperre:
+            for abonnent, ablauf in list(self.abonnenten.items()):
+                if ablauf < jetzt:
+                    del self.abonnenten[abonnent]
+            if (adresse not in self.abonnenten and
+                    len(self.abonnenten) >= ABO_MAX):
+                return
+            self.abonnenten[adresse] = jetzt + ABO_DAUER
+            verfolgen = not self.__taster_verfolgt
+            self.__taster_verfolgt = True
+
+        if verfolgen:
+            self.__taster_verfolgen()
+        self.socket.sendto(self.zustand_meldung(), adresse)
+
+    def __taster_verfolgen(self):
+        """Registriert sich an den Tastern aller Module, damit ihre Wechsel
+        den Abonnenten sofort gemeldet werden."""
+        for modul_id in self.module:
+            eamodul = self.modul(modul_id)
+            for nr in range(2):
+                try:
+                    eamodul.taster_wechsel_registrieren(
+                        nr, lambda gedrueckt: self.__meldung_einplanen())
+                except RuntimeError as e:
+                    # RPi.GPIO erlaubt je Pin nur eine Art der Erkennung. Der
+                    # Taster wird dann nur mit jedem Abo gemeldet.
+                    log.warning("Taster %s von Modul %s wird nicht "
+                                "verfolgt: %s", nr, modul_id, e)
+
+    def zustand_meldung(self):
+        """Die ZUSTAND_MELDUNG mit den LEDs und Tastern aller Module."""
+        zustand = {}
+        for modul_id in self.module:
+            eamodul = self.modul(modul_id)
+            zustand[str(modul_id)] = {
+                "leds": list(self.__leds[modul_id]),
+                "taster": [int(eamodul.taster_gedrueckt(nr))
+                           for nr in range(2)]}
+
+        return ZUSTAND_MELDUNG + json.dumps(zustand).encode()
+
+    def __led_geaendert(self, modul_id, farbe, wert):
+        """Merkt die Änderung einer LED vor und plant die Meldung an die
+        Abonnenten ein."""
+        self.__leds[modul_id][farbe] = wert
+        self.__meldung_einplanen()
+
+    def __meldung_einplanen(self):
+        """Plant die Meldung des Zustands an die Abonnenten ein, falls noch
+        nicht geschehen. Änderungen innerhalb von ABO_INTERVALL werden in
+        einer Meldung zusammengefasst."""
+        if not self.abonnenten or self.__meldung_geplant is not None:
+            return
+
+        with self.__abo_sperre:
+            if self.__meldung_geplant is None:
+                self.__meldung_geplant = threading.Timer(
+                    ABO_INTERVALL, self.__zustand_melden)
+                self.__meldung_geplant.daemon = True
+                self.__meldung_geplant.start()
+
+    def __zustand_melden(self):
+        """Sendet den Zustand an alle Abonnenten, deren Abo nicht abgelaufen
+        ist."""
+        with self.__abo_sperre:
+            self.__meldung_geplant = None
+            jetzt = time.monotonic()
+            abonnenten = [adresse for adresse, ablauf
+                          in self.abonnenten.items() if ablauf >= jetzt]
+
+        meldung = self.zustand_meldung()
+        for adresse in abonnenten:
+            try:
+                self.socket.sendto(meldung, adresse)
+            except OSError:
+                pass
+
+    def ausfuehren(self, modul_id, werte, empfangen):
+        """Schaltet die LEDs des Moduls sofort oder übergibt sie im
+        entkoppelten Modus dem Hardware-Thread."""
+        postfach = self.postfaecher.get(modul_id)
+        if postfach is not None:
+            postfach.ablegen(werte, empfangen)
+        else:
+            self.schalten(modul_id, werte, empfangen)
+
+    def einplanen(self, zeitpunkt, modul_id, werte):
+        """Plant das Schalten der LEDs für den zeitpunkt ein. Der Zeitplaner
+        wird beim ersten Aufruf gestartet. Ungültige Zeitpunkte lösen einen
+        ValueError aus (s. Zeitplaner.einplanen)."""
+        if self.__zeitplaner is None:
+            self.__zeitplaner = Zeitplaner()
+
+        self.__zeitplaner.einplanen(
+            zeitpunkt,
+            lambda: self.ausfuehren(modul_id, werte, time.perf_counter()))
+
+    def schalten(self, modul_id, werte, empfangen):
+        """Schaltet die LEDs des Moduls gemäß der dekodierten werte und misst
+        die Latenz seit dem Zeitpunkt empfangen bis zum Ende der
+        GPIO-Ausgabe. Die Zeit der Beobachter wird getrennt erfasst."""
+        self.__ausgabe.messen(self.metriken, self.modul(modul_id), werte,
+                              empfangen)
+
+    def get_request(self):
+        """Nimmt einen Request entgegen und speichert ihn im Mitschnitt."""
+        request, client_address = super().get_request()
+        if self.mitschnitt is not None:
+            self.mitschnitt.schreiben(request[0], client_address)
+
+        return request, client_address
+
+    def verify_request(self, request, client_address):
+        """Verwirft Requests von Absendern, die vom Ratenbegrenzer gedrosselt
+        werden."""
+        if (self.ratenbegrenzer is not None and
+                not self.ratenbegrenzer.erlauben(client_address[0])):
+            self.metriken.zaehlen("gedrosselt")
+            return False
+
+        return True
+
+    def server_bind(self):
+        """Setzt vor dem Binden die Größe des Empfangspuffers, falls
+        angegeben."""
+        if self.empfangspuffer:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                   self.empfangspuffer)
+        super().server_bind()
+
+    def server_close(self):
+        """Schließt den Socket und beendet laufende Hardware-Threads."""
+        super().server_close()
+
+        if self.mitschnitt is not None:
+            self.mitschnitt.flush()
+
+        if self.__zeitplaner is not None:
+            self.__zeitplaner.schliessen()
+            self.__zeitplaner = None
+
+        with self.__abo_sperre:
+            if self.__meldung_geplant is not None:
+                self.__meldung_geplant.cancel()
+            self.abonnenten.clear()
+
+        for postfach in self.postfaecher.values():
+            postfach.schliessen()
+        for thread in self.__hardware_threads:
+            thread.join()
+        self.__hardware_threads = []
+
+    def __hardware_schalten(self, modul_id):
+        """Schaltet im Hardware-Thread die LEDs eines Moduls, solange sein
+        Postfach geöffnet ist."""
+        postfach = self.postfaecher[modul_id]
+        while True:
+            werte, empfangen = postfach.abholen_mit_zeitpunkt()
+            if werte is None:
+                return
+
+            self.schalten(modul_id, werte, empfangen)
+
+
+class EAModulServerGruppe:
+    """Eine Gruppe von EAModulServern, die in einem Prozess auf verschiedenen
+    Ports lauschen. Das angesteuerte Modul wird so über den Port ausgewählt.
+
+    >>> ea0, ea1 = EAModul(), EAModul(12, 16, 18, 22, 24)
+    >>> gruppe = EAModulServerGruppe("localhost", {9999: ea0, 10000: ea1})
+    >>> gruppe.server[10000].modul() is ea1
+    True
+
+    Alle Server werden in eigenen Threads gestartet.
+
+      gruppe.serve_forever()
+
+    >>> gruppe.server_close()
+    """
+
+    def __init__(self, host, ports, **kwargs):
+        """Erstellt für jeden Eintrag im dict ports (Port auf EAModul) einen
+        EAModulServer. Weitere Argumente werden an die Server weitergegeben.
+        """
+        self.server = {}
+        try:
+            for port, eamodul in ports.items():
+                self.server[port] = EAModulServer(host, port, eamodul,
+                                                  **kwargs)
+        except OSError:
+            self.server_close()
+            raise
+        self.__threads = []
+
+    def serve_forever(self):
+        """Startet alle Server und wartet, bis sie beendet werden."""
+        self.__threads = [threading.Thread(target=server.serve_forever)
+                          for server in self.server.values()]
+        for thread in self.__threads:
+            thread.start()
+        for thread in self.__threads:
+            thread.join()
+
+    def shutdown(self):
+        """Beendet alle laufenden Server."""
+        for server in self.server.values():
+            server.shutdown()
+
+    def server_close(self):
+        """Schließt die Sockets aller Server."""
+        for server in self.server.values():
+            server.server_close()
+
+
+class GeteiltesPostfach:
+    """Ein LEDPostfach im gemeinsamen Speicher, über das mehrere
+    Prozesse LED-Zustände an einen Hardware-Prozess übergeben.
+
+    Wie beim LEDPostfach wird nur der neueste Zustand aufbewahrt. Die Werte
+    liegen in einem multiprocessing.Array; ein Wert kleiner als 0 steht für
+    eine LED, die nicht geschaltet werden soll.
+
+    >>> postfach = GeteiltesPostfach()
+    >>> postfach.ablegen([1, None, None])
+    >>> postfach.ablegen([None, 0, None])
+    >>> postfach.abholen()
+    [1, 0, None]
+    >>> postfach.zusammengefasst
+    1
+    """
+
+    # Aufbau des Arrays
+    __ZEITPUNKT = 3
+    __ZUSAMMENGEFASST = 4
+    __GESCHLOSSEN = 5
+
+    def __init__(self, kontext=None):
+        """Erstellt das Postfach im multiprocessing-Kontext kontext (Standard:
+        der Standardkontext von multiprocessing)."""
+        import multiprocessing
+
+        kontext = kontext or multiprocessing.get_context()
+        self.__daten = kontext.Array("d", [-1, -1, -1, 0, 0, 0])
+        self.__signal = kontext.Event()
+
+    @property
+    def zusammengefasst(self):
+        """Anzahl der Zustände, die mit einem älteren zusammengefasst
+        wurden."""
+        return int(self.__daten[self.__ZUSAMMENGEFASST])
+
+    def ablegen(self, werte, zeitpunkt=None):
+        """Legt einen neuen LED-Zustand in das Postfach. Der zeitpunkt muss
+        von time.perf_counter() stammen, damit er in allen Prozessen gilt."""
+        with self.__daten.get_lock():
+            daten = self.__daten
+            if daten[0] >= 0 or daten[1] >= 0 or daten[2] >= 0:
+                daten[self.__ZUSAMMENGEFASST] += 1
+            else:
+                daten[self.__ZEITPUNKT] = zeitpunkt or 0
+            for i, wert in enumerate(werte):
+                if wert is not None:
+                    daten[i] = wert
+            self.__signal.set()
+
+    def abholen(self):
+        """Wartet, bis ein LED-Zustand vorliegt, und gibt ihn zurück. Wurde das
+        Postfach geschlossen, wird None zurückgegeben."""
+        return self.abholen_mit_zeitpunkt()[0]
+
+    def abholen_mit_zeitpunkt(self):
+        """Wie abholen, gibt aber zusätzlich den Empfangszeitpunkt des
+        ältesten zusammengefassten Zustands zurück."""
+        while True:
+            self.__signal.wait()
+            with self.__daten.get_lock():
+                self.__signal.clear()
+                daten = self.__daten
+                if daten[self.__GESCHLOSSEN]:
+                    return None, None
+
+                werte = [None if wert < 0 else int(wert)
+                         for wert in daten[0:3]]
+                if werte == [None, None, None]:
+                    continue
+                zeitpunkt = daten[self.__ZEITPUNKT] or None
+                daten[0:3] = [-1, -1, -1]
+                return werte, zeitpunkt
+
+    def schliessen(self):
+        """Schließt das Postfach und weckt einen wartenden Hardware-Thread."""
+        with self.__daten.get_lock():
+            self.__daten[self.__GESCHLOSSEN] = 1
+            self.__signal.set()
+
+
+class _MultiprozessWorker(EAModulServer):
+    """Ein Worker des EAModulMultiprozessServers. Er bearbeitet Requests wie
+    ein EAModulServer, schaltet die LEDs aber nicht selbst, sondern legt sie
+    im gemeinsamen Postfach des Moduls ab."""
+
+    def __init__(self, host, port, postfaecher, **kwargs):
+        self.geteilte_postfaecher = postfaecher
+        super().__init__(host, port,
+                         module={modul_id: None for modul_id in postfaecher},
+                         **kwargs)
+
+    def server_bind(self):
+        """Erlaubt weiteren Prozessen, sich an denselben Port zu binden."""
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def ausfuehren(self, modul_id, werte, empfangen):
+        self.geteilte_postfaecher[modul_id].ablegen(werte, empfangen)
+
+    def abonnieren(self, adresse):
+        """Abos werden nicht unterstützt, da die Worker keine Module
+        besitzen."""
+        self.metriken.zaehlen("fehlerhaft")
+
+
+def _multiprozess_worker(host, port, postfaecher, bereit, kwargs):
+    """Einstiegspunkt eines Worker-Prozesses."""
+    worker = _MultiprozessWorker(host, port, postfaecher, **kwargs)
+    bereit.release()
+    worker.serve_forever()
+
+
+class EAModulMultiprozessServer:
+    """Ein Server, der Requests in mehreren Prozessen bearbeitet, um alle
+    Prozessorkerne zu nutzen.
+
+    Jeder Worker-Prozess bindet mit SO_REUSEPORT einen eigenen Socket an
+    denselben Port. Das Betriebssystem verteilt die eintreffenden Pakete auf
+    die Worker. Die Worker prüfen und dekodieren die Requests und legen die
+    gewünschten LED-Zustände in einem GeteiltesPostfach ab. Nur der Prozess,
+    der den Server erstellt hat, besitzt die Module und schaltet die LEDs.
+
+      easerver = EAModulMultiprozessServer("localhost", 9999, prozesse=2)
+
+    Die Worker laufen bereits. Mit serve_forever werden die LEDs
+    geschaltet, bis shutdown aufgerufen wird.
+
+      easerver.serve_forever()
+      easerver.server_close()
+
+    Metriken und Statistik-Anfragen beziehen sich jeweils auf den Worker, der
+    eine Anfrage erhält. Die Worker werden mit der Startmethode "spawn"
+    gestartet, da ein per fork kopierter Prozess hängen bleiben kann, wenn
+    andere Threads gerade Sperren halten (z.B. beim Logging). Die weiteren
+    Argumente müssen deshalb mit pickle übertragbar sein. SO_REUSEPORT steht
+    nicht auf allen Betriebssystemen zur Verfügung (z.B. nicht unter
+    Windows).
+    """
+
+    def __init__(self, host, port, prozesse=None, eamodul=None, module=None,
+                 **kwargs):
+        """Startet prozesse Worker (Standard: Anzahl der Prozessorkerne) auf
+        dem angegebenen host und port. Die Parameter eamodul und module
+        entsprechen denen des EAModulServers, weitere Argumente (z.B. ein
+        Ratenbegrenzer) werden an die Worker weitergegeben.
+        """
+        import multiprocessing
+
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise OSError("SO_REUSEPORT wird nicht unterstützt.")
+
+        self.module = dict(module) if module else {0: eamodul}
+        self.metriken = ServerMetriken()
+        kontext = multiprocessing.get_context("spawn")
+        self.postfaecher = {modul_id: GeteiltesPostfach(kontext)
+                            for modul_id in self.module}
+        self.__threads = []
+
+        # Port reservieren, damit alle Worker denselben Port verwenden, auch
+        # wenn 0 (beliebiger freier Port) angegeben wurde.
+        reservierung = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        reservierung.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        try:
+            reservierung.bind((host, port))
+            self.server_address = reservierung.getsockname()
+
+            bereit = kontext.Semaphore(0)
+            self.prozesse = [
+                kontext.Process(
+                    target=_multiprozess_worker,
+                    args=(host, self.server_address[1], self.postfaecher,
+                          bereit, kwargs),
+                    daemon=True)
+                for _ in range(prozesse or os.cpu_count() or 1)]
+            for prozess in self.prozesse:
+                prozess.start()
+            for _ in self.prozesse:
+                while not bereit.acquire(timeout=0.1):
+                    if not all(p.is_alive() for p in self.prozesse):
+                        self.server_close()
+                        raise OSError("Worker-Prozess konnte nicht "
+                                      "gestartet werden.")
+        finally:
+            reservierung.close()
+
+    def modul(self, modul_id=0):
+        """Gibt das Modul mit der gegebenen ID zurück. Das Standardmodul wird
+        erzeugt, falls noch nicht geschehen."""
+        eamodul = self.module[modul_id]
+        if eamodul is None:
+            eamodul = self.module[modul_id] = EAModul()
+
+        return eamodul
+
+    def serve_forever(self):
+        """Schaltet die von den Workern abgelegten LED-Zustände, bis
+        shutdown() aufgerufen wird."""
+        self.__threads = [
+            threading.Thread(target=self.__hardware_schalten, args=(modul_id,))
+            for modul_id in self.postfaecher]
+        for thread in self.__threads:
+            thread.start()
+        for thread in self.__threads:
+            thread.join()
+
+    def shutdown(self):
+        """Beendet serve_forever."""
+        for postfach in self.postfaecher.values():
+            postfach.schliessen()
+
+    def server_close(self):
+        """Beendet alle Worker-Prozesse."""
+        for prozess in self.prozesse:
+            prozess.terminate()
+        for prozess in self.prozesse:
+            prozess.join()
+
+    def __hardware_schalten(self, modul_id):
+        postfach = self.postfaecher[modul_id]
+        eamodul = self.modul(modul_id)
+        ausgabe = _Ausgabe()
+        ausgabe.registrieren(eamodul)
+        while True:
+            werte, empfangen = postfach.abholen_mit_zeitpunkt()
+            if werte is None:
+                return
+
+            if empfangen is not None:
+                ausgabe.messen(self.metriken, eamodul, werte, empfangen)
+            else:
+                ausgabe.schalten(eamodul, werte)
 
 
 class EAModulClient:
@@ -171,50 +1632,738 @@ class EAModulClient:
 
     schaltet die rote und grüne LED ein und belässt die gelbe LED in ihrem
     bisherigen Zustand.
+
+    Sollen mehrere Boards gleichzeitig schalten, gleicht jeder Client zuerst
+    seine Uhr mit seinem Server ab. Anschließend kann ein gemeinsamer
+    Zeitpunkt (time.time() des Clients) angegeben werden, zu dem die
+    Server schalten.
+
+      client.uhr_abgleichen()
+      client.sende(1, 0, 1, zeitpunkt=time.time() + 0.1)
     """
 
-    def __init__(self, servername, serverport):
+    def __init__(self, servername, serverport, modul_id=None,
+                 verzoegerung=None):
         """Starte den Client für einen laufenden Server.
 
         Der angegebene servername ist eine IP-Adresse oder ein Domainname -
         für ein lokal laufenden Server kann auch localhost verwendet
         werden. Mit serverport wird die Portnummer angegeben, über die der
-        Server ansprechbar ist.
+        Server ansprechbar ist. Steuert der Server mehrere Module an, wird
+        über modul_id das gewünschte Modul ausgewählt.
+
+        Für Tests kann über verzoegerung eine Funktion ohne Argumente
+        übergeben werden. Jedes Paket wird dann um die von ihr
+        zurückgegebene Anzahl an Sekunden verzögert gesendet.
         """
         self.servername = servername
         self.serverport = serverport
+        self.modul_id = modul_id
+        self.verzoegerung = verzoegerung
+        # Abweichung der Uhr des Servers von der des Clients in Sekunden
+        self.uhrabweichung = 0.0
         self.client = socket.socket(socket.AF_INET,     # Address Family Internet
                                     socket.SOCK_DGRAM)  # UDP
 
-    def sende(self, rot, gelb, gruen):
+    def sende(self, rot, gelb, gruen, zeitpunkt=None):
         """Sende an den Server die Information, welche LEDs an- bzw. 
         ausgeschaltet werden sollen.
 
         Werte von 0 oder 1 für rot, gelb und grün schalten die LED aus bzw. an.
         Andere Werte werden ignoriert und belassen die LED in ihrem bisherigen
         Zustand.
+
+        Wird ein zeitpunkt (time.time() des Clients) angegeben, schaltet der
+        Server die LEDs erst zu diesem Zeitpunkt.
+        """
+
+        byte = kodiere(rot, gelb, gruen)
+        if zeitpunkt is not None:
+            daten = bytes([byte | MIT_MODUL_ID, self.modul_id or 0])
+            daten += struct.pack("!d", zeitpunkt + self.uhrabweichung)
+        elif self.modul_id is not None:
+            daten = bytes([byte | MIT_MODUL_ID, self.modul_id])
+        else:
+            daten = bytes([byte])
+
+        self.__senden(daten)
+
+    def __senden(self, daten):
+        adresse = (self.servername, self.serverport)
+        if self.verzoegerung is None:
+            self.client.sendto(daten, adresse)
+        else:
+            threading.Timer(self.verzoegerung(), self.client.sendto,
+                            (daten, adresse)).start()
+
+    def uhr_abgleichen(self, anzahl=8, timeout=1.0):
+        """Bestimmt die Abweichung der Uhr des Servers von der eigenen Uhr.
+
+        Wie bei NTP werden anzahl Zeitanfragen gesendet. Aus der Anfrage mit
+        der kürzesten Umlaufzeit wird die Abweichung berechnet, gespeichert
+        und zurückgegeben.
+        """
+        beste_umlaufzeit, abweichung = None, 0.0
+        self.client.settimeout(timeout)
+        try:
+            for _ in range(anzahl):
+                gesendet = time.time()
+                self.__senden(ZEIT_ANFRAGE + struct.pack("!d", gesendet))
+                try:
+                    antwort, _ = self.client.recvfrom(64)
+                except socket.timeout:
+                    continue
+                zurueck = time.time()
+
+                if (len(antwort) != len(ZEIT_ANFRAGE) + 24 or
+                        not antwort.startswith(ZEIT_ANFRAGE)):
+                    continue
+                t1, t2, t3 = struct.unpack("!ddd",
+                                           antwort[len(ZEIT_ANFRAGE):])
+                if t1 != gesendet:
+                    # Antwort auf eine ältere, verspätete Anfrage
+                    continue
+
+                umlaufzeit = (zurueck - t1) - (t3 - t2)
+                if beste_umlaufzeit is None or umlaufzeit < beste_umlaufzeit:
+                    beste_umlaufzeit = umlaufzeit
+                    abweichung = ((t2 - t1) + (t3 - zurueck)) / 2
+        finally:
+            self.client.settimeout(None)
+
+        self.uhrabweichung = abweichung
+        return abweichung
+
+    def statistik(self, timeout=1.0):
+        """Fragt die Metriken des Servers ab und gibt sie als dict zurück.
+
+        Antwortet der Server nicht innerhalb von timeout Sekunden, wird ein
+        socket.timeout ausgelöst.
+        """
+        self.__senden(STATISTIK_ANFRAGE)
+        self.client.settimeout(timeout)
+        try:
+            antwort, _ = self.client.recvfrom(65535)
+        finally:
+            self.client.settimeout(None)
+
+        return json.loads(antwort.decode())
+
+
+# Flag im zweiten Byte eines Stream-Rahmens, mit dem der Client eine
+# Bestätigung (ACK) anfordert.
+STREAM_ACK = 0x01
+# Ab dieser Menge unbestätigter Antwortdaten liest der Server von einer
+# Verbindung nicht weiter, bis der Client die Antworten abgeholt hat.
+STREAM_SENDEPUFFER_MAX = 64 * 1024
+
+
+def rahmen(nutzdaten):
+    """Stellt den Nutzdaten ihre Länge als zwei Bytes (big endian) voran.
+
+    >>> rahmen(bytes([0xe, STREAM_ACK]))
+    b'\\x00\\x02\\x0e\\x01'
+    """
+    return len(nutzdaten).to_bytes(2, "big") + nutzdaten
+
+
+class _StreamVerbindung:
+    """Zustand einer Verbindung zum EAModulStreamServer."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.eingang = bytearray()
+        self.ausgang = bytearray()
+        self.liest = True
+
+
+class EAModulStreamServer:
+    """Ein Server für ein EA-Modul, der Befehle über dauerhafte
+    TCP-Verbindungen oder einen Unix Domain Socket entgegennimmt.
+
+    Anders als beim EAModulServer kommen die Befehle vollständig und in der
+    gesendeten Reihenfolge an. Jeder Befehl wird in einem Rahmen übertragen,
+    dem seine Länge als zwei Bytes vorangestellt ist. Das erste Byte der
+    Nutzdaten entspricht dem Byte eines UDP-Requests (s.o.). Enthält das
+    zweite Byte das Flag STREAM_ACK, antwortet der Server nach dem Schalten
+    mit einem Rahmen, der den Befehl bestätigt. Ein Client kann beliebig
+    viele Befehle senden, ohne auf die Bestätigungen zu warten.
+
+    >>> from eapi.net import EAModulStreamServer
+    >>> easerver = EAModulStreamServer("localhost", 9999)
+
+    Alle Verbindungen werden in einem Thread über einen Selektor bedient.
+
+      easerver.serve_forever()
+
+    Lokale Programme können statt TCP auch einen Unix Domain Socket verwenden.
+
+      easerver = EAModulStreamServer(pfad="/tmp/eamodul.sock")
+
+    >>> easerver.server_close()
+    """
+
+    def __init__(self, host="localhost", port=9999, eamodul=None, pfad=None):
+        """Starte einen Server auf dem angegebenen hostname und port. Wird ein
+        pfad angegeben, lauscht der Server stattdessen auf einem Unix Domain
+        Socket unter diesem Pfad.
+
+        Über den Parameter eamodul kann ein EAModul übergeben werden. Wird
+        kein Modul übergeben, wird ein Standardmodul selbst erstellt.
         """
+        if pfad is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            adresse = pfad
+        else:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            adresse = (host, port)
+
+        try:
+            self.socket.bind(adresse)
+            self.socket.listen()
+        except OSError:
+            self.socket.close()
+            raise
+
+        self.socket.setblocking(False)
+        self.server_address = self.socket.getsockname()
+        self.pfad = pfad
+        self.eamodul = eamodul if eamodul else EAModul()
+        self.metriken = ServerMetriken()
+        self.__ausgabe = _Ausgabe()
+        self.__ausgabe.registrieren(self.eamodul)
+
+        self.__selektor = selectors.DefaultSelector()
+        self.__selektor.register(self.socket, selectors.EVENT_READ)
+        self.__verbindungen = {}
+
+        # Über das Socketpaar wird eine wartende serve_forever-Schleife
+        # geweckt.
+        self.__wecker_lesen, self.__wecker_schreiben = socket.socketpair()
+        self.__wecker_lesen.setblocking(False)
+        self.__selektor.register(self.__wecker_lesen, selectors.EVENT_READ)
+        self.__beenden = False
+        self.__beendet = threading.Event()
+
+    def serve_forever(self):
+        """Bedient alle Verbindungen, bis shutdown() aufgerufen wird."""
+        self.__beendet.clear()
+        try:
+            while not self.__beenden:
+                for schluessel, ereignisse in self.__selektor.select():
+                    sock = schluessel.fileobj
+                    if sock is self.socket:
+                        self.__annehmen()
+                    elif sock is self.__wecker_lesen:
+                        self.__wecker_lesen.recv(64)
+                    else:
+                        verbindung = self.__verbindungen[sock]
+                        if ereignisse & selectors.EVENT_WRITE:
+                            self.__schreiben(verbindung)
+                        if (ereignisse & selectors.EVENT_READ and
+                                sock in self.__verbindungen):
+                            self.__lesen(verbindung)
+        finally:
+            self.__beenden = False
+            self.__beendet.set()
+
+    def shutdown(self):
+        """Beendet serve_forever und wartet, bis die Schleife verlassen
+        wurde."""
+        self.__beenden = True
+        self.__wecker_schreiben.send(b"x")
+        self.__beendet.wait()
+
+    def server_close(self):
+        """Schließt alle Verbindungen und den Socket des Servers."""
+        for verbindung in list(self.__verbindungen.values()):
+            self.__schliessen(verbindung)
+        self.__selektor.close()
+        self.socket.close()
+        self.__wecker_lesen.close()
+        self.__wecker_schreiben.close()
+        if self.pfad is not None and os.path.exists(self.pfad):
+            os.unlink(self.pfad)
+
+    def __annehmen(self):
+        try:
+            sock, _ = self.socket.accept()
+        except BlockingIOError:
+            return
 
-        # ? ?  ? ?  ? ?
-        # r o  g e  g r
-        # 3 1  8 4  2 1
-        # 2 6
-        #
-        byte = 0
-        if gruen == 0 or gruen == 1:
-            byte += 2
-            if gruen:
-                byte += 1
-        if gelb == 0 or gelb == 1:
-            byte += 8
-            if gelb:
-                byte += 4
-        if rot == 0 or rot == 1:
-            byte += 32
-            if rot:
-                byte += 16
-
-        self.client.sendto(bytes([byte]), (self.servername, self.serverport))
+        sock.setblocking(False)
+        if sock.family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__verbindungen[sock] = _StreamVerbindung(sock)
+        self.__selektor.register(sock, selectors.EVENT_READ)
+
+    def __lesen(self, verbindung):
+        try:
+            daten = verbindung.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            daten = b""
+
+        if not daten:
+            self.__schliessen(verbindung)
+            return
+
+        empfangen = time.perf_counter()
+        eingang = verbindung.eingang
+        eingang += daten
+
+        # Alle vollständigen Rahmen der Reihe nach bearbeiten
+        position = 0
+        while len(eingang) - position >= 2:
+            laenge = int.from_bytes(eingang[position:position + 2], "big")
+            ende = position + 2 + laenge
+            if len(eingang) < ende:
+                break
+
+            nutzdaten = bytes(eingang[position + 2:ende])
+            position = ende
+            self.__bearbeiten(verbindung, nutzdaten, empfangen)
+        del eingang[:position]
+
+        if verbindung.ausgang:
+            self.__schreiben(verbindung)
+
+    def __bearbeiten(self, verbindung, nutzdaten, empfangen):
+        metriken = self.metriken
+        metriken.paket_empfangen(nutzdaten, empfangen)
+        if len(nutzdaten) < 1:
+            metriken.zaehlen("leer")
+            return
+
+        self.__ausgabe.messen(metriken, self.eamodul, dekodiere(nutzdaten[0]),
+                              empfangen)
+
+        if len(nutzdaten) > 1 and nutzdaten[1] & STREAM_ACK:
+            verbindung.ausgang += rahmen(nutzdaten[:1])
+
+    def __schreiben(self, verbindung):
+        try:
+            gesendet = verbindung.sock.send(verbindung.ausgang)
+        except (BlockingIOError, InterruptedError):
+            gesendet = 0
+        except OSError:
+            self.__schliessen(verbindung)
+            return
+        del verbindung.ausgang[:gesendet]
+
+        # Gegendruck: Ein Client, der seine Bestätigungen nicht abholt, wird
+        # so lange nicht weiter gelesen, bis der Sendepuffer geleert ist.
+        verbindung.liest = len(verbindung.ausgang) < STREAM_SENDEPUFFER_MAX
+        ereignisse = selectors.EVENT_READ if verbindung.liest else 0
+        if verbindung.ausgang:
+            ereignisse |= selectors.EVENT_WRITE
+        self.__selektor.modify(verbindung.sock, ereignisse)
+
+    def __schliessen(self, verbindung):
+        self.__selektor.unregister(verbindung.sock)
+        del self.__verbindungen[verbindung.sock]
+        verbindung.sock.close()
+
+
+class EAModulStreamClient:
+    """Client, um über eine dauerhafte Verbindung auf den
+    EAModulStreamServer zuzugreifen.
+
+      client = EAModulStreamClient("localhost", 9999)
+
+    Befehle werden wie beim EAModulClient gesendet. Mehrere Befehle können
+    direkt hintereinander gesendet werden. Wird eine Bestätigung angefordert,
+    kann später auf alle ausstehenden Bestätigungen gewartet werden.
+
+      client.sende(1, 0, 1, ack=True)
+      client.sende(0, 1, 0, ack=True)
+      client.acks_abwarten()
+
+    Für einen lokalen Server kann auch ein Unix Domain Socket verwendet
+    werden.
+
+      client = EAModulStreamClient(pfad="/tmp/eamodul.sock")
+    """
+
+    def __init__(self, servername="localhost", serverport=9999, pfad=None):
+        """Verbindet den Client mit einem laufenden Server."""
+        if pfad is not None:
+            self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.client.connect(pfad)
+        else:
+            self.client = socket.create_connection((servername, serverport))
+            self.client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self.ausstehende_acks = 0
+        self.__eingang = bytearray()
+
+    def sende(self, rot, gelb, gruen, ack=False):
+        """Sende an den Server die Information, welche LEDs an- bzw.
+        ausgeschaltet werden sollen. Mit ack=True bestätigt der Server den
+        Befehl, sobald die LEDs geschaltet sind."""
+        byte = kodiere(rot, gelb, gruen)
+        if ack:
+            self.ausstehende_acks += 1
+            self.client.sendall(rahmen(bytes([byte, STREAM_ACK])))
+        else:
+            self.client.sendall(rahmen(bytes([byte])))
+
+    def acks_abwarten(self):
+        """Wartet, bis alle angeforderten Bestätigungen eingetroffen sind."""
+        while self.ausstehende_acks > 0:
+            daten = self.client.recv(65536)
+            if not daten:
+                raise ConnectionError("Verbindung vom Server geschlossen.")
+            self.__eingang += daten
+
+            while len(self.__eingang) >= 2:
+                laenge = int.from_bytes(self.__eingang[:2], "big")
+                if len(self.__eingang) < 2 + laenge:
+                    break
+                del self.__eingang[:2 + laenge]
+                self.ausstehende_acks -= 1
+
+    def schliessen(self):
+        """Schließt die Verbindung zum Server."""
+        self.client.close()
+
+
+BENCH_MUSTER = ("blinken", "lauflicht", "zufall")
+
+
+def _warten_bis(zeitpunkt):
+    """Wartet bis zum zeitpunkt (time.perf_counter()). Bis kurz vorher wird
+    geschlafen, die letzte Millisekunde wird aktiv gewartet."""
+    warten = zeitpunkt - time.perf_counter() - 0.001
+    if warten > 0:
+        time.sleep(warten)
+    while time.perf_counter() < zeitpunkt:
+        pass
+
+
+def text_frames(zeilen):
+    """Liest Frames im Textformat und liefert sie als Tupel aus Zeitpunkt
+    (Sekunden seit Beginn oder None) und dem Byte für den Request.
+
+    Jede Zeile enthält drei Zeichen für rot, gelb und grün wie beim
+    startclient (0 oder 1, andere Zeichen belassen die LED). Optional kann ein
+    Zeitpunkt vorangestellt werden. Leere Zeilen und Kommentare (#) werden
+    übersprungen.
+
+    >>> list(text_frames(["# Ampel", "100", "0.5 010", "1.0 x01"]))
+    [(None, 58), (0.5, 46), (1.0, 11)]
+    """
+    for nr, zeile in enumerate(zeilen, 1):
+        zeile = zeile.split("#")[0].strip()
+        if not zeile:
+            continue
+
+        teile = zeile.split()
+        try:
+            zeitpunkt = float(teile[0]) if len(teile) == 2 else None
+            leds = teile[-1]
+            if len(teile) > 2 or len(leds) != 3:
+                raise ValueError()
+        except ValueError:
+            raise ValueError("Zeile {n} fehlerhaft: {z}".format(n=nr, z=zeile))
+
+        yield zeitpunkt, kodiere(*[int(z) if z in "01" else None
+                                   for z in leds])
+
+
+def binaer_frames(datei, zeitstempel=False):
+    """Liest Frames im Binärformat aus einer Datei, die im Binärmodus
+    geöffnet wurde. Jedes Frame ist das Byte eines Requests; mit
+    zeitstempel=True geht ihm der Zeitpunkt als double (8 Byte) voraus.
+
+    >>> import io
+    >>> list(binaer_frames(io.BytesIO(bytes([0xe, 0x30]))))
+    [(None, 14), (None, 48)]
+    """
+    groesse = 9 if zeitstempel else 1
+    while True:
+        frame = datei.read(groesse)
+        if len(frame) < groesse:
+            return
+        if zeitstempel:
+            yield struct.unpack("!d", frame[:8])[0], frame[8]
+        else:
+            yield None, frame[0]
+
+
+def frames_senden(frames, host, port, modul_id=None, rate=0):
+    """Sendet Frames (Tupel aus Zeitpunkt und Byte) über einen verbundenen
+    Socket an einen EAModulServer.
+
+    Frames mit Zeitpunkt werden so viele Sekunden nach dem Start gesendet.
+    Frames ohne Zeitpunkt werden mit rate Frames pro Sekunde gesendet, bei
+    rate=0 so schnell wie möglich. Zurückgegeben wird die Anzahl der
+    gesendeten Frames.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect((host, port))
+    if modul_id is None:
+        kennung, anhang = 0, b""
+    else:
+        kennung, anhang = MIT_MODUL_ID, bytes([modul_id])
+
+    anzahl = 0
+    start = naechster = time.perf_counter()
+    for zeitpunkt, byte in frames:
+        if zeitpunkt is not None:
+            _warten_bis(start + zeitpunkt)
+        elif rate > 0:
+            _warten_bis(naechster)
+            naechster = max(naechster, time.perf_counter() - 1) + 1 / rate
+        try:
+            sock.send(bytes([byte | kennung]) + anhang)
+            anzahl += 1
+        except ConnectionRefusedError:
+            pass
+
+    sock.close()
+    return anzahl
+
+
+def _play_main(argumente):
+    """Wertet die Argumente des Befehls play aus und sendet die Frames."""
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m eapi.net play",
+        description="Sendet Frames aus einer Datei oder von stdin an einen "
+                    "Server.")
+    parser.add_argument("datei", nargs="?", default="-",
+                        help="Datei mit Frames (Standard: - für stdin)")
+    parser.add_argument("host", nargs="?", default="localhost")
+    parser.add_argument("port", nargs="?", type=int, default=9999)
+    parser.add_argument("--binaer", action="store_true",
+                        help="Frames im Binärformat lesen")
+    parser.add_argument("--zeitstempel", action="store_true",
+                        help="Binäre Frames enthalten Zeitstempel")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Frames pro Sekunde ohne Zeitpunkt (0: "
+                             "unbegrenzt)")
+    parser.add_argument("--modul-id", type=int, default=None)
+    args = parser.parse_args(argumente)
+
+    if args.binaer:
+        datei = (sys.stdin.buffer if args.datei == "-"
+                 else open(args.datei, "rb"))
+        frames = binaer_frames(datei, args.zeitstempel)
+    else:
+        datei = sys.stdin if args.datei == "-" else open(args.datei)
+        frames = text_frames(datei)
+
+    try:
+        frames_senden(frames, args.host, args.port, args.modul_id, args.rate)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if datei not in (sys.stdin, sys.stdin.buffer):
+            datei.close()
+
+
+def _bench_pakete(muster, anzahl, seed):
+    """Erzeugt die Pakete, die ein Sender im Benchmark verschickt."""
+    import random
+
+    if muster == "blinken":
+        return [bytes([kodiere(i % 2, i % 2, i % 2)]) for i in range(anzahl)]
+    if muster == "lauflicht":
+        return [bytes([kodiere(*[int(i % 3 == led) for led in range(3)])])
+                for i in range(anzahl)]
+    if muster == "zufall":
+        zufall = random.Random(seed)
+        return [bytes([zufall.randrange(64)]) for _ in range(anzahl)]
+
+    raise ValueError("Unbekanntes Muster: " + str(muster))
+
+
+def _bench_senden(adresse, muster, anzahl, rate, seed, barriere=None,
+                  ergebnisse=None):
+    """Sendet im Benchmark anzahl Pakete an die adresse. Ist rate größer als
+    0, werden höchstens rate Pakete pro Sekunde gesendet. Zurückgegeben und
+    ggf. in die Queue ergebnisse gelegt wird die Anzahl der erfolgreich
+    gesendeten Pakete.
+
+    Mit einer barriere warten alle Sender nach ihrer Vorbereitung
+    aufeinander, so dass das Starten der Prozesse nicht mitgemessen wird.
+    """
+    pakete = _bench_pakete(muster, anzahl, seed)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.connect(adresse)
+    if barriere is not None:
+        barriere.wait()
+
+    gesendet = 0
+    start = time.perf_counter()
+    for i, paket in enumerate(pakete):
+        if rate > 0:
+            warten = start + i / rate - time.perf_counter()
+            if warten > 0:
+                time.sleep(warten)
+        try:
+            sock.send(paket)
+            gesendet += 1
+        except OSError:
+            pass
+
+    sock.close()
+    if ergebnisse is not None:
+        ergebnisse.put(gesendet)
+    return gesendet
+
+
+def bench(sender=1, pakete=10000, muster="blinken", rate=0,
+          entkoppelt=False, empfangspuffer=None):
+    """Misst, wie viele Pakete ein EAModulServer auf dem Loopback-Interface
+    verarbeiten kann.
+
+    Der Server verwendet die GPIO-Simulation. Es werden sender Prozesse
+    gestartet, die jeweils pakete Pakete nach dem angegebenen muster
+    (blinken, lauflicht oder zufall) senden. Gemessen wird vom Moment, in
+    dem alle Sender bereit sind, bis zum letzten Paket, das der Server
+    empfangen hat. Das Ergebnis wird als dict zurückgegeben.
+
+      $ python3 -m eapi.net bench --sender 4 --pakete 50000
+    """
+    import multiprocessing
+    import eapi.hw
+    import eapi.GPIODummy
+
+    if muster not in BENCH_MUSTER:
+        raise ValueError("Unbekanntes Muster: " + str(muster))
+
+    # Gemessen werden sollen Server und Simulation, nicht die Ausgabe ihrer
+    # Logs.
+    logs = [logging.getLogger(eapi.GPIODummy.__name__), log]
+    log_level = [l.level for l in logs]
+    for l in logs:
+        l.setLevel(logging.WARNING)
+    gpio = eapi.hw.GPIO
+    eapi.hw.GPIO = eapi.GPIODummy
+
+    try:
+        easerver = EAModulServer("127.0.0.1", 0, eamodul=EAModul(),
+                                 entkoppelt=entkoppelt,
+                                 empfangspuffer=empfangspuffer)
+        thread = threading.Thread(target=easerver.serve_forever,
+                                  kwargs={"poll_interval": 0.05})
+        thread.start()
+
+        # Die Sender werden neu gestartet statt geforkt, da in diesem Prozess
+        # bereits die Threads des Servers laufen. Gemessen wird erst, wenn
+        # alle Sender ihre Pakete vorbereitet haben.
+        kontext = multiprocessing.get_context("spawn")
+        barriere = kontext.Barrier(sender + 1)
+        ergebnisse = kontext.Queue()
+        prozesse = [kontext.Process(
+            target=_bench_senden,
+            args=(easerver.server_address, muster, pakete, rate, nr,
+                  barriere, ergebnisse))
+            for nr in range(sender)]
+        for prozess in prozesse:
+            prozess.start()
+        try:
+            barriere.wait(60)
+            start = time.perf_counter()
+            gesendet = sum(ergebnisse.get() for _ in prozesse)
+        finally:
+            barriere.abort()
+            for prozess in prozesse:
+                prozess.join()
+
+        # Warten, bis der Server keine Pakete mehr empfängt. Das Ende der
+        # Messung ist der Empfang des letzten Pakets.
+        empfangen = -1
+        while easerver.metriken.empfangen not in (empfangen, gesendet):
+            empfangen = easerver.metriken.empfangen
+            time.sleep(0.2)
+        empfangen = easerver.metriken.empfangen
+        ende = easerver.metriken.zuletzt_empfangen or start
+
+        easerver.shutdown()
+        thread.join()
+        easerver.server_close()
+    finally:
+        eapi.hw.GPIO = gpio
+        for l, level in zip(logs, log_level):
+            l.setLevel(level)
+
+    metriken = easerver.metriken
+    dauer = ende - start
+    return {
+        "muster": muster,
+        "sender": sender,
+        "entkoppelt": entkoppelt,
+        "gesendet": gesendet,
+        "empfangen": empfangen,
+        "zusammengefasst": easerver.statistik["zusammengefasst"],
+        "verlustrate": 1 - empfangen / gesendet if gesendet else 0.0,
+        "dauer": dauer,
+        "pakete_pro_sekunde": empfangen / dauer if dauer > 0 else 0.0,
+        "latenz": {
+            "p50": metriken.latenz_perzentil(0.5),
+            "p90": metriken.latenz_perzentil(0.9),
+            "p99": metriken.latenz_perzentil(0.99),
+            "max": metriken.latenz_max,
+        },
+    }
+
+
+def _bench_main(argumente):
+    """Wertet die Argumente des Befehls bench aus und gibt das Ergebnis als
+    JSON aus."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m eapi.net bench",
+        description="Lastmessung eines EAModulServers auf dem Loopback.")
+    parser.add_argument("--sender", type=int, default=1,
+                        help="Anzahl der Senderprozesse")
+    parser.add_argument("--pakete", type=int, default=10000,
+                        help="Pakete pro Sender")
+    parser.add_argument("--muster", choices=BENCH_MUSTER, default="blinken")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="Pakete pro Sekunde und Sender (0: unbegrenzt)")
+    parser.add_argument("--entkoppelt", action="store_true",
+                        help="Server im entkoppelten Modus starten")
+    parser.add_argument("--empfangspuffer", type=int, default=None,
+                        help="Größe von SO_RCVBUF in Byte")
+    args = parser.parse_args(argumente)
+
+    ergebnis = bench(args.sender, args.pakete, args.muster, args.rate,
+                     args.entkoppelt, args.empfangspuffer)
+    print(json.dumps(ergebnis, indent=2))
+
+
+def _replay_main(argumente):
+    """Wertet die Argumente des Befehls replay aus und spielt einen
+    Mitschnitt ab."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m eapi.net replay",
+        description="Sendet einen Mitschnitt erneut an einen Server.")
+    parser.add_argument("datei", help="Mitschnittdatei")
+    parser.add_argument("host", nargs="?", default="localhost")
+    parser.add_argument("port", nargs="?", type=int, default=9999)
+    parser.add_argument("--tempo", type=float, default=1.0,
+                        help="Faktor für die Geschwindigkeit (Standard: 1.0)")
+    parser.add_argument("--schnell", action="store_true",
+                        help="So schnell wie möglich senden")
+    args = parser.parse_args(argumente)
+
+    start = time.perf_counter()
+    anzahl = abspielen(args.datei, args.host, args.port,
+                       None if args.schnell else args.tempo)
+    print(json.dumps({"gesendet": anzahl,
+                      "dauer": time.perf_counter() - start}))
 
 
 def main():
@@ -223,7 +2372,16 @@ def main():
     """
     import sys
 
-    if len(sys.argv) >= 2:
+    if len(sys.argv) >= 2 and sys.argv[1] == "bench":
+        _bench_main(sys.argv[2:])
+
+    elif len(sys.argv) >= 2 and sys.argv[1] == "replay":
+        _replay_main(sys.argv[2:])
+
+    elif len(sys.argv) >= 2 and sys.argv[1] == "play":
+        _play_main(sys.argv[2:])
+
+    elif len(sys.argv) >= 2:
         hostname = input("Hostname (Enter für localhost):")
         if hostname == '':
             hostname = 'localhost'
@@ -262,12 +2420,13 @@ def main():
                     gruen = int(eingabe[2])
                     client.sende(rot, gelb, gruen)
 
-                except IndexError:
+                except (IndexError, ValueError):
                     print("Eingabe fehlerhaft. Erwarte genau drei Zahlen (0 oder 1).")
                     print("Bitte wiederholen!")
                     
     else:
-        print("Befehl angeben: startserver oder startclient")
+        print("Befehl angeben: startserver, startclient, play, bench oder "
+              "replay")
 
 
 # Main
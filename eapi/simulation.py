@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""Ein Modul, um Software für viele vernetzte EA-Module ohne Hardware zu
+testen.
+
+Die Klasse VirtuelleFlotte startet in einem Prozess beliebig viele virtuelle
+Boards. Jedes Board lauscht auf einem eigenen UDP-Port und zerlegt Requests
+zum Schalten der LEDs wie der EAModulServer (s. eapi.net.zerlege). Ein Board
+ist das Modul 0; Steueranfragen und Requests mit Zeitpunkt versteht es nicht.
+Statt GPIO-Pins zu schalten, merkt es sich den Zustand seiner LEDs. Alle
+Boards werden von einem einzigen Thread über einen Selektor bedient, so dass
+ein Board nur einen Socket und wenige Bytes Speicher benötigt.
+
+>>> from eapi.simulation import VirtuelleFlotte
+>>> flotte = VirtuelleFlotte(100, host="127.0.0.1")
+>>> len(flotte.adressen)
+100
+
+Die Flotte kann nun von einem Controller angesprochen werden. Dazu wird sie
+in einem eigenen Thread gestartet.
+
+  threading.Thread(target=flotte.serve_forever).start()
+
+Für Tests kann sie auch schrittweise bedient werden.
+
+>>> from eapi.net import EAModulClient
+>>> for adresse in flotte.adressen:
+...     EAModulClient(*adresse).sende(1, 0, 9)
+>>> while flotte.empfangen < 100:
+...     _ = flotte.bearbeiten(timeout=1)
+>>> flotte.anzahl_mit(rot=1, gelb=0)
+100
+>>> flotte.server_close()
+
+Für mehrere tausend Boards muss das Limit für offene Dateien ausreichend
+groß sein (ulimit -n).
+"""
+
+import selectors
+import socket
+import threading
+from eapi.net import zerlege
+
+
+class VirtuellesBoard:
+    """Ein virtuelles Board mit einem eigenen UDP-Socket und dem simulierten
+    Zustand seiner drei LEDs."""
+
+    __slots__ = ("sock", "leds", "empfangen", "verworfen")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.leds = [0, 0, 0]
+        self.empfangen = 0
+        self.verworfen = 0
+
+    def bearbeiten(self, daten):
+        """Schaltet die LEDs gemäß eines empfangenen Requests. Leere und
+        fehlerhafte Requests, Steueranfragen, Requests an ein anderes Modul
+        als 0 und Requests mit Zeitpunkt werden in verworfen gezählt.
+
+        >>> board = VirtuellesBoard(None)
+        >>> board.bearbeiten(b"\\x30\\n")
+        >>> board.bearbeiten(b"\\x00stats")
+        >>> board.bearbeiten(bytes([0xb0, 0]) + bytes(8))
+        >>> board.leds, board.verworfen
+        ([1, 0, 0], 2)
+        """
+        self.empfangen += 1
+        if len(daten) < 1 or (daten[0] == 0 and len(daten) > 1):
+            self.verworfen += 1
+            return
+
+        try:
+            modul_id, werte, zeitpunkt = zerlege(daten)
+        except ValueError:
+            modul_id = None
+        if modul_id != 0 or zeitpunkt is not None:
+            self.verworfen += 1
+            return
+
+        for farbe, wert in enumerate(werte):
+            if wert is not None:
+                self.leds[farbe] = wert
+
+
+class VirtuelleFlotte:
+    """Eine Flotte virtueller Boards, die gemeinsam über einen Selektor
+    bedient werden.
+
+    Die Schnittstelle zum Starten und Beenden entspricht der der Server aus
+    eapi.net: serve_forever(), shutdown() und server_close().
+    """
+
+    def __init__(self, anzahl, host="127.0.0.1", startport=0):
+        """Erstellt anzahl virtuelle Boards auf dem angegebenen host. Ist
+        startport 0, erhält jedes Board einen freien Port vom
+        Betriebssystem, sonst werden die Ports ab startport fortlaufend
+        vergeben."""
+        self.boards = []
+        self.__selektor = selectors.DefaultSelector()
+        self.__wecker_lesen, self.__wecker_schreiben = socket.socketpair()
+        self.__selektor.register(self.__wecker_lesen, selectors.EVENT_READ)
+        self.__beenden = False
+        self.__beendet = threading.Event()
+
+        try:
+            for i in range(anzahl):
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.boards.append(VirtuellesBoard(sock))
+                sock.bind((host, startport + i if startport else 0))
+                sock.setblocking(False)
+                self.__selektor.register(sock, selectors.EVENT_READ,
+                                         self.boards[-1])
+        except OSError:
+            self.server_close()
+            raise
+
+        self.adressen = [board.sock.getsockname() for board in self.boards]
+
+    @property
+    def empfangen(self):
+        """Die Anzahl der insgesamt empfangenen Requests."""
+        return sum(board.empfangen for board in self.boards)
+
+    @property
+    def verworfen(self):
+        """Die Anzahl der Requests, die kein Board verstanden hat."""
+        return sum(board.verworfen for board in self.boards)
+
+    def bearbeiten(self, timeout=None):
+        """Wartet höchstens timeout Sekunden auf Requests und bearbeitet alle,
+        die bereits eingetroffen sind. Zurückgegeben wird die Anzahl der
+        bearbeiteten Requests."""
+        anzahl = 0
+        for schluessel, _ in self.__selektor.select(timeout):
+            board = schluessel.data
+            if board is None:
+                self.__wecker_lesen.recv(64)
+                continue
+
+            # Alle wartenden Requests eines Boards auf einmal abholen
+            while True:
+                try:
+                    daten = board.sock.recv(64)
+                except (BlockingIOError, InterruptedError):
+                    break
+                board.bearbeiten(daten)
+                anzahl += 1
+
+        return anzahl
+
+    def serve_forever(self):
+        """Bedient alle Boards, bis shutdown() aufgerufen wird."""
+        self.__beendet.clear()
+        try:
+            while not self.__beenden:
+                self.bearbeiten()
+        finally:
+            self.__beenden = False
+            self.__beendet.set()
+
+    def shutdown(self):
+        """Beendet serve_forever und wartet, bis die Schleife verlassen
+        wurde."""
+        self.__beenden = True
+        self.__wecker_schreiben.send(b"x")
+        self.__beendet.wait()
+
+    def server_close(self):
+        """Schließt die Sockets aller Boards."""
+        for board in self.boards:
+            board.sock.close()
+        self.__selektor.close()
+        self.__wecker_lesen.close()
+        self.__wecker_schreiben.close()
+
+    def zustaende(self):
+        """Gibt die LED-Zustände aller Boards als Liste von Tupeln (rot, gelb,
+        grün) zurück."""
+        return [tuple(board.leds) for board in self.boards]
+
+    def anzahl_mit(self, rot=None, gelb=None, gruen=None):
+        """Zählt die Boards, deren LEDs die angegebenen Werte haben. Nicht
+        angegebene LEDs werden nicht geprüft."""
+        erwartet = [(farbe, wert) for farbe, wert
+                    in enumerate([rot, gelb, gruen]) if wert is not None]
+        return sum(1 for board in self.boards
+                   if all(board.leds[farbe] == wert
+                          for farbe, wert in erwartet))
+
+    def alle(self, rot=None, gelb=None, gruen=None):
+        """Prüft, ob alle Boards die angegebenen LED-Werte haben."""
+        return self.anzahl_mit(rot, gelb, gruen) == len(self.boards)
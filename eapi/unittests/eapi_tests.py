@@ -4,9 +4,88 @@
 dessen Unterpaketen.
 """
 
+import contextlib
+import http.client
+import io
+import json
+import os
+import queue
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
 from eapi.hw import EAModul, DimmbaresEAModul
-from eapi.gui import EAModulKonsole
+from eapi.gui import EAModulKonsole, EAModulGui, Verlauf
+from eapi.net import EAModulServer, EAModulClient, LEDPostfach, dekodiere
+from eapi.net import MIT_MODUL_ID, ServerMetriken
+from eapi.net import EAModulStreamServer, EAModulStreamClient, bench
+from eapi.net import Ratenbegrenzer, EAModulMultiprozessServer
+from eapi.net import Mitschnitt, mitschnitt_dateien, mitschnitt_lesen
+from eapi.net import abspielen
+from eapi.net import text_frames, frames_senden, rahmen, ZUSTAND_MELDUNG
+from eapi.simulation import VirtuelleFlotte
+from eapi.mqtt import EAModulMQTTBruecke, MQTTTestBroker, MQTTVerbindung
+from eapi.web import EAModulWebServer
+from eapi.monitor import FlottenMonitor
+from eapi.daemon import EAModulDaemon
+from eapi import benchmark
+from eapi.latenz import ReaktionsMessung
+from eapi.zustand import ZustandSchreiber, ZustandLeser
+from eapi.vermittler import EAModulVermittler, EntferntesEAModul
+from eapi.vermittler import LED, BEFEHL_LED, BEFEHL_TASTER, BEFEHL_BELEGEN
+from eapi.vermittler import ANTWORT_FEHLER, BEFEHL_ABO, BEFEHL_SYNC
+from eapi.vermittler import EREIGNIS_LED, LED_EREIGNIS
+import eapi.GPIODummy
+import eapi.hw
+
+
+def importzeit(modul):
+    """Importiert das Modul in einem neuen Interpreter mit -X importtime und
+    gibt die Importzeit in Sekunden sowie die Menge aller dabei importierten
+    Module zurück."""
+    ergebnis = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + modul],
+        stderr=subprocess.PIPE, check=True, universal_newlines=True)
+
+    module = {}
+    for zeile in ergebnis.stderr.splitlines():
+        if not zeile.startswith("import time:") or "|" not in zeile:
+            continue
+        _, kumuliert, name = zeile.split("|")
+        if kumuliert.strip().isdigit():
+            module[name.strip()] = int(kumuliert) / 1e6
+
+    return module[modul], set(module)
+
+
+class ImportzeitTest(unittest.TestCase):
+    """Prüft, dass die Module schnell importiert werden. Langsame oder
+    optionale Abhängigkeiten dürfen erst bei Bedarf geladen werden."""
+
+    # Obergrenze in Sekunden, großzügig für langsame Rechner (Pi Zero)
+    BUDGET = 0.5
+    VERBOTEN = {"pkg_resources", "importlib.metadata", "tkinter", "RPi",
+                "eapi.GPIODummy", "multiprocessing", "curses"}
+
+    def test_importzeit(self):
+        for modul in ["eapi", "eapi.hw", "eapi.net", "eapi.gui"]:
+            # erster Import, um ggf. .pyc-Dateien zu erzeugen
+            importzeit(modul)
+            dauer, module = importzeit(modul)
+            self.assertLess(dauer, self.BUDGET, modul)
+            self.assertFalse(module & self.VERBOTEN, modul)
+
+    def test_version(self):
+        import eapi
+        self.assertRegex(eapi.VERSION, r"^\d+\.\d+")
+        with self.assertRaises(AttributeError):
+            eapi.GIBTS_NICHT
 
 
 class DimmbaresEAModulTest(unittest.TestCase):
@@ -31,6 +110,18 @@ class DimmbaresEAModulTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.ea.schalte_led(0, 1.1)
 
+    def test_ungueltige_werte(self):
+        # Mit und ohne Messung gilt dieselbe Prüfung.
+        for messen in [False, True]:
+            if messen:
+                self.ea.messung_einschalten()
+            for wert in ["x", None, float("nan"), float("inf"), -0.1]:
+                with self.assertRaises(ValueError):
+                    self.ea.schalte_led(EAModul.LED_ROT, wert)
+            with self.assertRaises(ValueError):
+                self.ea.schalte_led("rot", 1)
+        self.assertEqual(self.ea.led_wert(EAModul.LED_ROT), 0)
+
     def test_led_event_registrieren(self):
 
         def update_rote_led(neuer_wert):
@@ -92,6 +183,93 @@ class EAModulTest(unittest.TestCase):
         self.ea.led_event_registrieren(EAModul.LED_ROT, update_rote_led)
         self.ea.schalte_led(EAModul.LED_ROT, 1)
 
+    def test_wechsel_ohne_entprellzeit(self):
+        # Wie RPi.GPIO lehnt die Simulation eine bouncetime von 0 ab.
+        with self.assertRaises(ValueError):
+            eapi.GPIODummy.add_event_detect(self.ea._taster[1],
+                                            eapi.GPIODummy.BOTH, print,
+                                            bouncetime=0)
+
+        wechsel = queue.Queue()
+        with benchmark.simulation():
+            self.ea.taster_wechsel_registrieren(0, wechsel.put,
+                                                entprellzeit=0)
+            for pegel in [True, False]:
+                eapi.GPIODummy.flanke_ausloesen(self.ea._taster[0], pegel)
+                self.assertEqual(wechsel.get(timeout=1), pegel)
+
+
+class WarmstartTest(unittest.TestCase):
+    """Tests für das Übernehmen eingerichteter Pins (warm=True)."""
+
+    def setUp(self):
+        self.simulation = benchmark.simulation()
+        self.simulation.__enter__()
+        eapi.GPIODummy.cleanup()
+
+    def tearDown(self):
+        eapi.GPIODummy.cleanup()
+        eapi.hw._eingerichtet.clear()
+        self.simulation.__exit__(None, None, None)
+
+    def neustart(self):
+        """Vergisst wie ein neuer Prozess, welche Pins eingerichtet sind. Die
+        Pins selbst bleiben wie auf dem Pi eingerichtet."""
+        eapi.hw._eingerichtet.clear()
+
+    def test_pegel_uebernehmen(self):
+        EAModul().schalte_leds(1, 0, 1)
+        self.neustart()
+
+        ea = EAModul(warm=True)
+        self.assertTrue(ea.warmstart)
+        self.assertEqual([1, 0, 1], [ea.led_wert(f) for f in range(3)])
+
+    def test_kaltstart(self):
+        ea = EAModul(warm=True)
+        self.assertFalse(ea.warmstart)
+        self.assertEqual([0, 0, 0], [ea.led_wert(f) for f in range(3)])
+
+    def test_keine_doppelte_einrichtung(self):
+        EAModul()
+        with mock.patch.object(eapi.GPIODummy, "setup") as setup, \
+                mock.patch.object(eapi.GPIODummy, "setmode") as setmode:
+            EAModul(warm=True)
+        setup.assert_not_called()
+        setmode.assert_not_called()
+
+    def test_cleanup_laesst_leds_stehen(self):
+        ea = EAModul(warm=True)
+        ea.schalte_led(EAModul.LED_GELB, 1)
+        ea.cleanup()
+
+        pin = ea._leds[EAModul.LED_GELB]
+        self.assertEqual(eapi.GPIODummy.OUT,
+                         eapi.GPIODummy.gpio_function(pin))
+        self.assertTrue(eapi.GPIODummy.input(pin))
+
+        self.neustart()
+        self.assertEqual(1, EAModul(warm=True).led_wert(EAModul.LED_GELB))
+
+    def test_dimmbar(self):
+        EAModul().schalte_led(EAModul.LED_ROT, 1)
+        self.neustart()
+
+        ea = DimmbaresEAModul(warm=True)
+        self.assertEqual(1, ea.led_wert(EAModul.LED_ROT))
+        ea.schalte_led(EAModul.LED_ROT, 0.5)
+        self.assertEqual(0.5, ea.led_wert(EAModul.LED_ROT))
+
+    def test_veroeffentlichen(self):
+        EAModul().schalte_led(EAModul.LED_GRUEN, 1)
+        self.neustart()
+
+        pfad = os.path.join(tempfile.mkdtemp(), "zustand")
+        ea = EAModul(warm=True)
+        ea.veroeffentlichen(pfad)
+        self.assertEqual((0.0, 0.0, 1.0), ZustandLeser(pfad).lesen().leds)
+        ea.cleanup()
+
 
 class EAModulCLITest(unittest.TestCase):
     def test_schalte_led(self):
@@ -105,5 +283,1461 @@ class EAModulCLITest(unittest.TestCase):
         ea.schalte_led(EAModul.LED_GRUEN, 0)
         ea.schalte_led(EAModul.LED_GRUEN, 1)
 
+    def test_nur_aenderungen_zeichnen(self):
+        ea = EAModul()
+        ausgabe = io.StringIO()
+        konsole = EAModulKonsole(ea, fps=1000, ausgabe=ausgabe)
+        konsole.zeichnen()
+        self.assertIn(EAModulKonsole.ANSI_ERASE_DISPLAY, ausgabe.getvalue())
+
+        ausgabe.seek(0)
+        ausgabe.truncate()
+        for i in range(100):
+            ea.schalte_led(EAModul.LED_ROT, i % 2)
+        konsole._gruene_led_update(0.5)
+        time.sleep(0.1)
+        konsole.zeichnen()
+
+        s = ausgabe.getvalue()
+        self.assertNotIn(EAModulKonsole.ANSI_ERASE_DISPLAY, s)
+        self.assertIn("\033[1;7H", s)
+        self.assertNotIn("\033[1;13H", s)
+        self.assertIn("\033[48;2;0;127;0m", s)
+
+    def test_bildrate_begrenzen(self):
+        ea = EAModul()
+        ausgabe = io.StringIO()
+        EAModulKonsole(ea, fps=5, ausgabe=ausgabe)
+
+        ende = time.time() + 0.5
+        i = 0
+        while time.time() < ende:
+            ea.schalte_led(EAModul.LED_ROT, i % 2)
+            i += 1
+            time.sleep(0.001)
+
+        # etwa 3 Bilder in 0,5 Sekunden statt mehrerer hundert
+        self.assertLessEqual(
+            ausgabe.getvalue().count(EAModulKonsole.FARBNAMEN[0]), 4)
+
+    def test_schliessen(self):
+        ea = EAModul()
+        ausgabe = io.StringIO()
+        konsole = EAModulKonsole(ea, fps=0.001, ausgabe=ausgabe)
+        ea.schalte_led(EAModul.LED_ROT, 1)
+        time.sleep(0.1)
+
+        # Das letzte Bild fiele sonst der Bildrate zum Opfer.
+        ea.schalte_led(EAModul.LED_GELB, 1)
+        start = time.monotonic()
+        konsole.schliessen()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertIn("\033[1;13H", ausgabe.getvalue())
+
+        # Nach dem Schließen wird nichts mehr gezeichnet.
+        n = len(ausgabe.getvalue())
+        ea.schalte_led(EAModul.LED_GRUEN, 1)
+        time.sleep(0.1)
+        konsole.schliessen()
+        self.assertEqual(len(ausgabe.getvalue()), n)
+        ea.cleanup()
+
+
+def _anzeige_vorhanden():
+    """Prüft, ob ein Tk-Fenster geöffnet werden kann."""
+    import tkinter
+    try:
+        tkinter.Tk().destroy()
+        return True
+    except tkinter.TclError:
+        return False
+
+
+@unittest.skipUnless(_anzeige_vorhanden(), "keine Anzeige vorhanden")
+class EAModulGuiTest(unittest.TestCase):
+    def test_schalten_aus_anderem_thread(self):
+        ea = EAModul()
+        gui = EAModulGui(ea, fps=100)
+
+        def schalten():
+            for i in range(10000):
+                ea.schalte_led(EAModul.LED_ROT, i % 2)
+            ea.schalte_led(EAModul.LED_GRUEN, 1)
+
+        thread = threading.Thread(target=schalten)
+        thread.start()
+        gui.fenster.after(500, gui.schliessen)
+        gui.run()
+        thread.join()
+        ea.cleanup()
+
+        self.assertEqual(gui.var_gruen.get(), "1")
+        # 10001 LED-Wechsel und der Anfangszustand beider Taster
+        self.assertEqual(gui.verlauf.geschrieben, 10003)
+
+    def test_taster_wechsel(self):
+        with benchmark.simulation():
+            ea = EAModul()
+            gui = EAModulGui(ea, fps=100)
+            position = gui.verlauf.geschrieben
+            for pegel in [True, False]:
+                eapi.GPIODummy.flanke_ausloesen(ea._taster[0], pegel)
+                ende = time.monotonic() + 2
+                while (gui.verlauf.geschrieben == position and
+                       time.monotonic() < ende):
+                    time.sleep(0.01)
+                position, eintraege = gui.verlauf.seit(position)
+                self.assertEqual([(k, w) for _, k, w in eintraege],
+                                 [(3, float(pegel))])
+            gui.schliessen()
+            ea.cleanup()
+
+
+class VerlaufTest(unittest.TestCase):
+    def test_ueberschreiben(self):
+        verlauf = Verlauf(groesse=100)
+        threads = [threading.Thread(
+            target=lambda k=k: [verlauf.erfassen(k, i % 2)
+                                for i in range(1000)])
+            for k in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        position, eintraege = verlauf.seit(0)
+        self.assertEqual(position, 4000)
+        self.assertEqual(len(eintraege), 100)
+        self.assertEqual(verlauf.seit(position), (4000, []))
+
+
+class EAModulServerTest(unittest.TestCase):
+    """Tests für den EAModulServer im entkoppelten Modus."""
+
+    def setUp(self):
+        self.ea = EAModul()
+        self.rot = []
+
+        def langsamer_beobachter(wert):
+            time.sleep(0.01)
+            self.rot.append(wert)
+
+        self.ea.led_event_registrieren(EAModul.LED_ROT, langsamer_beobachter)
+        self.server = EAModulServer("127.0.0.1", 0, eamodul=self.ea,
+                                    entkoppelt=True, empfangspuffer=1 << 16)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        self.ea.cleanup()
+
+    def warte_auf(self, bedingung):
+        ende = time.monotonic() + 5
+        while not bedingung() and time.monotonic() < ende:
+            time.sleep(0.01)
+
+    def test_zusammenfassen(self):
+        client = EAModulClient(*self.server.server_address)
+        for i in range(50):
+            client.sende(i % 2, 9, 9)
+        client.sende(1, 9, 9)
+        client.client.sendto(b"", self.server.server_address)
+
+        self.warte_auf(lambda: self.server.statistik["empfangen"] == 52)
+        self.warte_auf(lambda: self.rot and self.rot[-1] == 1)
+
+        statistik = self.server.statistik
+        self.assertEqual(statistik["empfangen"], 52)
+        self.assertEqual(statistik["leer"], 1)
+        if os.path.exists("/proc/net/udp"):
+            self.assertEqual(statistik["verloren"], 0)
+        self.assertGreater(statistik["zusammengefasst"], 0)
+        self.assertLess(len(self.rot), 51)
+        self.assertEqual(self.rot[-1], 1)
+
+    def test_statistik_anfrage(self):
+        client = EAModulClient(*self.server.server_address)
+        client.sende(1, 0, 9)
+        client.client.sendto(b"\x00unbekannt", self.server.server_address)
+
+        self.warte_auf(lambda: self.server.statistik["latenz"]["anzahl"] == 1)
+        statistik = client.statistik()
+
+        self.assertEqual(statistik["empfangen"], 3)
+        self.assertEqual(statistik["bytes"], 1 + 10 + 6)
+        self.assertEqual(statistik["fehlerhaft"], 1)
+        self.assertEqual(sum(statistik["latenz"]["histogramm"]), 1)
+        # Der langsame Beobachter zählt nicht zur Latenz.
+        self.assertGreaterEqual(statistik["beobachter"]["summe"], 0.01)
+        self.assertLess(statistik["latenz"]["max"],
+                        statistik["beobachter"]["summe"])
+        self.assertIn('eapi_latenz_sekunden_bucket{le="+Inf"} 1',
+                      self.server.prometheus())
+
+    def test_metriken_aus_mehreren_threads(self):
+        # Empfangs-, Hardware- und Zeitplanerthread zählen gleichzeitig.
+        metriken = ServerMetriken()
+
+        def zaehlen():
+            for _ in range(20000):
+                metriken.zaehlen("fehlerhaft")
+                metriken.latenz_messen(0.0003)
+
+        intervall = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=zaehlen) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(intervall)
+
+        statistik = metriken.schnappschuss()
+        self.assertEqual(statistik["fehlerhaft"], 80000)
+        self.assertEqual(statistik["latenz"]["anzahl"], 80000)
+        self.assertEqual(sum(statistik["latenz"]["histogramm"]), 80000)
+
+    def test_postfach(self):
+        postfach = LEDPostfach()
+        postfach.ablegen(dekodiere(0b110000))
+        postfach.ablegen(dekodiere(0b001110))
+        self.assertEqual(postfach.abholen(), [1, 1, 0])
+        postfach.schliessen()
+        self.assertIsNone(postfach.abholen())
+
+
+class EAModulServerRoutingTest(unittest.TestCase):
+    """Testet das Ansteuern mehrerer Module über einen Server."""
+
+    def setUp(self):
+        self.module = {0: EAModul(), 7: EAModul(12, 16, 18, 22, 24)}
+        self.gelb = {modul_id: [] for modul_id in self.module}
+        for modul_id, ea in self.module.items():
+            ea.led_event_registrieren(EAModul.LED_GELB,
+                                      self.gelb[modul_id].append)
+
+    def tearDown(self):
+        for ea in self.module.values():
+            ea.cleanup()
+
+    def test_modul_id(self):
+        server = EAModulServer("127.0.0.1", 0, module=self.module)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        EAModulClient(*server.server_address).sende(9, 1, 9)
+        EAModulClient(*server.server_address, modul_id=7).sende(9, 0, 9)
+        EAModulClient(*server.server_address, modul_id=3).sende(9, 1, 9)
+        # Ältere Clients mit angehängten Bytes schalten das Modul 0, auch
+        # wenn das Paket wie bei echo ohne -n genau 2 Byte lang ist.
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as alt:
+            alt.sendto(b"\x0c\x07\n", server.server_address)
+            alt.sendto(b"\x08\x07", server.server_address)
+            # Ein erweitertes Paket ohne Modul-ID ist fehlerhaft.
+            alt.sendto(bytes([0x0c | MIT_MODUL_ID]), server.server_address)
+
+        ende = time.monotonic() + 5
+        while server.metriken.empfangen < 6 and time.monotonic() < ende:
+            time.sleep(0.01)
+        server.shutdown()
+        thread.join()
+        server.server_close()
+
+        self.assertEqual(self.gelb, {0: [1, 1, 0], 7: [0]})
+        self.assertEqual(server.metriken.fehlerhaft, 2)
+
+    def test_server_getrennt(self):
+        server0 = EAModulServer("127.0.0.1", 0, eamodul=self.module[0])
+        server7 = EAModulServer("127.0.0.1", 0, eamodul=self.module[7])
+        self.assertIs(server0.modul(), self.module[0])
+        self.assertIs(server7.modul(), self.module[7])
+        server0.server_close()
+        server7.server_close()
+
+
+class RatenbegrenzerTest(unittest.TestCase):
+    """Tests für die Ratenbegrenzung je Absender."""
+
+    def test_fairness(self):
+        begrenzer = Ratenbegrenzer(rate=100, burst=10)
+        erlaubt = {"a": 0, "b": 0}
+        for i in range(1000):
+            # a flutet den Server, b sendet nur jedes zehnte Mal
+            for quelle in ["a"] * 10 + (["b"] if i % 10 == 0 else []):
+                if begrenzer.erlauben(quelle, jetzt=i / 1000):
+                    erlaubt[quelle] += 1
+
+        self.assertLessEqual(erlaubt["a"], 10 + 100)
+        self.assertEqual(erlaubt["b"], 100)
+        self.assertGreater(begrenzer.gedrosselt_je_quelle()["a"], 9000)
+
+    def test_lru_und_erlaubt(self):
+        begrenzer = Ratenbegrenzer(rate=1, burst=1, max_quellen=100,
+                                   erlaubt=["10.0.0.%d" % i
+                                            for i in range(1000)])
+        for i in range(1000):
+            begrenzer.erlauben("10.0.0.%d" % i, jetzt=0)
+            begrenzer.erlauben("10.0.0.%d" % i, jetzt=0)
+        self.assertEqual(len(begrenzer.gedrosselt_je_quelle()), 100)
+
+        self.assertFalse(begrenzer.erlauben("192.168.0.1"))
+        self.assertEqual(begrenzer.abgelehnt, 1)
+
+    def test_server(self):
+        ea = EAModul()
+        server = EAModulServer("127.0.0.1", 0, eamodul=ea,
+                               ratenbegrenzer=Ratenbegrenzer(1, 5))
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        client = EAModulClient(*server.server_address)
+        for _ in range(20):
+            client.sende(1, 1, 1)
+
+        ende = time.monotonic() + 5
+        while (server.metriken.empfangen + server.metriken.gedrosselt < 20
+               and time.monotonic() < ende):
+            time.sleep(0.01)
+        server.shutdown()
+        thread.join()
+        server.server_close()
+        ea.cleanup()
+
+        self.assertEqual(server.metriken.empfangen, 5)
+        self.assertEqual(server.statistik["gedrosselt_je_quelle"],
+                         {"127.0.0.1": 15})
+
+
+class VirtuelleFlotteTest(unittest.TestCase):
+    """Tests für eine Flotte virtueller Boards."""
+
+    def test_flotte(self):
+        flotte = VirtuelleFlotte(1000)
+        thread = threading.Thread(target=flotte.serve_forever)
+        thread.start()
+
+        for i, adresse in enumerate(flotte.adressen):
+            EAModulClient(*adresse).sende(i % 2, 1, 9)
+
+        ende = time.monotonic() + 5
+        while flotte.empfangen < 1000 and time.monotonic() < ende:
+            time.sleep(0.01)
+        flotte.shutdown()
+        thread.join()
+        flotte.server_close()
+
+        self.assertTrue(flotte.alle(gelb=1, gruen=0))
+        self.assertEqual(flotte.anzahl_mit(rot=1), 500)
+        self.assertEqual(flotte.zustaende()[1], (1, 1, 0))
+
+    def test_wie_eamodulserver(self):
+        flotte = VirtuelleFlotte(1)
+        adresse = flotte.adressen[0]
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            # Ältere Clients mit angehängten Bytes schalten das Modul 0.
+            sock.sendto(b"\x30\x07\n", adresse)
+            EAModulClient(*adresse, modul_id=0).sende(9, 1, 9)
+            # Andere Module, Zeitpunkte und Steueranfragen versteht ein
+            # Board nicht.
+            EAModulClient(*adresse, modul_id=7).sende(0, 0, 0)
+            EAModulClient(*adresse).sende(0, 0, 0, zeitpunkt=time.time())
+            sock.sendto(b"\x00stats", adresse)
+
+            ende = time.monotonic() + 5
+            while flotte.empfangen < 5 and time.monotonic() < ende:
+                flotte.bearbeiten(timeout=0.1)
+        flotte.server_close()
+
+        self.assertEqual(flotte.zustaende(), [(1, 1, 0)])
+        self.assertEqual(flotte.verworfen, 3)
+
+
+class SynchronisationTest(unittest.TestCase):
+    """Testet das zeitgleiche Schalten mehrerer Boards trotz verzögerter
+    Pakete."""
+
+    def setUp(self):
+        self.server, self.threads, self.zeiten = [], [], []
+        for i in range(4):
+            ea = EAModul()
+            ea.led_event_registrieren(
+                EAModul.LED_ROT,
+                lambda wert: self.zeiten.append(time.time()))
+            server = EAModulServer("127.0.0.1", 0, eamodul=ea)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            self.server.append(server)
+            self.threads.append(thread)
+
+        zufall = random.Random(1)
+        self.clients = [EAModulClient(*server.server_address,
+                                      verzoegerung=lambda: zufall.uniform(
+                                          0, 0.03))
+                        for server in self.server]
+
+    def tearDown(self):
+        for server, thread in zip(self.server, self.threads):
+            server.shutdown()
+            thread.join()
+            server.server_close()
+            server.modul().cleanup()
+
+    def test_zeitgleich_schalten(self):
+        for client in self.clients:
+            self.assertLess(abs(client.uhr_abgleichen(anzahl=16)), 0.01)
+
+        zeitpunkt = time.time() + 0.2
+        for client in self.clients:
+            client.sende(1, 9, 9, zeitpunkt=zeitpunkt)
+
+        ende = time.monotonic() + 5
+        while len(self.zeiten) < 4 and time.monotonic() < ende:
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.zeiten), 4)
+        self.assertLess(max(self.zeiten) - min(self.zeiten), 0.01)
+        self.assertGreaterEqual(min(self.zeiten), zeitpunkt - 0.01)
+
+    def test_ungueltige_zeitpunkte(self):
+        client, server = self.clients[0], self.server[0]
+        for zeitpunkt in [float("nan"), float("inf"), 1e300,
+                          time.time() + 86400]:
+            client.sende(1, 9, 9, zeitpunkt=zeitpunkt)
+
+        # Spätere Befehle werden weiterhin zum Zeitpunkt ausgeführt.
+        client.sende(1, 9, 9, zeitpunkt=time.time() + 0.05)
+        ende = time.monotonic() + 5
+        while not self.zeiten and time.monotonic() < ende:
+            time.sleep(0.01)
+
+        self.assertEqual(len(self.zeiten), 1)
+        self.assertEqual(server.metriken.fehlerhaft, 4)
+
+
+class EAModulMultiprozessServerTest(unittest.TestCase):
+    """Testet den Server mit mehreren Worker-Prozessen."""
+
+    def test_worker(self):
+        ea = EAModul()
+        werte = {EAModul.LED_ROT: [], EAModul.LED_GRUEN: []}
+        for farbe, liste in werte.items():
+            ea.led_event_registrieren(farbe, liste.append)
+
+        server = EAModulMultiprozessServer("127.0.0.1", 0, prozesse=2,
+                                           eamodul=ea)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        client = EAModulClient(*server.server_address)
+        for _ in range(100):
+            client.sende(1, 9, 9)
+            client.sende(9, 9, 1)
+
+        ende = time.monotonic() + 5
+        while ((not werte[EAModul.LED_ROT] or not werte[EAModul.LED_GRUEN])
+               and time.monotonic() < ende):
+            time.sleep(0.01)
+        server.shutdown()
+        thread.join()
+        server.server_close()
+        ea.cleanup()
+
+        self.assertEqual(set(werte[EAModul.LED_ROT]), {1})
+        self.assertEqual(set(werte[EAModul.LED_GRUEN]), {1})
+        self.assertEqual(len(server.prozesse), 2)
+
+
+class MitschnittTest(unittest.TestCase):
+    """Testet Mitschnitt und erneutes Abspielen von Requests."""
+
+    def starte(self, **kwargs):
+        ea = EAModul()
+        server = EAModulServer("127.0.0.1", 0, eamodul=ea, **kwargs)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def beenden():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+            ea.cleanup()
+
+        return server, beenden
+
+    def warte_auf(self, server, anzahl):
+        ende = time.monotonic() + 5
+        while server.metriken.empfangen < anzahl and time.monotonic() < ende:
+            time.sleep(0.01)
+
+    def test_aufnehmen_und_abspielen(self):
+        pfad = os.path.join(tempfile.mkdtemp(), "eamodul.cap")
+        mitschnitt = Mitschnitt(pfad, max_groesse=200, max_dateien=100)
+        server, beenden = self.starte(mitschnitt=mitschnitt)
+        client = EAModulClient(*server.server_address)
+        for i in range(50):
+            client.sende(i % 2, 9, 1)
+        self.warte_auf(server, 50)
+        beenden()
+        mitschnitt.schliessen()
+
+        self.assertGreater(len(mitschnitt_dateien(pfad)), 1)
+
+        server, beenden = self.starte()
+        self.assertEqual(abspielen(pfad, *server.server_address, tempo=None),
+                         50)
+        self.warte_auf(server, 50)
+        beenden()
+        self.assertEqual(server.metriken.empfangen, 50)
+        self.assertEqual(server.metriken.bytes, 50)
+
+    def test_kopf(self):
+        pfad = os.path.join(tempfile.mkdtemp(), "eamodul.cap")
+        mitschnitt = Mitschnitt(pfad)
+        mitschnitt.schreiben(b"\x0e", ("127.0.0.1", 5000), zeitpunkt=1.5)
+        mitschnitt.schliessen()
+        with open(pfad, "rb") as datei:
+            inhalt = datei.read()
+        self.assertEqual(inhalt[:7], b"EACAP1\n")
+
+        # Dateien mit dem früheren Kopf bleiben lesbar.
+        with open(pfad, "wb") as datei:
+            datei.write(b"EACAP1\\n" + inhalt[len(Mitschnitt.KOPF):])
+        self.assertEqual(list(mitschnitt_lesen(pfad)),
+                         [(1.5, ("127.0.0.1", 5000), b"\x0e")])
+
+
+class FramesTest(unittest.TestCase):
+    """Testet das Senden von Frames aus dem Textformat."""
+
+    def test_frames_senden(self):
+        ea = EAModul()
+        zeiten = []
+        ea.led_event_registrieren(EAModul.LED_ROT,
+                                  lambda wert: zeiten.append(
+                                      (time.perf_counter(), wert)))
+        server = EAModulServer("127.0.0.1", 0, eamodul=ea)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        start = time.perf_counter()
+        frames = text_frames(["0.00 1xx", "0.05 0xx", "# Pause",
+                              "0.10 1xx"])
+        self.assertEqual(frames_senden(frames, *server.server_address), 3)
+
+        ende = time.monotonic() + 5
+        while len(zeiten) < 3 and time.monotonic() < ende:
+            time.sleep(0.01)
+        server.shutdown()
+        thread.join()
+        server.server_close()
+        ea.cleanup()
+
+        self.assertEqual([wert for _, wert in zeiten], [1, 0, 1])
+        self.assertAlmostEqual(zeiten[2][0] - start, 0.1, delta=0.02)
+
+        with self.assertRaises(ValueError):
+            list(text_frames(["0.1 0.2 101"]))
+
+
+class BenchTest(unittest.TestCase):
+    """Testet den Benchmark des EAModulServers."""
+
+    def test_bench(self):
+        ergebnis = bench(sender=2, pakete=50, muster="zufall", rate=1000)
+
+        self.assertEqual(ergebnis["gesendet"], 100)
+        self.assertGreater(ergebnis["empfangen"], 0)
+        self.assertLessEqual(ergebnis["latenz"]["p50"],
+                             ergebnis["latenz"]["max"])
+
+
+class EAModulStreamServerTest(unittest.TestCase):
+    """Tests für den EAModulStreamServer über TCP und Unix Domain Sockets."""
+
+    def setUp(self):
+        self.ea = EAModul()
+        self.gruen = []
+        self.ea.led_event_registrieren(EAModul.LED_GRUEN, self.gruen.append)
+
+    def tearDown(self):
+        self.ea.cleanup()
+
+    def starte(self, **kwargs):
+        server = EAModulStreamServer(eamodul=self.ea, **kwargs)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+
+        def beenden():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+        self.addCleanup(beenden)
+        return server
+
+    def test_tcp_mehrere_verbindungen(self):
+        server = self.starte(host="127.0.0.1", port=0)
+        clients = [EAModulStreamClient(*server.server_address)
+                   for _ in range(10)]
+        for client in clients:
+            for i in range(100):
+                client.sende(9, 9, i % 2, ack=True)
+        for client in clients:
+            client.acks_abwarten()
+            client.schliessen()
+
+        self.assertEqual(len(self.gruen), 1000)
+        self.assertEqual(server.metriken.empfangen, 1000)
+
+    def test_unix_socket(self):
+        pfad = os.path.join(tempfile.mkdtemp(), "eamodul.sock")
+        self.starte(pfad=pfad)
+        client = EAModulStreamClient(pfad=pfad)
+        client.sende(9, 9, 1)
+        client.sende(9, 9, 0, ack=True)
+        client.acks_abwarten()
+        client.schliessen()
+
+        self.assertEqual(self.gruen, [1, 0])
+
+
+class EAModulMQTTBrueckeTest(unittest.TestCase):
+    """Tests für die MQTT-Brücke mit einem lokalen Testbroker."""
+
+    def setUp(self):
+        self.broker = MQTTTestBroker("127.0.0.1", 0)
+        self.broker.starten()
+        self.ea = EAModul()
+        self.rot = []
+        self.ea.led_event_registrieren(EAModul.LED_ROT, self.rot.append)
+        self.bruecke = EAModulMQTTBruecke(self.ea, *self.broker.server_address,
+                                          intervall=0.05, backoff_min=0.05)
+        self.bruecke.start()
+        self.assertTrue(self.bruecke.warte_auf_verbindung())
+
+    def tearDown(self):
+        self.bruecke.stop()
+        self.broker.beenden()
+        self.ea.cleanup()
+
+    def test_befehl_und_zustand(self):
+        client = MQTTVerbindung(*self.broker.server_address, "test")
+        client.abonnieren("eapi/led/rot")
+        client.veroeffentlichen("eapi/led/rot/set", b"1")
+
+        self.assertEqual(client.empfangen(), ("eapi/led/rot", b"1"))
+        self.assertEqual(self.rot, [1])
+        client.schliessen()
+
+    def test_zusammenfassen(self):
+        client = MQTTVerbindung(*self.broker.server_address, "test")
+        client.abonnieren("eapi/led/gelb")
+        for i in range(20):
+            self.ea.schalte_led(EAModul.LED_GELB, i % 2)
+
+        self.assertEqual(client.empfangen(), ("eapi/led/gelb", b"1"))
+        gelb = [n for n in self.broker.nachrichten if n[0] == "eapi/led/gelb"]
+        self.assertLess(len(gelb), 20)
+        client.schliessen()
+
+    def test_wiederverbinden(self):
+        self.broker.verbindungen_trennen()
+        ende = time.monotonic() + 5
+        while self.bruecke.verbindungen < 2 and time.monotonic() < ende:
+            time.sleep(0.01)
+        self.assertEqual(self.bruecke.verbindungen, 2)
+
+    def test_broker_antwortet_nicht(self):
+        self.bruecke.stop()
+        self.broker.pings_beantworten = False
+        bruecke = EAModulMQTTBruecke(self.ea, *self.broker.server_address,
+                                     keepalive=1, backoff_min=0.05)
+        bruecke.start()
+        try:
+            # Ohne PINGRESP wird nach 1,5 s neu verbunden.
+            ende = time.monotonic() + 5
+            while bruecke.verbindungen < 2 and time.monotonic() < ende:
+                time.sleep(0.01)
+            self.assertGreaterEqual(bruecke.verbindungen, 2)
+        finally:
+            bruecke.stop()
+
+    def test_client_id(self):
+        self.assertEqual(self.bruecke.client_id, "eapi-{}-{}".format(
+            socket.gethostname(), os.getpid()))
+
+    def test_taster_druecken_und_loslassen(self):
+        client = MQTTVerbindung(*self.broker.server_address, "test")
+        client.abonnieren("eapi/taster/#")
+        pin = self.ea._taster[0]
+
+        def empfangen_bis(*erwartet):
+            # Zuerst kommt ggf. der zufällige Anfangszustand (retained).
+            empfangen = set()
+            while not set(erwartet) <= empfangen:
+                empfangen.add(client.empfangen())
+
+        with benchmark.simulation():
+            eapi.GPIODummy.flanke_ausloesen(pin, 1)
+            empfangen_bis(("eapi/taster/0", b"1"),
+                          ("eapi/taster/0/zustand", b"1"))
+            eapi.GPIODummy.flanke_ausloesen(pin, 0)
+            empfangen_bis(("eapi/taster/0/zustand", b"0"))
+        client.schliessen()
+
+
+
+class EAModulWebServerTest(unittest.TestCase):
+    """Testet den Webserver mit Server-Sent Events."""
+
+    def setUp(self):
+        self.ea = EAModul()
+        self.webserver = EAModulWebServer("127.0.0.1", 0, eamodul=self.ea,
+                                          intervall=0.01)
+        self.thread = threading.Thread(target=self.webserver.serve_forever)
+        self.thread.start()
+
+        # Anfangszustand verteilen lassen
+        while self.webserver.verteiler.nachrichten == 0:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.webserver.shutdown()
+        self.thread.join()
+        self.webserver.server_close()
+        self.ea.cleanup()
+
+    def verbinden(self):
+        return http.client.HTTPConnection(*self.webserver.server_address,
+                                          timeout=5)
+
+    def ereignis_lesen(self, antwort):
+        zeile = antwort.fp.readline()
+        self.assertEqual(antwort.fp.readline(), b"\n")
+        return json.loads(zeile[len(b"data: "):])
+
+    def test_anfangszustand(self):
+        ea = EAModul(12, 16, 18, 22, 24)
+        ea.schalte_led(EAModul.LED_GELB, 1)
+        webserver = EAModulWebServer("127.0.0.1", 0, eamodul=ea)
+        try:
+            self.assertEqual(webserver.verteiler.zustand()["gelb"], 1)
+        finally:
+            webserver.verteiler.schliessen()
+            webserver.server_close()
+            ea.cleanup()
+
+    def test_port_belegt(self):
+        eamodul = mock.Mock()
+        with self.assertRaises(OSError):
+            EAModulWebServer(*self.webserver.server_address, eamodul=eamodul)
+        eamodul.led_event_registrieren.assert_not_called()
+        eamodul.taster_event_registrieren.assert_not_called()
+
+    def test_verteilen(self):
+        betrachter = []
+        for _ in range(20):
+            verbindung = self.verbinden()
+            verbindung.request("GET", "/ereignisse")
+            antwort = verbindung.getresponse()
+            self.assertEqual(self.ereignis_lesen(antwort)["rot"], 0)
+            betrachter.append((verbindung, antwort))
+
+        nachrichten = self.webserver.verteiler.nachrichten
+        self.ea.schalte_led(EAModul.LED_ROT, 1)
+        for verbindung, antwort in betrachter:
+            self.assertEqual(self.ereignis_lesen(antwort)["rot"], 1)
+            verbindung.close()
+
+        # einmal serialisiert für alle Betrachter
+        self.assertEqual(self.webserver.verteiler.nachrichten,
+                         nachrichten + 1)
+
+    def test_leds_schalten(self):
+        gruen = []
+        self.ea.led_event_registrieren(EAModul.LED_GRUEN, gruen.append)
+
+        verbindung = self.verbinden()
+        verbindung.request("POST", "/leds", json.dumps(
+            [{"gruen": 1, "dauer": 0.01}, {"gruen": 0}, {"rot": 1}]))
+        antwort = verbindung.getresponse()
+        self.assertEqual(antwort.status, 200)
+        self.assertEqual(json.load(antwort)["rot"], 1)
+        self.assertEqual(gruen, [1, 0])
+
+        verbindung.request("POST", "/leds", '{"blau": 1}')
+        antwort = verbindung.getresponse()
+        self.assertEqual(antwort.status, 400)
+        antwort.read()
+
+        verbindung.request("GET", "/")
+        self.assertIn(b"EventSource", verbindung.getresponse().read())
+        verbindung.close()
+
+    def test_ungueltige_anfragen(self):
+        ea = DimmbaresEAModul()
+        webserver = EAModulWebServer("127.0.0.1", 0, eamodul=ea)
+        thread = threading.Thread(target=webserver.serve_forever)
+        thread.start()
+
+        for rumpf in ['{"rot": "x"}', '{"rot": [1]}', '5', '{"dauer": [1]}']:
+            verbindung = http.client.HTTPConnection(*webserver.server_address,
+                                                    timeout=5)
+            verbindung.request("POST", "/leds", rumpf)
+            self.assertEqual(verbindung.getresponse().status, 400, rumpf)
+            verbindung.close()
+
+        for laenge in ["-1", "x"]:
+            verbindung = http.client.HTTPConnection(*webserver.server_address,
+                                                    timeout=5)
+            verbindung.putrequest("POST", "/leds")
+            verbindung.putheader("Content-Length", laenge)
+            verbindung.endheaders()
+            self.assertEqual(verbindung.getresponse().status, 400, laenge)
+            verbindung.close()
+
+        webserver.shutdown()
+        thread.join()
+        webserver.server_close()
+        ea.cleanup()
+
+
+
+class FlottenMonitorTest(unittest.TestCase):
+    """Testet das Abonnieren des Zustands mehrerer Server."""
+
+    def setUp(self):
+        self.server = []
+        for _ in range(3):
+            server = EAModulServer("127.0.0.1", 0, eamodul=EAModul())
+            threading.Thread(target=server.serve_forever).start()
+            self.server.append(server)
+
+    def tearDown(self):
+        for server in self.server:
+            server.shutdown()
+            server.server_close()
+
+    def test_abonnieren(self):
+        # Der letzte Port antwortet nicht
+        ziele = [server.server_address for server in self.server]
+        ziele.append(("127.0.0.1", 9))
+        monitor = FlottenMonitor(ziele, veraltet=0.5)
+        schluessel = monitor.schluessel
+
+        gemeldet = set()
+        while len(gemeldet) < 3:
+            geaendert = monitor.bearbeiten(timeout=2)
+            self.assertTrue(geaendert)
+            gemeldet |= geaendert
+
+        # Änderungen werden ohne erneutes Abo gemeldet
+        EAModulClient(*self.server[1].server_address).sende(1, 1, 0)
+        ende = time.monotonic() + 2
+        while (monitor.boards[schluessel[1]].leds != [1, 1, 0] and
+               time.monotonic() < ende):
+            monitor.bearbeiten(timeout=0.1)
+
+        self.assertEqual(monitor.boards[schluessel[1]].leds, [1, 1, 0])
+        self.assertEqual(monitor.boards[schluessel[0]].leds, [0, 0, 0])
+        self.assertFalse(monitor.ist_veraltet(schluessel[0]))
+        self.assertTrue(monitor.zelle(schluessel[3])[3])
+        monitor.schliessen()
+
+    def test_led_pegel_uebernehmen(self):
+        ea = EAModul()
+        ea.schalte_leds(1, 0, 0)
+        server = EAModulServer("127.0.0.1", 0, eamodul=ea)
+        meldung = server.zustand_meldung()
+        server.server_close()
+        ea.cleanup()
+
+        zustand = json.loads(meldung[len(ZUSTAND_MELDUNG):])
+        self.assertEqual(zustand["0"]["leds"], [1, 0, 0])
+
+    def test_taster_melden(self):
+        server = self.server[0]
+        pin = server.modul()._taster[1]
+        # Erneuert nie, damit nur die Wechsel selbst gemeldet werden.
+        monitor = FlottenMonitor([server.server_address], erneuern=60)
+        board = monitor.boards[monitor.schluessel[0]]
+        while not monitor.bearbeiten(timeout=2):
+            pass
+
+        with benchmark.simulation():
+            for pegel in [True, False]:
+                eapi.GPIODummy.flanke_ausloesen(pin, pegel)
+                ende = time.monotonic() + 2
+                while (board.taster[1] != int(pegel) and
+                       time.monotonic() < ende):
+                    monitor.bearbeiten(timeout=0.1)
+                self.assertEqual(board.taster[1], int(pegel))
+        monitor.schliessen()
+
+
+
+class EAModulDaemonTest(unittest.TestCase):
+    """Testet Gesten, Aktionen und das Beenden des Dienstes."""
+
+    def gesten_erkennen(self, eamodul, gesten):
+        return EAModulDaemon(eamodul, aktionen={
+            "1:kurz": lambda: gesten.append("kurz"),
+            "1:doppelt": lambda: gesten.append("doppelt"),
+            "1:lang": lambda: gesten.append("lang")},
+            haltezeiten={"1": 0.2}, doppelzeit=0.1)
+
+    def test_gesten(self):
+        gesten = []
+        with benchmark.simulation():
+            ea = EAModul()
+            daemon = self.gesten_erkennen(ea, gesten)
+
+            for gedrueckt in [True, False, True, False]:
+                daemon.taster_geaendert(1, gedrueckt)
+            time.sleep(0.15)
+            daemon.taster_geaendert(1, True)
+            daemon.taster_geaendert(1, False)
+            time.sleep(0.15)
+            # Der Pin bleibt gedrückt, bis die Haltezeit abgelaufen ist.
+            eapi.GPIODummy.flanke_ausloesen(ea._taster[1], True)
+            daemon.taster_geaendert(1, True)
+            time.sleep(0.3)
+            daemon.taster_geaendert(1, False)
+            daemon.beenden()
+
+        self.assertEqual(gesten, ["doppelt", "kurz", "lang"])
+
+    def test_loslassen_verpasst(self):
+        gesten = []
+        with benchmark.simulation():
+            ea = EAModul()
+            daemon = self.gesten_erkennen(ea, gesten)
+
+            # Das Loslassen wird nicht gemeldet, der Pin ist aber wieder
+            # losgelassen.
+            eapi.GPIODummy.flanke_ausloesen(ea._taster[1], False)
+            daemon.taster_geaendert(1, True)
+            time.sleep(0.3)
+            self.assertEqual(gesten, [])
+
+            # Der nächste Druck wird wieder erkannt.
+            daemon.taster_geaendert(1, True)
+            daemon.taster_geaendert(1, False)
+            time.sleep(0.15)
+            daemon.beenden()
+
+        self.assertEqual(gesten, ["kurz"])
+
+    def test_befehl(self):
+        with tempfile.TemporaryDirectory() as verzeichnis:
+            pfad = os.path.join(verzeichnis, "ausgefuehrt")
+            daemon = EAModulDaemon(EAModul(), aktionen={
+                "0:kurz": [sys.executable, "-c",
+                           "open({p!r}, 'w').close()".format(p=pfad)]})
+            daemon.taster_geaendert(0, True)
+            daemon.taster_geaendert(0, False)
+            daemon.beenden()
+            self.assertTrue(os.path.exists(pfad))
+
+        with self.assertRaises(ValueError):
+            EAModulDaemon(EAModul(), aktionen={"0:dreifach": "beenden"})
+
+    def test_systemd(self):
+        with tempfile.TemporaryDirectory() as verzeichnis:
+            pfad = os.path.join(verzeichnis, "notify")
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(pfad)
+            sock.settimeout(10)
+
+            prozess = subprocess.Popen(
+                [sys.executable, "-m", "eapi.daemon"],
+                env=dict(os.environ, NOTIFY_SOCKET=pfad),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.assertEqual(sock.recv(100), b"READY=1")
+            prozess.send_signal(signal.SIGTERM)
+            self.assertEqual(sock.recv(100), b"STOPPING=1")
+            self.assertEqual(prozess.wait(10), 0)
+            sock.close()
+
+
+
+class LaufzeitenTest(unittest.TestCase):
+    """Testet die ein- und ausschaltbare Laufzeitmessung des EAModuls."""
+
+    def test_ein_und_ausschalten(self):
+        ea = EAModul()
+        methoden = {name: getattr(ea, name)
+                    for name in EAModul.GEMESSENE_METHODEN}
+
+        def langsam(wert):
+            time.sleep(0.01)
+
+        ea.led_event_registrieren(EAModul.LED_GELB, lambda wert: None)
+        ea.led_event_registrieren(EAModul.LED_GELB, langsam)
+        laufzeiten = ea.messung_einschalten()
+        ea.schalte_leds(1, 1, 0)
+        ea.taster_gedrueckt(1)
+        with self.assertRaises(ValueError):
+            ea.schalte_led(EAModul.LED_ROT, 2)
+
+        schnappschuss = laufzeiten.schnappschuss()
+        operationen = schnappschuss["operationen"]
+        self.assertEqual(operationen["schalte_led"]["anzahl"], 3)
+        self.assertEqual(operationen["gpio.output"]["anzahl"], 3)
+        self.assertEqual(operationen["schalte_leds"]["anzahl"], 1)
+        self.assertEqual(operationen["taster_gedrueckt"]["anzahl"], 1)
+        self.assertEqual(sum(operationen["beobachter"]["histogramm"]), 3)
+        self.assertGreaterEqual(operationen["schalte_leds"]["summe"], 0.01)
+        self.assertEqual(schnappschuss["langsamste"][0], langsam.__qualname__)
+        self.assertEqual(schnappschuss["beobachter"][0]["led"],
+                         EAModul.LED_GELB)
+
+        # Ausgeschaltet werden wieder die Methoden der Klasse verwendet.
+        ea.messung_ausschalten()
+        self.assertIsNone(ea.laufzeiten)
+        for name, methode in methoden.items():
+            self.assertEqual(getattr(ea, name), methode)
+            self.assertNotIn(name, vars(ea))
+        ea.schalte_led(EAModul.LED_ROT, 0)
+        self.assertEqual(laufzeiten.schnappschuss()["operationen"]
+                         ["schalte_led"]["anzahl"], 3)
+        ea.cleanup()
+
+    def test_dimmbar(self):
+        ea = DimmbaresEAModul()
+        laufzeiten = ea.messung_einschalten()
+        ea.schalte_led(EAModul.LED_GRUEN, 0.5)
+        operationen = laufzeiten.schnappschuss()["operationen"]
+        self.assertEqual(operationen["gpio.pwm"]["anzahl"], 1)
+        self.assertNotIn("gpio.output", operationen)
+        ea.cleanup()
+
+    def test_server(self):
+        ea = EAModul()
+        easerver = EAModulServer("127.0.0.1", 0, eamodul=ea)
+        self.assertNotIn("laufzeiten", easerver.statistik)
+        self.assertNotIn("eapi_operation_sekunden", easerver.prometheus())
+
+        ea.messung_einschalten()
+        easerver.schalten(0, [1, None, 0], time.perf_counter())
+        laufzeiten = easerver.statistik["laufzeiten"]["0"]
+        self.assertEqual(laufzeiten["operationen"]["schalte_led"]["anzahl"],
+                         2)
+        self.assertIn('eapi_operation_sekunden_count{modul="0",'
+                      'operation="schalte_led"} 2', easerver.prometheus())
+        easerver.server_close()
+
+
+class ReaktionsMessungTest(unittest.TestCase):
+    """Testet die Messung vom Tastendruck bis zur LED mit simulierten
+    Flanken."""
+
+    def messen(self, anzahl, **kwargs):
+        pause = kwargs.pop("pause", 0.0)
+        with benchmark.simulation():
+            messung = ReaktionsMessung(EAModul(), **kwargs)
+            messung.messen(messung.simulierter_ausloeser(), anzahl,
+                           timeout=0.2, pause=pause)
+            messung.eamodul.cleanup()
+        return messung.ergebnis()
+
+    def test_modi(self):
+        for modus in ["direkt", "warteschlange"]:
+            ergebnis = self.messen(50, modus=modus)
+            self.assertEqual(ergebnis["anzahl"], 50)
+            self.assertEqual(ergebnis["verpasst"], 0)
+            latenz = ergebnis["latenz"]
+            self.assertLessEqual(latenz["p50"], latenz["p99"])
+            self.assertLessEqual(latenz["p99"], latenz["max"])
+            self.assertEqual(sum(latenz["histogramm"]), 50)
+            self.assertLessEqual(ergebnis["ausfuehrung"]["max"],
+                                 latenz["max"])
+
+        with self.assertRaises(ValueError):
+            ReaktionsMessung(EAModul(), modus="sofort")
+
+    def test_entprellzeit(self):
+        # Die zweite von zwei schnell aufeinander folgenden Flanken wird
+        # ignoriert, nach einer Pause wird wieder reagiert.
+        ergebnis = self.messen(2, entprellzeit=100)
+        self.assertEqual((ergebnis["anzahl"], ergebnis["verpasst"]), (1, 1))
+        ergebnis = self.messen(2, entprellzeit=20, pause=0.05)
+        self.assertEqual((ergebnis["anzahl"], ergebnis["verpasst"]), (2, 0))
+
+    def test_standard_entprellzeit(self):
+        # Die Simulation lehnt wie RPi.GPIO eine bouncetime von 0 ab; ohne
+        # --entprellzeit darf die Messung trotzdem nicht scheitern.
+        from eapi import latenz
+        ausgabe = io.StringIO()
+        with contextlib.redirect_stdout(ausgabe):
+            latenz.main(["--simulation", "--anzahl", "10", "--json"])
+        ergebnis = json.loads(ausgabe.getvalue())
+        self.assertEqual((ergebnis["anzahl"], ergebnis["verpasst"]), (10, 0))
+
+    def test_steigende_flanke(self):
+        gpio = eapi.GPIODummy
+        flanken = queue.Queue()
+        gpio.add_event_detect(40, gpio.RISING, callback=flanken.put)
+        self.assertTrue(gpio.flanke_ausloesen(40, 1))
+        self.assertFalse(gpio.flanke_ausloesen(40, 1))
+        self.assertFalse(gpio.flanke_ausloesen(40, 0))
+        self.assertEqual(flanken.get(timeout=1), 40)
+        self.assertFalse(gpio.input(40))
+        gpio.cleanup()
+        self.assertFalse(gpio.flanke_ausloesen(40, 1))
+
+
+class ZustandTest(unittest.TestCase):
+    """Testet die Veröffentlichung des Zustands im gemeinsamen Speicher."""
+
+    def setUp(self):
+        self.verzeichnis = tempfile.TemporaryDirectory()
+        self.pfad = os.path.join(self.verzeichnis.name, "zustand")
+
+    def tearDown(self):
+        self.verzeichnis.cleanup()
+
+    def test_konsistent(self):
+        schreiber = ZustandSchreiber(self.pfad)
+        leser = ZustandLeser(self.pfad)
+        fertig = threading.Event()
+
+        def schreiben():
+            i = 0
+            while not fertig.is_set():
+                i += 1
+                for farbe in range(3):
+                    schreiber.led_setzen(farbe, i % 2)
+
+        thread = threading.Thread(target=schreiben)
+        thread.start()
+        sequenz = 0
+        for _ in range(20000):
+            zustand = leser.lesen()
+            self.assertEqual(zustand.sequenz % 2, 0)
+            self.assertGreaterEqual(zustand.sequenz, sequenz)
+            sequenz = zustand.sequenz
+        fertig.set()
+        thread.join()
+        self.assertGreater(leser.sequenz(), 2)
+        schreiber.schliessen()
+        leser.schliessen()
+
+    def test_anderer_prozess(self):
+        schreiber = ZustandSchreiber(self.pfad)
+        schreiber.led_setzen(2, 0.5)
+        ergebnis = subprocess.run(
+            [sys.executable, "-c",
+             "from eapi.zustand import ZustandLeser; "
+             "print(ZustandLeser({p!r}).lesen().leds)".format(p=self.pfad)],
+            stdout=subprocess.PIPE, check=True, universal_newlines=True)
+        self.assertEqual(ergebnis.stdout.strip(), "(0.0, 0.0, 0.5)")
+
+        leser = ZustandLeser(self.pfad)
+        self.assertFalse(leser.ersetzt())
+        ZustandSchreiber(self.pfad).schliessen(loeschen=True)
+        self.assertTrue(leser.ersetzt())
+        schreiber.schliessen()
+
+        with open(self.pfad, "wb") as datei:
+            datei.write(b"\0" * 100)
+        with self.assertRaises(ValueError):
+            ZustandLeser(self.pfad)
+
+    def test_eamodul(self):
+        with benchmark.simulation():
+            ea = EAModul()
+            wechsel = queue.Queue()
+            ea.taster_wechsel_registrieren(1, wechsel.put)
+            ea.veroeffentlichen(self.pfad)
+            with self.assertRaises(ValueError):
+                ea.veroeffentlichen(self.pfad)
+            leser = ZustandLeser(self.pfad)
+
+            ea.schalte_leds(1, 0, 1)
+            self.assertEqual(leser.lesen().leds, (1.0, 0.0, 1.0))
+
+            # Beide registrierten Methoden erfahren vom Wechsel.
+            eapi.GPIODummy.flanke_ausloesen(ea._taster[1], True)
+            self.assertTrue(wechsel.get(timeout=1))
+            ende = time.time() + 1
+            while not leser.lesen().taster[1] and time.time() < ende:
+                time.sleep(0.01)
+            self.assertTrue(leser.lesen().taster[1])
+
+            ea.cleanup()
+            self.assertFalse(leser.lesen().offen)
+            leser.schliessen()
+
+
+class EAModulVermittlerTest(unittest.TestCase):
+    """Testet den Vermittler mit mehreren Programmen und simulierten
+    Tastern."""
+
+    def setUp(self):
+        self.simulation = benchmark.simulation()
+        self.simulation.__enter__()
+        self.verzeichnis = tempfile.TemporaryDirectory()
+        self.pfad = os.path.join(self.verzeichnis.name, "eamodul.sock")
+        self.eamodul = EAModul()
+        self.vermittler = EAModulVermittler(self.pfad, eamodul=self.eamodul,
+                                            entprellzeit=0)
+        self.thread = threading.Thread(target=self.vermittler.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.vermittler.shutdown()
+        self.thread.join()
+        self.vermittler.server_close()
+        self.eamodul.cleanup()
+        self.verzeichnis.cleanup()
+        self.simulation.__exit__(None, None, None)
+
+    def test_belegen(self):
+        anzeige = EntferntesEAModul(self.pfad)
+        ampel = EntferntesEAModul(self.pfad)
+
+        self.assertTrue(anzeige.belegen(EAModul.LED_ROT))
+        anzeige.schalte_led(EAModul.LED_ROT, 1)
+        # Höhere Priorität verdrängt die Anzeige, deren Befehle nun
+        # verworfen werden.
+        self.assertTrue(ampel.belegen(EAModul.LED_ROT, prioritaet=5))
+        ampel.schalte_led(EAModul.LED_ROT, 0)
+        ampel.synchronisieren()
+        anzeige.schalte_led(EAModul.LED_ROT, 1)
+        anzeige.synchronisieren()
+        self.assertEqual(self.vermittler.leds[EAModul.LED_ROT], 0)
+        self.assertEqual(self.vermittler.verworfen, 1)
+        self.assertEqual(anzeige.belegt, set())
+        self.assertFalse(anzeige.belegen(EAModul.LED_ROT, prioritaet=5))
+
+        # Mit der Verbindung endet die Belegung.
+        ampel.cleanup()
+        self.assertTrue(anzeige.belegen(EAModul.LED_ROT))
+        anzeige.cleanup()
+
+        with self.assertRaises(ConnectionError):
+            anzeige.schalte_led(EAModul.LED_ROT, 1)
+
+    def test_stapel_und_taster(self):
+        modul = EntferntesEAModul(self.pfad)
+        werte = []
+        modul.led_event_registrieren(EAModul.LED_GELB, werte.append)
+        with modul.stapel():
+            for i in range(100):
+                modul.schalte_leds(i % 2, (i + 1) % 2, 1)
+        eapi.GPIODummy.flanke_ausloesen(self.eamodul._taster[1], True)
+        # Die Antwort folgt auf alle zuvor gesendeten Befehle.
+        self.assertTrue(modul.taster_gedrueckt(1))
+        self.assertEqual(self.vermittler.leds, [1, 0, 1])
+        self.assertEqual(len(werte), 100)
+
+        with self.assertRaises(ValueError):
+            modul.schalte_led(3, 1)
+        with self.assertRaises(ValueError):
+            modul.taster_gedrueckt(2)
+        modul.cleanup()
+
+    def test_taster_verteilen(self):
+        wechsel = [queue.Queue(), queue.Queue()]
+        pins = queue.Queue()
+        module = [EntferntesEAModul(self.pfad) for _ in range(3)]
+        for modul, warteschlange in zip(module, wechsel):
+            modul.taster_wechsel_registrieren(0, warteschlange.put)
+        module[2].taster_event_registrieren(0, pins.put)
+        for modul in module:
+            modul.synchronisieren()
+
+        pin = self.eamodul._taster[0]
+        eapi.GPIODummy.flanke_ausloesen(pin, True)
+        eapi.GPIODummy.flanke_ausloesen(pin, False)
+        for warteschlange in wechsel:
+            self.assertEqual([warteschlange.get(timeout=1) for _ in range(2)],
+                             [True, False])
+        self.assertEqual(pins.get(timeout=1), pin)
+        self.assertTrue(pins.empty())
+        for modul in module:
+            modul.cleanup()
+
+    def test_fehlerhafte_befehle(self):
+        modul = EntferntesEAModul(self.pfad)
+        roh = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        roh.connect(self.pfad)
+        for nutzdaten in [LED.pack(BEFEHL_LED, 0, float("inf")),
+                          LED.pack(BEFEHL_LED, 0, float("nan")),
+                          LED.pack(BEFEHL_LED, 7, 1), b"", b"\x02"]:
+            roh.sendall(rahmen(nutzdaten))
+        # Auch eine ungültige Anfrage wird beantwortet.
+        roh.sendall(rahmen(bytes([BEFEHL_BELEGEN, 9, 1])))
+        roh.settimeout(1)
+        # Die ungültigen Werte für LED 0 werden als verworfen bestätigt.
+        verworfen = rahmen(LED_EREIGNIS.pack(EREIGNIS_LED, 0, 0, False))
+        erwartet = (2 * verworfen +
+                    rahmen(bytes([ANTWORT_FEHLER, BEFEHL_TASTER])) +
+                    rahmen(bytes([ANTWORT_FEHLER, BEFEHL_BELEGEN])))
+        empfangen = b""
+        while len(empfangen) < len(erwartet):
+            empfangen += roh.recv(64)
+        self.assertEqual(empfangen, erwartet)
+        roh.close()
+
+        # Der Vermittler bedient weiterhin alle Programme.
+        modul.schalte_led(EAModul.LED_GELB, 1)
+        modul.synchronisieren()
+        self.assertEqual(self.vermittler.leds, [0, 1, 0])
+        self.assertEqual(self.vermittler.fehlerhaft, 6)
+        modul.cleanup()
+
+    def test_verworfene_befehle(self):
+        modul = EntferntesEAModul(self.pfad)
+        ampel = EntferntesEAModul(self.pfad)
+        rot, gelb = [], []
+        modul.led_event_registrieren(EAModul.LED_ROT, rot.append)
+        modul.led_event_registrieren(EAModul.LED_GELB, gelb.append)
+
+        # Das EAModul des Vermittlers kann nicht dimmen.
+        modul.schalte_led(EAModul.LED_GELB, 0.5)
+        # Die belegte LED bleibt aus.
+        self.assertTrue(ampel.belegen(EAModul.LED_ROT))
+        modul.schalte_led(EAModul.LED_ROT, 1)
+        modul.schalte_led(EAModul.LED_GELB, 1)
+        modul.synchronisieren()
+
+        self.assertEqual((rot, gelb), ([], [1]))
+        self.assertEqual(modul.verworfen, 2)
+        self.assertEqual(self.vermittler.leds, [0, 1, 0])
+        ampel.cleanup()
+        modul.cleanup()
+
+    def test_anfrage_im_callback(self):
+        modul = EntferntesEAModul(self.pfad)
+        antworten = queue.Queue()
+        modul.taster_wechsel_registrieren(
+            0, lambda gedrueckt: antworten.put((
+                modul.taster_gedrueckt(0),
+                modul.belegen(EAModul.LED_ROT))))
+        modul.synchronisieren()
+
+        eapi.GPIODummy.flanke_ausloesen(self.eamodul._taster[0], True)
+        self.assertEqual(antworten.get(timeout=1), (True, True))
+        modul.synchronisieren()
+        modul.cleanup()
+
+    def test_abbruch_beim_verteilen(self):
+        roh = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        roh.connect(self.pfad)
+        roh.sendall(rahmen(bytes([BEFEHL_ABO])) + rahmen(bytes([BEFEHL_SYNC])))
+        roh.settimeout(1)
+        roh.recv(16)
+
+        # Der Vermittler wird beim Schalten angehalten, bis der Wechsel des
+        # Tasters vorgemerkt und die Verbindung geschlossen ist. Beides
+        # meldet dann derselbe Aufruf von select.
+        angehalten, weiter = threading.Event(), threading.Event()
+        self.eamodul.led_event_registrieren(
+            EAModul.LED_ROT, lambda wert: (angehalten.set(), weiter.wait(1)))
+        gemeldet = threading.Event()
+        self.eamodul.taster_wechsel_registrieren(
+            0, lambda gedrueckt: gemeldet.set())
+
+        modul = EntferntesEAModul(self.pfad)
+        modul.schalte_led(EAModul.LED_ROT, 1)
+        self.assertTrue(angehalten.wait(1))
+        eapi.GPIODummy.flanke_ausloesen(self.eamodul._taster[0], True)
+        self.assertTrue(gemeldet.wait(1))
+        roh.close()
+        weiter.set()
+
+        # Der Vermittler bedient weiterhin alle Programme.
+        modul.synchronisieren()
+        self.thread.join(0.2)
+        self.assertTrue(self.thread.is_alive())
+        modul.synchronisieren()
+        modul.cleanup()
+
+    def test_hinter_eamodulserver(self):
+        andere = EntferntesEAModul(self.pfad)
+        andere.schalte_led(EAModul.LED_GELB, 1)
+        andere.synchronisieren()
+
+        modul = EntferntesEAModul(self.pfad)
+        self.assertEqual(modul.led_wert(EAModul.LED_GELB), 1)
+        laufzeiten = modul.messung_einschalten()
+        easerver = EAModulServer("127.0.0.1", 0, eamodul=modul)
+        zustand = json.loads(
+            easerver.zustand_meldung()[len(ZUSTAND_MELDUNG):])
+        self.assertEqual(zustand["0"]["leds"], [0, 1, 0])
+
+        easerver.schalten(0, [1, None, 0], time.perf_counter())
+        modul.synchronisieren()
+        self.assertEqual(self.vermittler.leds, [1, 1, 0])
+        self.assertEqual(laufzeiten.schnappschuss()["operationen"]
+                         ["schalte_led"]["anzahl"], 2)
+        self.assertIn("laufzeiten", easerver.statistik)
+        easerver.server_close()
+
+        pfad = os.path.join(self.verzeichnis.name, "zustand")
+        modul.veroeffentlichen(pfad)
+        leser = ZustandLeser(pfad)
+        self.assertEqual(leser.lesen().leds, (1.0, 1.0, 0.0))
+        modul.schalte_led(EAModul.LED_ROT, 0)
+        modul.synchronisieren()
+        self.assertEqual(leser.lesen().leds, (0.0, 1.0, 0.0))
+        modul.messung_ausschalten()
+        self.assertIsNone(modul.laufzeiten)
+
+        modul.cleanup()
+        self.assertFalse(leser.lesen().offen)
+        leser.schliessen()
+        andere.cleanup()
+
+    def test_ein_vermittler_je_pfad(self):
+        with self.assertRaises(OSError):
+            EAModulVermittler(self.pfad, eamodul=self.eamodul)
+
+        # Eine verwaiste Socketdatei wird ersetzt.
+        pfad = os.path.join(self.verzeichnis.name, "verwaist.sock")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(pfad)
+        sock.close()
+        EAModulVermittler(pfad, eamodul=self.eamodul).server_close()
+        self.assertFalse(os.path.exists(pfad))
+
+
+class BenchmarkTest(unittest.TestCase):
+    """Testet die Laufzeitmessungen mit sehr wenigen Aufrufen."""
+
+    def test_alle_messungen(self):
+        ergebnisse = benchmark.ausfuehren(faktor=0.001, wiederholungen=1)
+        self.assertEqual(set(ergebnisse), set(benchmark.namen()))
+        for sekunden in ergebnisse.values():
+            self.assertGreater(sekunden, 0)
+
+        with self.assertRaises(ValueError):
+            benchmark.ausfuehren(["gibtsnicht"])
+
+    def test_basis(self):
+        with tempfile.TemporaryDirectory() as verzeichnis:
+            pfad = os.path.join(verzeichnis, "basis.json")
+            benchmark.basis_speichern(pfad, {"a": 1.0, "b": 2.0})
+            basis = benchmark.basis_laden(pfad)
+
+            self.assertEqual(benchmark.vergleichen(
+                {"a": 1.2, "b": 2.6, "c": 9.0}, basis, 0.25),
+                [("b", 2.0, 2.6)])
+
+            # Eine unerreichbar schnelle Basis muss gemeldet werden.
+            benchmark.basis_speichern(pfad, {"client/kodiere": 1e-15})
+            with contextlib.redirect_stdout(io.StringIO()), \
+                    contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(benchmark.main(
+                    ["client/kodiere", "--faktor", "0.01", "--basis", pfad]),
+                    1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,850 @@
+# -*- coding: utf-8 -*-
+
+"""Ein Vermittler, über den mehrere Programme auf demselben Pi gemeinsam ein
+EAModul verwenden.
+
+Die Pins eines Moduls können nur einem Prozess gehören, und cleanup() setzt
+sie für alle zurück. Der EAModulVermittler besitzt das Modul daher allein
+und bedient beliebig viele Programme über einen Unix Domain Socket:
+
+  $ python3 -m eapi.vermittler
+  $ python3 -m eapi.vermittler --pfad /run/eapi/eamodul.sock --dimmbar
+
+Die Programme verwenden statt eines EAModuls ein EntferntesEAModul. Es
+bietet dieselben Methoden, so dass bestehender Code nur die Klasse
+austauschen muss. cleanup() schließt dabei nur die eigene Verbindung; die
+Pins bleiben unberührt.
+
+  from eapi.vermittler import EntferntesEAModul as EAModul
+
+Befehle werden wie beim EAModulStreamServer (s. eapi.net) in Rahmen mit
+vorangestellter Länge übertragen und in der gesendeten Reihenfolge
+ausgeführt. Ein Programm muss nur auf Antworten warten, wenn es etwas
+wissen will (z.B. taster_gedrueckt). Mit stapel() werden mehrere Befehle in
+einem einzigen Aufruf von send übertragen. Wechsel der Taster meldet der
+Vermittler allen Programmen, die sich dafür registriert haben.
+
+Jeden Befehl an eine LED bestätigt der Vermittler dem sendenden Programm
+mit dem Wert, den die LED danach hat, und ob er geschaltet oder verworfen
+wurde. Erst mit der Bestätigung erfahren die Beobachter der LED im Programm
+von der Änderung; einen Wert, den die LED nie angenommen hat, sehen sie
+nicht.
+
+Eine LED kann mit belegen() für eine Verbindung reserviert werden. Solange
+sie belegt ist, werden Befehle anderer Programme für diese LED verworfen.
+Eine Belegung mit höherer Priorität verdrängt eine niedrigere; dem
+verdrängten Programm wird dies gemeldet. Belegungen enden mit freigeben()
+oder wenn die Verbindung geschlossen wird, z.B. weil das Programm
+abstürzt.
+
+>>> import os, tempfile, threading
+>>> from eapi.hw import EAModul
+>>> pfad = os.path.join(tempfile.mkdtemp(), "eamodul.sock")
+>>> vermittler = EAModulVermittler(pfad, eamodul=EAModul())
+>>> threading.Thread(target=vermittler.serve_forever).start()
+>>> anzeige = EntferntesEAModul(pfad)
+>>> ampel = EntferntesEAModul(pfad)
+>>> ampel.belegen(EAModul.LED_ROT, prioritaet=2)
+True
+>>> anzeige.belegen(EAModul.LED_ROT)
+False
+>>> with anzeige.stapel():
+...     anzeige.schalte_led(EAModul.LED_ROT, 1)
+...     anzeige.schalte_led(EAModul.LED_GRUEN, 1)
+>>> anzeige.synchronisieren()
+>>> vermittler.leds
+[0, 0, 1]
+>>> ampel.cleanup()
+>>> anzeige.cleanup()
+>>> vermittler.shutdown()
+>>> vermittler.server_close()
+"""
+
+import collections
+import contextlib
+import logging
+import math
+import os
+import queue
+import selectors
+import socket
+import struct
+import tempfile
+import threading
+import time
+from eapi.net import rahmen
+
+log = logging.getLogger(__name__)
+
+STANDARD_PFAD = os.path.join(tempfile.gettempdir(), "eapi-vermittler.sock")
+
+# Befehle der Programme an den Vermittler (erstes Byte eines Rahmens)
+BEFEHL_LED = 0x01
+BEFEHL_TASTER = 0x02
+BEFEHL_ABO = 0x03
+BEFEHL_BELEGEN = 0x04
+BEFEHL_FREIGEBEN = 0x05
+BEFEHL_SYNC = 0x06
+BEFEHL_LED_WERT = 0x07
+
+# Antworten auf Befehle, in der Reihenfolge der Befehle
+ANTWORT_TASTER = 0x82
+ANTWORT_BELEGEN = 0x84
+ANTWORT_SYNC = 0x86
+ANTWORT_LED_WERT = 0x87
+# Antwort auf eine Anfrage, die nicht ausgeführt werden konnte. Das zweite
+# Byte ist der abgelehnte Befehl.
+ANTWORT_FEHLER = 0x8F
+
+# Befehle, auf die der Vermittler immer antwortet
+ANFRAGEN = (BEFEHL_TASTER, BEFEHL_BELEGEN, BEFEHL_SYNC, BEFEHL_LED_WERT)
+
+# Ereignisse, die der Vermittler von sich aus sendet
+EREIGNIS_TASTER = 0x90
+EREIGNIS_ENTZOGEN = 0x91
+# Bestätigung eines Befehls an eine LED mit ihrem Wert danach und ob sie
+# geschaltet (True) oder der Befehl verworfen wurde (False)
+EREIGNIS_LED = 0x92
+
+LED = struct.Struct("!BBd")
+TASTER = struct.Struct("!BB?")
+TASTER_EREIGNIS = struct.Struct("!BBB?")
+LED_EREIGNIS = struct.Struct("!BBd?")
+
+# Ab dieser Menge nicht abgeholter Daten werden einer Verbindung keine
+# Ereignisse mehr gesendet.
+SENDEPUFFER_MAX = 64 * 1024
+
+
+def _rahmen_lesen(eingang):
+    """Entfernt alle vollständigen Rahmen aus dem eingang (bytearray) und gibt
+    ihre Nutzdaten zurück."""
+    rahmen_liste = []
+    position = 0
+    while len(eingang) - position >= 2:
+        laenge = int.from_bytes(eingang[position:position + 2], "big")
+        ende = position + 2 + laenge
+        if len(eingang) < ende:
+            break
+        rahmen_liste.append(bytes(eingang[position + 2:ende]))
+        position = ende
+    del eingang[:position]
+    return rahmen_liste
+
+
+class _Verbindung:
+    """Zustand einer Verbindung zum EAModulVermittler."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.eingang = bytearray()
+        self.ausgang = bytearray()
+        self.abonniert = False
+
+
+class EAModulVermittler:
+    """Besitzt die Pins eines EAModuls und bedient mehrere Programme über
+    einen Unix Domain Socket.
+
+    Die Schnittstelle zum Starten und Beenden entspricht der der Server aus
+    eapi.net: serve_forever(), shutdown() und server_close(). Alle
+    Verbindungen werden in einem Thread über einen Selektor bedient.
+    """
+
+    def __init__(self, pfad=None, eamodul=None, entprellzeit=20):
+        """Lauscht unter pfad (Standard: STANDARD_PFAD) und steuert das
+        eamodul (Standard: ein neues EAModul) an. Wechsel der Taster werden
+        mit der entprellzeit in Millisekunden erkannt.
+
+        Läuft unter dem Pfad bereits ein Vermittler, wird ein OSError
+        ausgelöst. Eine verwaiste Socketdatei wird entfernt.
+        """
+        from eapi.hw import EAModul
+
+        self.pfad = pfad or STANDARD_PFAD
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.__verwaisten_socket_entfernen()
+            self.socket.bind(self.pfad)
+            self.socket.listen()
+        except OSError:
+            self.socket.close()
+            raise
+        self.socket.setblocking(False)
+
+        self.eamodul = eamodul if eamodul is not None else EAModul()
+        # Zuletzt geschaltete Werte der LEDs, zu Beginn die Werte der Pins
+        self.leds = [self.eamodul.led_wert(farbe) for farbe in range(3)]
+        # LED-Farbe -> (Verbindung, Priorität)
+        self.belegungen = {}
+        self.verworfen = 0
+        self.fehlerhaft = 0
+
+        self.__selektor = selectors.DefaultSelector()
+        self.__selektor.register(self.socket, selectors.EVENT_READ)
+        self.__verbindungen = {}
+
+        # Wechsel der Taster kommen aus dem Thread der GPIO-Bibliothek und
+        # werden über das Socketpaar an die serve_forever-Schleife übergeben.
+        self.__ereignisse = collections.deque()
+        self.__wecker_lesen, self.__wecker_schreiben = socket.socketpair()
+        self.__wecker_lesen.setblocking(False)
+        self.__selektor.register(self.__wecker_lesen, selectors.EVENT_READ)
+        self.__beenden = False
+        self.__beendet = threading.Event()
+
+        for nr in range(2):
+            self.eamodul.taster_wechsel_registrieren(
+                nr, lambda gedrueckt, nr=nr: self.__taster_gewechselt(
+                    nr, gedrueckt), entprellzeit)
+
+    def __verwaisten_socket_entfernen(self):
+        if not os.path.exists(self.pfad):
+            return
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.pfad)
+            except ConnectionRefusedError:
+                os.unlink(self.pfad)
+                return
+
+        raise OSError("Unter {p} läuft bereits ein Vermittler.".format(
+            p=self.pfad))
+
+    def serve_forever(self):
+        """Bedient alle Verbindungen, bis shutdown() aufgerufen wird."""
+        self.__beendet.clear()
+        try:
+            while not self.__beenden:
+                for schluessel, ereignisse in self.__selektor.select():
+                    sock = schluessel.fileobj
+                    if sock is self.socket:
+                        self.__annehmen()
+                    elif sock is self.__wecker_lesen:
+                        self.__wecker_lesen.recv(64)
+                        self.__ereignisse_verteilen()
+                    else:
+                        # Die Verbindung kann bereits von einem früheren
+                        # Ereignis desselben Aufrufs geschlossen worden sein,
+                        # z.B. beim Verteilen eines Tasterwechsels.
+                        verbindung = self.__verbindungen.get(sock)
+                        if verbindung is None:
+                            continue
+                        if ereignisse & selectors.EVENT_WRITE:
+                            self.__schreiben(verbindung)
+                        if (ereignisse & selectors.EVENT_READ and
+                                sock in self.__verbindungen):
+                            self.__lesen(verbindung)
+        finally:
+            self.__beenden = False
+            self.__beendet.set()
+
+    def shutdown(self):
+        """Beendet serve_forever und wartet, bis die Schleife verlassen
+        wurde."""
+        self.__beenden = True
+        self.__wecker_schreiben.send(b"x")
+        self.__beendet.wait()
+
+    def server_close(self):
+        """Schließt alle Verbindungen und den Socket. Die Pins des Moduls
+        werden nicht zurückgesetzt."""
+        for verbindung in list(self.__verbindungen.values()):
+            self.__schliessen(verbindung)
+        self.__selektor.close()
+        self.socket.close()
+        self.__wecker_lesen.close()
+        self.__wecker_schreiben.close()
+        if os.path.exists(self.pfad):
+            os.unlink(self.pfad)
+
+    def __annehmen(self):
+        try:
+            sock, _ = self.socket.accept()
+        except BlockingIOError:
+            return
+
+        sock.setblocking(False)
+        self.__verbindungen[sock] = _Verbindung(sock)
+        self.__selektor.register(sock, selectors.EVENT_READ)
+
+    def __lesen(self, verbindung):
+        try:
+            daten = verbindung.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            daten = b""
+
+        if not daten:
+            self.__schliessen(verbindung)
+            return
+
+        verbindung.eingang += daten
+        for nutzdaten in _rahmen_lesen(verbindung.eingang):
+            try:
+                self.__bearbeiten(verbindung, nutzdaten)
+            except Exception as e:
+                # Kein Befehl darf die Schleife beenden, die alle Programme
+                # bedient.
+                log.warning("Fehlerhafter Befehl %r: %s", nutzdaten, e)
+                self.fehlerhaft += 1
+                if nutzdaten and nutzdaten[0] in ANFRAGEN:
+                    # Der Client wartet auf eine Antwort.
+                    verbindung.ausgang += rahmen(bytes([ANTWORT_FEHLER,
+                                                        nutzdaten[0]]))
+
+        if verbindung.ausgang:
+            self.__schreiben(verbindung)
+
+    def __bearbeiten(self, verbindung, nutzdaten):
+        befehl = nutzdaten[0]
+        if befehl == BEFEHL_LED:
+            _, farbe, wert = LED.unpack(nutzdaten)
+            geschaltet = self.__led_schalten(verbindung, farbe, wert)
+            verbindung.ausgang += rahmen(LED_EREIGNIS.pack(
+                EREIGNIS_LED, farbe, self.leds[farbe], geschaltet))
+
+        elif befehl == BEFEHL_TASTER:
+            nr = nutzdaten[1]
+            verbindung.ausgang += rahmen(TASTER.pack(
+                ANTWORT_TASTER, nr, self.eamodul.taster_gedrueckt(nr)))
+
+        elif befehl == BEFEHL_ABO:
+            verbindung.abonniert = True
+
+        elif befehl == BEFEHL_BELEGEN:
+            farbe, prioritaet = nutzdaten[1], nutzdaten[2]
+            erteilt = self.__belegen(verbindung, farbe, prioritaet)
+            verbindung.ausgang += rahmen(bytes([ANTWORT_BELEGEN, farbe,
+                                                erteilt]))
+
+        elif befehl == BEFEHL_FREIGEBEN:
+            belegung = self.belegungen.get(nutzdaten[1])
+            if belegung is not None and belegung[0] is verbindung:
+                del self.belegungen[nutzdaten[1]]
+
+        elif befehl == BEFEHL_SYNC:
+            verbindung.ausgang += rahmen(bytes([ANTWORT_SYNC]))
+
+        elif befehl == BEFEHL_LED_WERT:
+            farbe = nutzdaten[1]
+            if not 0 <= farbe < len(self.leds):
+                raise ValueError("Falsche LED-Farbe.")
+            verbindung.ausgang += rahmen(LED.pack(ANTWORT_LED_WERT, farbe,
+                                                  self.leds[farbe]))
+
+        else:
+            raise ValueError("Unbekannter Befehl: " + str(befehl))
+
+    def __led_schalten(self, verbindung, farbe, wert):
+        """Schaltet die LED und gibt zurück, ob sie geschaltet wurde."""
+        if not 0 <= farbe < len(self.leds):
+            raise ValueError("Falsche LED-Farbe.")
+
+        belegung = self.belegungen.get(farbe)
+        if belegung is not None and belegung[0] is not verbindung:
+            self.verworfen += 1
+            return False
+
+        try:
+            if not (math.isfinite(wert) and 0 <= wert <= 1):
+                raise ValueError(
+                    "Wert für an_aus muss zwischen 0 und 1 liegen.")
+            # Ganze Werte werden als int geschaltet, da RPi.GPIO keine
+            # Kommazahlen als Pegel annimmt.
+            if wert == int(wert):
+                wert = int(wert)
+            # Ein EAModul ohne Dimmen lehnt z.B. 0.5 ab.
+            self.eamodul.schalte_led(farbe, wert)
+        except ValueError as e:
+            log.warning("LED %s nicht geschaltet: %s", farbe, e)
+            self.fehlerhaft += 1
+            return False
+
+        self.leds[farbe] = wert
+        return True
+
+    def __belegen(self, verbindung, farbe, prioritaet):
+        if not 0 <= farbe < len(self.leds):
+            raise ValueError("Falsche LED-Farbe.")
+
+        belegung = self.belegungen.get(farbe)
+        if belegung is not None and belegung[0] is not verbindung:
+            if prioritaet <= belegung[1]:
+                return False
+            self.__senden(belegung[0],
+                          rahmen(bytes([EREIGNIS_ENTZOGEN, farbe])))
+
+        self.belegungen[farbe] = (verbindung, prioritaet)
+        return True
+
+    def __taster_gewechselt(self, nr, gedrueckt):
+        self.__ereignisse.append(rahmen(TASTER_EREIGNIS.pack(
+            EREIGNIS_TASTER, nr, self.eamodul._taster[nr], gedrueckt)))
+        try:
+            self.__wecker_schreiben.send(b"x")
+        except OSError:
+            # Der Vermittler wurde bereits geschlossen.
+            pass
+
+    def __ereignisse_verteilen(self):
+        while self.__ereignisse:
+            ereignis = self.__ereignisse.popleft()
+            for verbindung in list(self.__verbindungen.values()):
+                if verbindung.abonniert:
+                    self.__senden(verbindung, ereignis)
+
+    def __senden(self, verbindung, daten):
+        """Sendet ein Ereignis, sofern die Verbindung ihre Daten abholt."""
+        if len(verbindung.ausgang) < SENDEPUFFER_MAX:
+            verbindung.ausgang += daten
+            self.__schreiben(verbindung)
+
+    def __schreiben(self, verbindung):
+        try:
+            gesendet = verbindung.sock.send(verbindung.ausgang)
+        except (BlockingIOError, InterruptedError):
+            gesendet = 0
+        except OSError:
+            self.__schliessen(verbindung)
+            return
+        del verbindung.ausgang[:gesendet]
+
+        ereignisse = selectors.EVENT_READ
+        if verbindung.ausgang:
+            ereignisse |= selectors.EVENT_WRITE
+        self.__selektor.modify(verbindung.sock, ereignisse)
+
+    def __schliessen(self, verbindung):
+        if verbindung.sock not in self.__verbindungen:
+            return
+
+        # Belegungen enden mit der Verbindung.
+        for farbe, belegung in list(self.belegungen.items()):
+            if belegung[0] is verbindung:
+                del self.belegungen[farbe]
+
+        self.__selektor.unregister(verbindung.sock)
+        del self.__verbindungen[verbindung.sock]
+        verbindung.sock.close()
+
+
+class EntferntesEAModul:
+    """Ein EAModul, dessen Pins einem EAModulVermittler gehören.
+
+    Die Methoden entsprechen denen der Klasse EAModul, so dass es z.B. auch
+    hinter einem EAModulServer verwendet werden kann. Befehle an die LEDs
+    werden gesendet, ohne auf eine Antwort zu warten; Fehler in den
+    Argumenten werden wie beim EAModul sofort als ValueError gemeldet.
+
+    Beobachter der LEDs werden über die Änderungen dieses Objekts erst
+    informiert, wenn der Vermittler sie bestätigt hat. Verwirft er einen
+    Befehl, weil die LED belegt ist oder sein Modul den Wert nicht annimmt
+    (z.B. 0.5 ohne Dimmen), erfahren die Beobachter nichts davon; der Befehl
+    wird in verworfen gezählt. Kehrt eine Anfrage wie synchronisieren()
+    zurück, sind alle vorher gesendeten Befehle gemeldet.
+
+    Callbacks für Taster und Beobachter der LEDs werden in einem eigenen
+    Thread aufgerufen, nicht in dem, der die Antworten des Vermittlers
+    liest. Sie können daher wie beim EAModul selbst Anfragen wie
+    taster_gedrueckt() stellen.
+    """
+
+    LED_ROT = 0
+    LED_GELB = 1
+    LED_GRUEN = 2
+
+    GEMESSENE_METHODEN = ("schalte_led", "schalte_leds", "taster_gedrueckt",
+                          "_notify_leds")
+
+    def __init__(self, pfad=None):
+        """Verbindet sich mit dem Vermittler unter pfad (Standard:
+        STANDARD_PFAD)."""
+        self.pfad = pfad or STANDARD_PFAD
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(self.pfad)
+        except OSError:
+            self.sock.close()
+            raise
+
+        # Belegte LEDs dieser Verbindung
+        self.belegt = set()
+        # Vom Vermittler verworfene Befehle an die LEDs
+        self.verworfen = 0
+        self.laufzeiten = None
+        self.__zustand = None
+        self.__observer_leds = {farbe: [] for farbe in range(3)}
+        self.__observer_taster = {nr: [] for nr in range(2)}
+        self.__abonniert = False
+        self.__stapel = None
+        # Warteschlangen für die erwarteten Antworten, in der Reihenfolge
+        # der Befehle
+        self.__antworten = collections.deque()
+        self.__sperre = threading.Lock()
+        self.__geschlossen = False
+        # Wechsel der Taster, die der Verteiler an die Callbacks übergibt
+        self.__ereignisse = queue.Queue()
+        self.__verteiler = threading.Thread(target=self.__verteilen,
+                                            daemon=True)
+        self.__verteiler.start()
+        self.__leser = threading.Thread(target=self.__lesen, daemon=True)
+        self.__leser.start()
+
+    def __senden(self, daten, antwort=False):
+        """Sendet die daten oder legt sie in den aktuellen Stapel. Wird eine
+        antwort erwartet, wird der Stapel mitgesendet und eine Warteschlange
+        für die Antwort zurückgegeben."""
+        with self.__sperre:
+            if self.__geschlossen:
+                raise ConnectionError("Verbindung zum Vermittler geschlossen.")
+
+            if self.__stapel is not None:
+                self.__stapel += daten
+                if not antwort:
+                    return None
+                daten, self.__stapel = bytes(self.__stapel), bytearray()
+
+            warteschlange = None
+            if antwort:
+                warteschlange = queue.Queue(maxsize=1)
+                self.__antworten.append(warteschlange)
+            self.sock.sendall(daten)
+            return warteschlange
+
+    def __anfragen(self, daten):
+        """Sendet eine Anfrage und wartet auf ihre Antwort. Lehnt der
+        Vermittler sie ab, wird ein ValueError ausgelöst."""
+        ergebnis = self.__senden(daten, antwort=True).get()
+        if ergebnis is None:
+            raise ConnectionError("Verbindung zum Vermittler geschlossen.")
+        antwort, verteilt = ergebnis
+        # Ereignisse vor der Antwort sollen gemeldet sein. Im Verteiler
+        # selbst kann darauf nicht gewartet werden.
+        if threading.current_thread() is not self.__verteiler:
+            verteilt.wait()
+        if antwort[0] == ANTWORT_FEHLER:
+            raise ValueError("Der Vermittler hat den Befehl abgelehnt.")
+        return antwort
+
+    def __lesen(self):
+        eingang = bytearray()
+        while True:
+            try:
+                daten = self.sock.recv(65536)
+            except OSError:
+                daten = b""
+            if not daten:
+                break
+
+            eingang += daten
+            for nutzdaten in _rahmen_lesen(eingang):
+                if nutzdaten[0] == EREIGNIS_ENTZOGEN:
+                    self.belegt.discard(nutzdaten[1])
+                    log.info("Belegung der LED %s entzogen", nutzdaten[1])
+                elif nutzdaten[0] in (EREIGNIS_TASTER, EREIGNIS_LED):
+                    self.__ereignisse.put(nutzdaten)
+                else:
+                    verteilt = threading.Event()
+                    self.__ereignisse.put(verteilt)
+                    self.__antworten.popleft().put((nutzdaten, verteilt))
+
+        with self.__sperre:
+            self.__geschlossen = True
+            while self.__antworten:
+                self.__antworten.popleft().put(None)
+        self.__ereignisse.put(None)
+
+    def __verteilen(self):
+        while True:
+            nutzdaten = self.__ereignisse.get()
+            if nutzdaten is None:
+                return
+            if isinstance(nutzdaten, threading.Event):
+                nutzdaten.set()
+            elif nutzdaten[0] == EREIGNIS_TASTER:
+                self.__taster_melden(*TASTER_EREIGNIS.unpack(nutzdaten)[1:])
+            else:
+                self.__led_melden(*LED_EREIGNIS.unpack(nutzdaten)[1:])
+
+    def __led_melden(self, farbe, wert, geschaltet):
+        if not geschaltet:
+            self.verworfen += 1
+            log.info("Befehl an LED %s verworfen", farbe)
+            return
+
+        try:
+            self._notify_leds(farbe, int(wert) if wert == int(wert) else wert)
+        except Exception:
+            log.exception("Fehler in einem Beobachter der LED %s", farbe)
+
+    def __taster_melden(self, nr, pin, gedrueckt):
+        for methode, mit_pin in list(self.__observer_taster[nr]):
+            try:
+                if not mit_pin:
+                    methode(gedrueckt)
+                elif gedrueckt:
+                    methode(pin)
+            except Exception:
+                log.exception("Fehler im Callback für Taster %s", nr)
+
+    @contextlib.contextmanager
+    def stapel(self):
+        """Sammelt alle Befehle innerhalb eines with-Blocks und sendet sie am
+        Ende gemeinsam.
+
+          with modul.stapel():
+              modul.schalte_led(EntferntesEAModul.LED_ROT, 1)
+              modul.schalte_led(EntferntesEAModul.LED_GELB, 0)
+        """
+        with self.__sperre:
+            verschachtelt = self.__stapel is not None
+            if not verschachtelt:
+                self.__stapel = bytearray()
+        try:
+            yield self
+        finally:
+            if not verschachtelt:
+                with self.__sperre:
+                    daten, self.__stapel = bytes(self.__stapel), None
+                    if daten and not self.__geschlossen:
+                        self.sock.sendall(daten)
+
+    def synchronisieren(self):
+        """Wartet, bis der Vermittler alle bisher gesendeten Befehle
+        ausgeführt hat."""
+        self.__anfragen(rahmen(bytes([BEFEHL_SYNC])))
+
+    def led_event_registrieren(self, led_farbe, methode, zuerst=False):
+        """Registriert eine Methode, die ausgeführt wird, sobald der
+        Vermittler das Schalten der LED über dieses Objekt bestätigt hat. Mit
+        zuerst=True wird sie vor allen bisher registrierten Methoden
+        aufgerufen."""
+        if zuerst:
+            self.__observer_leds[led_farbe].insert(0, methode)
+        else:
+            self.__observer_leds[led_farbe].append(methode)
+
+    def _notify_leds(self, led_farbe, neuer_wert):
+        for methode in self.__observer_leds[led_farbe]:
+            methode(neuer_wert)
+
+    def _notify_leds_gemessen(self, led_farbe, neuer_wert):
+        laufzeiten = self.laufzeiten
+        uhr = time.perf_counter
+        start = uhr()
+        for methode in self.__observer_leds[led_farbe]:
+            beginn = uhr()
+            methode(neuer_wert)
+            laufzeiten.beobachter_erfassen(led_farbe, methode, uhr() - beginn)
+        laufzeiten.erfassen("beobachter", uhr() - start)
+
+    def messung_einschalten(self, laufzeiten=None):
+        """Schaltet die Laufzeitmessung wie beim EAModul ein und gibt die
+        Laufzeiten zurück. Gemessen werden die Aufrufe einschließlich der
+        Übertragung zum Vermittler, nicht aber die Pins selbst."""
+        from eapi.hw import Laufzeiten
+
+        self.laufzeiten = laufzeiten if laufzeiten is not None else \
+            Laufzeiten()
+        for name in self.GEMESSENE_METHODEN:
+            setattr(self, name, getattr(self, "_" + name.lstrip("_") +
+                                        "_gemessen"))
+        return self.laufzeiten
+
+    def messung_ausschalten(self):
+        """Schaltet die Laufzeitmessung aus. Die bisherigen Laufzeiten
+        bleiben erhalten."""
+        for name in self.GEMESSENE_METHODEN:
+            self.__dict__.pop(name, None)
+        self.laufzeiten = None
+
+    def taster_gedrueckt(self, num=0):
+        """Fragt den Vermittler, ob der Taster mit der Nummer num gedrückt
+        ist."""
+        if not 0 <= num < 2:
+            raise ValueError(
+                "Falsche Tasternummer. Muss zwischen 0 und 1 liegen.")
+
+        return TASTER.unpack(self.__anfragen(
+            rahmen(bytes([BEFEHL_TASTER, num]))))[2]
+
+    def _taster_gedrueckt_gemessen(self, num=0):
+        start = time.perf_counter()
+        gedrueckt = EntferntesEAModul.taster_gedrueckt(self, num)
+        self.laufzeiten.erfassen("taster_gedrueckt",
+                                 time.perf_counter() - start)
+        return gedrueckt
+
+    def led_wert(self, led_farbe):
+        """Fragt den Vermittler nach dem zuletzt geschalteten Wert der LED,
+        unabhängig davon, welches Programm sie geschaltet hat."""
+        if not 0 <= led_farbe < 3:
+            raise ValueError("Falsche LED-Farbe.")
+
+        wert = LED.unpack(self.__anfragen(
+            rahmen(bytes([BEFEHL_LED_WERT, led_farbe]))))[2]
+        return int(wert) if wert == int(wert) else wert
+
+    def schalte_led(self, led_farbe, an_aus):
+        """Schaltet die LED ein (1) oder aus (0). Verwaltet der Vermittler
+        ein DimmbaresEAModul, sind auch Werte dazwischen möglich. Ist die LED
+        von einem anderen Programm belegt oder nimmt das Modul den Wert nicht
+        an, verwirft der Vermittler den Befehl."""
+        if not 0 <= led_farbe < 3:
+            raise ValueError("Falsche LED-Farbe.")
+        if not 0 <= an_aus <= 1:
+            raise ValueError("Wert für an_aus muss zwischen 0 und 1 liegen.")
+
+        self.__senden(rahmen(LED.pack(BEFEHL_LED, led_farbe, an_aus)))
+
+    def _schalte_led_gemessen(self, led_farbe, an_aus):
+        start = time.perf_counter()
+        EntferntesEAModul.schalte_led(self, led_farbe, an_aus)
+        self.laufzeiten.erfassen("schalte_led", time.perf_counter() - start)
+
+    def schalte_leds(self, rot_anaus, gelb_anaus, gruen_anaus):
+        """Schaltet alle drei LEDs mit einem gemeinsamen Senden."""
+        with self.stapel():
+            self.schalte_led(self.LED_ROT, rot_anaus)
+            self.schalte_led(self.LED_GELB, gelb_anaus)
+            self.schalte_led(self.LED_GRUEN, gruen_anaus)
+
+    def _schalte_leds_gemessen(self, rot_anaus, gelb_anaus, gruen_anaus):
+        start = time.perf_counter()
+        EntferntesEAModul.schalte_leds(self, rot_anaus, gelb_anaus,
+                                       gruen_anaus)
+        self.laufzeiten.erfassen("schalte_leds", time.perf_counter() - start)
+
+    def __taster_registrieren(self, taster_nr, methode, mit_pin):
+        if not 0 <= taster_nr < 2:
+            raise ValueError("Falsche Taster Nummer: " + str(taster_nr))
+
+        self.__observer_taster[taster_nr].append((methode, mit_pin))
+        if not self.__abonniert:
+            self.__abonniert = True
+            self.__senden(rahmen(bytes([BEFEHL_ABO])))
+
+    def taster_event_registrieren(self, taster_nr, methode):
+        """Registriert eine Methode, die beim Drücken des Tasters mit der
+        Pin-Nummer des Tasters aufgerufen wird."""
+        self.__taster_registrieren(taster_nr, methode, True)
+
+    def taster_wechsel_registrieren(self, taster_nr, methode,
+                                    entprellzeit=20):
+        """Registriert eine Methode, die beim Drücken (True) und Loslassen
+        (False) des Tasters aufgerufen wird. Die entprellzeit legt der
+        Vermittler für alle Programme fest; der Parameter wird nur aus
+        Gründen der Kompatibilität angenommen."""
+        self.__taster_registrieren(taster_nr, methode, False)
+
+    def belegen(self, led_farbe, prioritaet=1):
+        """Belegt die LED für diese Verbindung. Gibt zurück, ob die Belegung
+        erteilt wurde. Sie wird verweigert, wenn ein anderes Programm die LED
+        mit gleicher oder höherer Priorität (0 bis 255) belegt hat."""
+        if not 0 <= led_farbe < 3:
+            raise ValueError("Falsche LED-Farbe.")
+        if not 0 <= prioritaet <= 255:
+            raise ValueError("Die Priorität muss zwischen 0 und 255 liegen.")
+
+        erteilt = bool(self.__anfragen(rahmen(bytes(
+            [BEFEHL_BELEGEN, led_farbe, prioritaet])))[2])
+        if erteilt:
+            self.belegt.add(led_farbe)
+        return erteilt
+
+    def freigeben(self, led_farbe):
+        """Gibt eine belegte LED wieder frei."""
+        self.belegt.discard(led_farbe)
+        self.__senden(rahmen(bytes([BEFEHL_FREIGEBEN, led_farbe])))
+
+    def veroeffentlichen(self, pfad=None):
+        """Veröffentlicht die LEDs und Taster wie EAModul.veroeffentlichen in
+        einem Zustandsblock und gibt dessen Pfad zurück. Die LEDs zeigen die
+        Werte, die über dieses Objekt geschaltet wurden, ausgehend von den
+        Werten des Vermittlers. Mit cleanup endet die Veröffentlichung."""
+        from eapi.zustand import ZustandSchreiber
+
+        if self.__zustand is not None:
+            raise ValueError("Der Zustand wird bereits veröffentlicht.")
+
+        zustand = self.__zustand = ZustandSchreiber(pfad)
+        for farbe in range(3):
+            zustand.led_setzen(farbe, self.led_wert(farbe))
+            self.led_event_registrieren(
+                farbe, lambda wert, farbe=farbe: zustand.led_setzen(farbe,
+                                                                    wert))
+        for nr in range(2):
+            self.taster_wechsel_registrieren(
+                nr, lambda gedrueckt, nr=nr: zustand.taster_setzen(nr,
+                                                                   gedrueckt))
+            zustand.taster_setzen(nr, self.taster_gedrueckt(nr))
+
+        return zustand.pfad
+
+    def cleanup(self):
+        """Schließt die Verbindung zum Vermittler. Belegungen enden damit;
+        die Pins werden nicht zurückgesetzt."""
+        with self.__sperre:
+            if self.__geschlossen:
+                return
+            self.__geschlossen = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__leser.join()
+        # Aus einem Callback heraus kann der Verteiler nicht auf sich selbst
+        # warten.
+        if threading.current_thread() is not self.__verteiler:
+            self.__verteiler.join()
+        self.sock.close()
+        if self.__zustand is not None:
+            self.__zustand.schliessen()
+            self.__zustand = None
+
+
+def main(argumente=None):
+    """Startet den Vermittler und beendet ihn bei SIGTERM oder Strg+C."""
+    import argparse
+    import signal
+    from eapi.daemon import systemd_melden
+    from eapi.hw import EAModul, DimmbaresEAModul
+
+    parser = argparse.ArgumentParser(
+        prog="python3 -m eapi.vermittler",
+        description="Teilt ein EAModul zwischen mehreren Programmen.")
+    parser.add_argument("--pfad", default=STANDARD_PFAD,
+                        help="Pfad des Sockets (Standard: %(default)s)")
+    parser.add_argument("--dimmbar", action="store_true",
+                        help="Ein DimmbaresEAModul verwenden")
+    parser.add_argument("--entprellzeit", type=int, default=20,
+                        help="Entprellzeit der Taster in Millisekunden")
+    parser.add_argument("--warm", action="store_true",
+                        help="Eingerichtete Pins und LED-Pegel übernehmen und "
+                        "beim Beenden stehen lassen")
+    args = parser.parse_args(argumente)
+
+    logging.basicConfig(level=logging.INFO)
+    klasse = DimmbaresEAModul if args.dimmbar else EAModul
+    eamodul = klasse(warm=args.warm)
+    vermittler = EAModulVermittler(args.pfad, eamodul, args.entprellzeit)
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+        target=vermittler.shutdown).start())
+
+    systemd_melden("READY=1")
+    log.info("Vermittler bereit unter %s", args.pfad)
+    try:
+        vermittler.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        systemd_melden("STOPPING=1")
+        vermittler.server_close()
+        eamodul.cleanup()
+
+
+if __name__ == "__main__":
+    main()
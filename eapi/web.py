@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+"""Ein Modul, das ein EAModul über HTTP im Browser anzeigt und steuert.
+
+Der EAModulWebServer benötigt weder eine grafische Oberfläche noch ein
+Terminal und ist daher für Pis ohne Bildschirm gedacht. Er verwendet nur
+die Standardbibliothek.
+
+  python3 -m eapi.web 8080
+
+Anschließend zeigt http://<pi>:8080/ die LEDs und die Anzahl der
+Tastendrücke an. Folgende Pfade stehen zur Verfügung:
+
+  GET  /            Eine kleine HTML-Seite zum Anzeigen und Schalten.
+  GET  /zustand     Der aktuelle Zustand als JSON.
+  GET  /ereignisse  Zustandsänderungen als Server-Sent Events.
+  POST /leds        Schaltet die LEDs. Erwartet wird ein JSON-Objekt wie
+                    {"rot": 1, "gruen": 0.5} oder eine Liste solcher
+                    Objekte, die nacheinander geschaltet werden. Mit
+                    "dauer" wird nach einem Objekt die angegebene Zahl an
+                    Sekunden gewartet.
+
+Der Zustand stammt ausschließlich aus den Ereignissen des EAModuls; die
+Betrachter lesen nie selbst GPIO-Pins. Änderungen werden gesammelt und
+höchstens alle 'intervall' Sekunden einmal serialisiert. Die fertige
+Nachricht wird an alle Betrachter gesendet, so dass viele geöffnete
+Browser kaum mehr kosten als einer.
+
+>>> from eapi.hw import EAModul
+>>> import json, urllib.request
+>>> ea = EAModul()
+>>> webserver = EAModulWebServer("127.0.0.1", 0, eamodul=ea)
+>>> threading.Thread(target=webserver.serve_forever).start()
+>>> url = "http://127.0.0.1:{p}".format(p=webserver.server_address[1])
+>>> anfrage = urllib.request.Request(url + "/leds", method="POST",
+...                                  data=b'{"rot": 1, "gelb": 0}')
+>>> json.load(urllib.request.urlopen(anfrage))["rot"]
+1
+>>> webserver.shutdown()
+>>> webserver.server_close()
+>>> ea.cleanup()
+"""
+
+import http.server
+import json
+import logging
+import threading
+import time
+from eapi.hw import EAModul
+
+log = logging.getLogger(__name__)
+
+LED_NAMEN = {EAModul.LED_ROT: "rot", EAModul.LED_GELB: "gelb",
+             EAModul.LED_GRUEN: "gruen"}
+
+# Größte Anfrage, die an /leds gesendet werden darf
+MAX_ANFRAGE = 64 * 1024
+
+
+class Verteiler:
+    """Verteilt den Zustand eines EAModuls an beliebig viele Betrachter.
+
+    Änderungen werden gesammelt und von einem Thread höchstens alle
+    intervall Sekunden als Server-Sent Event serialisiert. Alle Betrachter
+    warten mit warten() auf eine neue Version und erhalten dieselbe
+    Nachricht.
+
+    >>> verteiler = Verteiler(intervall=0)
+    >>> verteiler.aktualisieren("rot", 1)
+    >>> verteiler.warten(0, timeout=1)
+    (1, b'data: {"rot": 1}\\n\\n')
+    >>> verteiler.schliessen()
+    """
+
+    def __init__(self, intervall=0.05):
+        self.intervall = intervall
+        # Anzahl der serialisierten Nachrichten
+        self.nachrichten = 0
+        self.__zustand = {}
+        self.__nachricht = b""
+        self.__version = 0
+        self.__geschlossen = False
+        self.__bedingung = threading.Condition()
+        self.__geaendert = threading.Event()
+        threading.Thread(target=self.__verteilen, daemon=True).start()
+
+    def aktualisieren(self, schluessel, wert):
+        """Ändert einen Wert des Zustands."""
+        with self.__bedingung:
+            self.__zustand[schluessel] = wert
+        self.__geaendert.set()
+
+    def zustand(self):
+        """Gibt eine Kopie des aktuellen Zustands zurück."""
+        with self.__bedingung:
+            return dict(self.__zustand)
+
+    def warten(self, version, timeout=None):
+        """Wartet, bis eine neuere Version als die gegebene vorliegt, und gibt
+        (version, nachricht) zurück. Nach Ablauf des timeout oder nach
+        schliessen() ist die Nachricht None."""
+        with self.__bedingung:
+            self.__bedingung.wait_for(
+                lambda: self.__version != version or self.__geschlossen,
+                timeout)
+            if self.__geschlossen or self.__version == version:
+                return version, None
+            return self.__version, self.__nachricht
+
+    def schliessen(self):
+        """Beendet den Thread und gibt alle wartenden Betrachter frei."""
+        with self.__bedingung:
+            self.__geschlossen = True
+            self.__bedingung.notify_all()
+        self.__geaendert.set()
+
+    def __verteilen(self):
+        while True:
+            self.__geaendert.wait()
+            time.sleep(self.intervall)
+            self.__geaendert.clear()
+
+            with self.__bedingung:
+                if self.__geschlossen:
+                    return
+                self.__nachricht = ("data: " + json.dumps(self.__zustand) +
+                                    "\n\n").encode()
+                self.__version += 1
+                self.nachrichten += 1
+                self.__bedingung.notify_all()
+
+
+class EAModulWebHandler(http.server.BaseHTTPRequestHandler):
+    """Bearbeitet die HTTP-Anfragen des EAModulWebServers."""
+
+    server_version = "eapi"
+
+    def do_GET(self):
+        if self.path == "/":
+            self.__antworten(200, "text/html; charset=utf-8",
+                             HTML_SEITE.encode())
+        elif self.path == "/zustand":
+            self.__antworten_json(200, self.server.verteiler.zustand())
+        elif self.path == "/ereignisse":
+            self.__ereignisse_senden()
+        else:
+            self.__antworten_json(404, {"fehler": "Unbekannter Pfad."})
+
+    def do_POST(self):
+        if self.path != "/leds":
+            self.__antworten_json(404, {"fehler": "Unbekannter Pfad."})
+            return
+
+        try:
+            laenge = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            laenge = -1
+        # Der Rumpf wird in beiden Fällen nicht gelesen, daher kann die
+        # Verbindung nicht für weitere Anfragen verwendet werden.
+        if laenge < 0:
+            self.close_connection = True
+            self.__antworten_json(400, {"fehler": "Ungültige Länge."})
+            return
+        if laenge > MAX_ANFRAGE:
+            self.close_connection = True
+            self.__antworten_json(413, {"fehler": "Anfrage zu groß."})
+            return
+
+        try:
+            frames = json.loads(self.rfile.read(laenge))
+            if isinstance(frames, dict):
+                frames = [frames]
+            for frame in frames:
+                self.server.schalten(frame)
+        except (TypeError, ValueError) as e:
+            # TypeError z.B. bei {"rot": "x"} oder einer Zahl statt Liste
+            self.__antworten_json(400, {"fehler": str(e)})
+            return
+
+        self.__antworten_json(200, self.server.verteiler.zustand())
+
+    def __antworten(self, status, typ, daten):
+        self.send_response(status)
+        self.send_header("Content-Type", typ)
+        self.send_header("Content-Length", str(len(daten)))
+        self.end_headers()
+        self.wfile.write(daten)
+
+    def __antworten_json(self, status, objekt):
+        self.__antworten(status, "application/json",
+                         json.dumps(objekt).encode())
+
+    def __ereignisse_senden(self):
+        """Sendet Zustandsänderungen, bis der Betrachter die Verbindung
+        schließt oder der Server beendet wird."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        verteiler = self.server.verteiler
+        try:
+            # Zu Beginn den vollständigen Zustand senden. Die Version wird
+            # vorher bestimmt, damit keine spätere Änderung verloren geht.
+            version, _ = verteiler.warten(-1, timeout=0)
+            self.wfile.write(("data: " + json.dumps(verteiler.zustand()) +
+                              "\n\n").encode())
+            self.wfile.flush()
+            while not self.server.beendet:
+                neue_version, nachricht = verteiler.warten(version,
+                                                           timeout=15)
+                if nachricht is None:
+                    if self.server.beendet:
+                        return
+                    # Kommentar, damit Proxies die Verbindung offen halten
+                    nachricht = b": \n\n"
+                version = neue_version
+                self.wfile.write(nachricht)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+class EAModulWebServer(http.server.ThreadingHTTPServer):
+    """Ein HTTP-Server, der ein EAModul im Browser anzeigt und steuert.
+
+    Die Schnittstelle entspricht der der übrigen Server: serve_forever(),
+    shutdown() und server_close().
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host="", port=8080, eamodul=None, intervall=0.05):
+        """Erstellt einen Server auf host und port für das gegebene eamodul
+        (Standard: ein neues EAModul). Zustandsänderungen werden höchstens
+        alle intervall Sekunden an die Betrachter gesendet."""
+        # Zuerst den Port belegen, damit bei einem Fehler keine Beobachter am
+        # eamodul zurückbleiben.
+        super().__init__((host, port), EAModulWebHandler)
+
+        self.eamodul = eamodul if eamodul is not None else EAModul()
+        self.verteiler = Verteiler(intervall)
+        self.beendet = False
+
+        # Der Anfangszustand wird erst nach dem Registrieren gelesen, damit
+        # keine Änderung dazwischen verloren geht.
+        for farbe, name in LED_NAMEN.items():
+            self.eamodul.led_event_registrieren(
+                farbe, lambda wert, name=name: self.verteiler.aktualisieren(
+                    name, wert))
+            self.verteiler.aktualisieren(name, self.eamodul.led_wert(farbe))
+
+        self.__tastendruecke = [0, 0]
+        for nr in range(len(self.__tastendruecke)):
+            self.verteiler.aktualisieren("taster" + str(nr), 0)
+            self.eamodul.taster_event_registrieren(
+                nr, lambda pin, nr=nr: self.__taster_gedrueckt(nr))
+
+    def schalten(self, frame):
+        """Schaltet die LEDs gemäß eines Objekts wie {"rot": 1} und wartet
+        anschließend "dauer" Sekunden."""
+        if not isinstance(frame, dict):
+            raise ValueError("Objekt mit LED-Werten erwartet.")
+
+        farben = {name: farbe for farbe, name in LED_NAMEN.items()}
+        for name, wert in frame.items():
+            if name == "dauer":
+                continue
+            if name not in farben:
+                raise ValueError("Unbekannte LED: " + str(name))
+            self.eamodul.schalte_led(farben[name], wert)
+
+        dauer = frame.get("dauer", 0)
+        if dauer:
+            time.sleep(min(float(dauer), 10.0))
+
+    def __taster_gedrueckt(self, nr):
+        self.__tastendruecke[nr] += 1
+        self.verteiler.aktualisieren("taster" + str(nr),
+                                     self.__tastendruecke[nr])
+
+    def shutdown(self):
+        """Beendet serve_forever und gibt alle offenen Ereignis-Streams
+        frei."""
+        self.beendet = True
+        self.verteiler.schliessen()
+        super().shutdown()
+
+
+HTML_SEITE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>EAModul</title>
+<style>
+body { font-family: sans-serif; }
+.led { display: inline-block; width: 4em; height: 4em; margin: 0.5em;
+       border-radius: 50%; border: 2px solid #444; cursor: pointer; }
+</style></head>
+<body>
+<h1>EAModul</h1>
+<div>
+<span class="led" id="rot" data-farbe="255,0,0"></span>
+<span class="led" id="gelb" data-farbe="255,200,0"></span>
+<span class="led" id="gruen" data-farbe="0,200,0"></span>
+</div>
+<p>Taster 0: <span id="taster0">0</span>,
+   Taster 1: <span id="taster1">0</span></p>
+<script>
+var zustand = {};
+function zeigen(z) {
+  zustand = z;
+  ["rot", "gelb", "gruen"].forEach(function (name) {
+    var led = document.getElementById(name);
+    led.style.background = "rgba(" + led.dataset.farbe + "," +
+                           (0.1 + 0.9 * z[name]) + ")";
+  });
+  document.getElementById("taster0").textContent = z.taster0;
+  document.getElementById("taster1").textContent = z.taster1;
+}
+document.querySelectorAll(".led").forEach(function (led) {
+  led.onclick = function () {
+    var frame = {};
+    frame[led.id] = zustand[led.id] > 0 ? 0 : 1;
+    fetch("/leds", {method: "POST", body: JSON.stringify(frame)});
+  };
+});
+new EventSource("/ereignisse").onmessage = function (e) {
+  zeigen(JSON.parse(e.data));
+};
+</script>
+</body></html>
+"""
+
+
+def main():
+    """Startet einen EAModulWebServer auf dem in der Kommandozeile
+    angegebenen Port (Standard: 8080)."""
+    import sys
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8080
+    webserver = EAModulWebServer("", port)
+    print("Webserver auf Port", webserver.server_address[1],
+          "gestartet. Beenden mit Strg+C.")
+    try:
+        webserver.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        webserver.server_close()
+        webserver.eamodul.cleanup()
+
+
+if __name__ == "__main__":
+    main()
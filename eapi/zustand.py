@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+
+"""Ein Zustandsblock im gemeinsamen Speicher, über den ein EAModul die Werte
+seiner LEDs und Taster an andere Prozesse weitergibt.
+
+Prozesse wie ein Monitor, eine Weboberfläche oder ein Exporter für Metriken
+müssen so kein eigenes EAModul erstellen, das um die Pins konkurriert. Der
+Block ist eine kleine Datei (unter Linux in /dev/shm), die Schreiber und
+Leser mit mmap einblenden. Ein Lesen kommt ohne Systemaufruf und ohne Sperre
+aus; beliebig viele Leser stören weder den Schreiber noch einander.
+
+Die Konsistenz sichert ein Sequenzzähler (Seqlock): Der Schreiber erhöht ihn
+vor und nach jeder Änderung, so dass er während des Schreibens ungerade ist.
+Ein Leser liest Zähler, Werte und erneut den Zähler und wiederholt das
+Lesen, bis beide Zähler gleich und gerade sind. Die Sequenz zählt daher auch
+die Änderungen und verrät einem Leser schnell, ob es Neues gibt.
+
+Das Modul veröffentlicht seinen Zustand mit EAModul.veroeffentlichen. In
+einem anderen Prozess wird er dann so gelesen:
+
+  leser = ZustandLeser()
+  zustand = leser.lesen()
+  print(zustand.leds, zustand.taster)
+
+Auf der Kommandozeile werden Änderungen fortlaufend ausgegeben:
+
+  $ python3 -m eapi.zustand [pfad]
+
+>>> import os, tempfile
+>>> pfad = os.path.join(tempfile.mkdtemp(), "zustand")
+>>> schreiber = ZustandSchreiber(pfad)
+>>> leser = ZustandLeser(pfad)
+>>> schreiber.led_setzen(0, 1)
+>>> schreiber.taster_setzen(1, True)
+>>> zustand = leser.lesen()
+>>> zustand.sequenz, zustand.leds, zustand.taster, zustand.offen
+(6, (1.0, 0.0, 0.0), (False, True), True)
+>>> schreiber.schliessen()
+>>> leser.lesen().offen
+False
+>>> leser.schliessen()
+"""
+
+import collections
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+KENNUNG = b"EAPZ"
+VERSION = 1
+
+# Kennung und Version, Sequenz, Nutzdaten: drei LEDs, zwei Taster, ob der
+# Block noch beschrieben wird, und der Zeitpunkt (time.time()) der letzten
+# Änderung. Sequenz und Nutzdaten liegen an durch 8 teilbaren Adressen.
+KOPF = struct.Struct("<4sI")
+SEQUENZ = struct.Struct("<Q")
+NUTZDATEN = struct.Struct("<3d3B5xd")
+SEQUENZ_POSITION = KOPF.size
+NUTZDATEN_POSITION = SEQUENZ_POSITION + SEQUENZ.size
+GROESSE = NUTZDATEN_POSITION + NUTZDATEN.size
+
+STANDARD_PFAD = os.path.join(
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+    "eapi-zustand")
+
+Zustand = collections.namedtuple(
+    "Zustand", ["sequenz", "leds", "taster", "offen", "zeitpunkt"])
+
+
+class ZustandSchreiber:
+    """Schreibt den Zustand eines Moduls in einen Zustandsblock. Es darf nur
+    einen Schreiber je Block geben; innerhalb des Prozesses können aber
+    mehrere Threads schreiben."""
+
+    def __init__(self, pfad=None):
+        """Legt den Block unter pfad (Standard: STANDARD_PFAD) an. Ein
+        vorhandener Block wird überschrieben."""
+        self.pfad = pfad or STANDARD_PFAD
+        self.__leds = [0.0, 0.0, 0.0]
+        self.__taster = [False, False]
+        self.__sequenz = 0
+        self.__sperre = threading.Lock()
+
+        # Der Block wird erst vollständig geschrieben und dann an seinen Platz
+        # verschoben, damit Leser nie einen halben Block sehen.
+        temporaer = "{p}.{pid}".format(p=self.pfad, pid=os.getpid())
+        with open(temporaer, "wb") as datei:
+            datei.write(KOPF.pack(KENNUNG, VERSION).ljust(GROESSE, b"\0"))
+        with open(temporaer, "r+b") as datei:
+            self.__speicher = mmap.mmap(datei.fileno(), GROESSE)
+        self.__schreiben(True)
+        os.replace(temporaer, self.pfad)
+
+    def led_setzen(self, led_farbe, wert):
+        """Setzt den Wert (0 bis 1) einer LED."""
+        with self.__sperre:
+            if self.__speicher is None:
+                return
+            self.__leds[led_farbe] = float(wert)
+            self.__schreiben(True)
+
+    def taster_setzen(self, taster_nr, gedrueckt):
+        """Setzt den Zustand eines Tasters."""
+        with self.__sperre:
+            if self.__speicher is None:
+                return
+            self.__taster[taster_nr] = bool(gedrueckt)
+            self.__schreiben(True)
+
+    def __schreiben(self, offen):
+        speicher = self.__speicher
+        self.__sequenz += 1
+        SEQUENZ.pack_into(speicher, SEQUENZ_POSITION, self.__sequenz)
+        NUTZDATEN.pack_into(speicher, NUTZDATEN_POSITION, *self.__leds,
+                            *self.__taster, offen, time.time())
+        self.__sequenz += 1
+        SEQUENZ.pack_into(speicher, SEQUENZ_POSITION, self.__sequenz)
+
+    def schliessen(self, loeschen=False):
+        """Markiert den Block als geschlossen. Leser sehen den letzten
+        Zustand weiterhin. Mit loeschen=True wird die Datei entfernt."""
+        with self.__sperre:
+            if self.__speicher is None:
+                return
+            self.__schreiben(False)
+            self.__speicher.close()
+            self.__speicher = None
+
+        if loeschen:
+            try:
+                os.remove(self.pfad)
+            except FileNotFoundError:
+                pass
+
+
+class ZustandLeser:
+    """Liest konsistente Schnappschüsse aus einem Zustandsblock."""
+
+    def __init__(self, pfad=None):
+        """Blendet den Block unter pfad (Standard: STANDARD_PFAD) ein. Ist die
+        Datei kein Zustandsblock, wird ein ValueError ausgelöst."""
+        self.pfad = pfad or STANDARD_PFAD
+        with open(self.pfad, "rb") as datei:
+            if os.fstat(datei.fileno()).st_size < GROESSE:
+                raise ValueError("Kein Zustandsblock: " + self.pfad)
+            self.__speicher = mmap.mmap(datei.fileno(), GROESSE,
+                                        access=mmap.ACCESS_READ)
+            self.__inode = os.fstat(datei.fileno()).st_ino
+
+        kennung, version = KOPF.unpack_from(self.__speicher)
+        if kennung != KENNUNG or version != VERSION:
+            self.__speicher.close()
+            raise ValueError("Kein Zustandsblock der Version {v}: {p}".format(
+                v=VERSION, p=self.pfad))
+
+    def sequenz(self):
+        """Die aktuelle Sequenz. Sie ändert sich mit jeder Änderung des
+        Zustands."""
+        return SEQUENZ.unpack_from(self.__speicher, SEQUENZ_POSITION)[0]
+
+    def lesen(self):
+        """Gibt einen konsistenten Zustand zurück. Wird gerade geschrieben,
+        wird das Lesen wiederholt."""
+        speicher = self.__speicher
+        while True:
+            vorher = SEQUENZ.unpack_from(speicher, SEQUENZ_POSITION)[0]
+            if vorher & 1:
+                continue
+            werte = NUTZDATEN.unpack_from(speicher, NUTZDATEN_POSITION)
+            if SEQUENZ.unpack_from(speicher, SEQUENZ_POSITION)[0] == vorher:
+                return Zustand(vorher, werte[0:3],
+                               (bool(werte[3]), bool(werte[4])),
+                               bool(werte[5]), werte[6])
+
+    def ersetzt(self):
+        """Prüft, ob unter dem Pfad inzwischen ein neuer Block liegt, z.B.
+        nach einem Neustart des Schreibers. Der Leser muss dann neu erstellt
+        werden. Anders als lesen benötigt diese Methode einen
+        Systemaufruf."""
+        try:
+            return os.stat(self.pfad).st_ino != self.__inode
+        except FileNotFoundError:
+            return True
+
+    def schliessen(self):
+        """Gibt den eingeblendeten Block frei."""
+        self.__speicher.close()
+
+
+def main():
+    """Gibt jede Änderung des Zustands aus, bis Strg+C gedrückt wird."""
+    import sys
+
+    leser = ZustandLeser(sys.argv[1] if len(sys.argv) > 1 else None)
+    sequenz = None
+    try:
+        while True:
+            if leser.sequenz() != sequenz:
+                zustand = leser.lesen()
+                sequenz = zustand.sequenz
+                print("LEDs {l}  Taster {t}{g}".format(
+                    l=" ".join("{w:.2f}".format(w=w) for w in zustand.leds),
+                    t=" ".join("▼" if t else "▲" for t in zustand.taster),
+                    g="" if zustand.offen else "  (geschlossen)"))
+            time.sleep(0.02)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        leser.schliessen()
+
+
+if __name__ == "__main__":
+    main()